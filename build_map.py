@@ -1,108 +1,333 @@
 #!/usr/bin/env python3
 """
 Build static HTML map with embedded restaurant data
+
+By default the GeoJSON is inlined into index.html (--compact switches it to
+the smaller columnar encoding from compact_data.py). With --split-data it is
+written to a content-hashed data/restaurants.<hash>.json (plus precompressed
+.gz and, when the brotli module is installed, .br siblings) that the page
+fetches after first paint, so a data refresh no longer invalidates the
+cached HTML shell; with both, the photos go to data/photos.<hash>.json,
+fetched once the markers are up. --clusters is for large cities: markers are drawn on a
+canvas, only for restaurants in view, and zoomed-out views show clusters
+precomputed by clustering.py.
+--local-photos swaps the Places photo URLs for photo_pipeline.py thumbnails.
+Every build also regenerates sw.js (service_worker.py) next to the HTML;
+--precache-tiles has it download the map tiles around every restaurant
+(tile_precache.py) for offline use.
 """
+import argparse
+import glob
+import gzip
+import hashlib
 import json
+import os
+import tempfile
 
-# Load restaurant data (with categories)
-with open('kyoto_final.json', 'r', encoding='utf-8') as f:
-    restaurants = json.load(f)
-
-print(f"Loading {len(restaurants)} restaurants...")
-
-# Cuisine mapping (Japanese → English categories)
-cuisine_categories = {
-    'Sushi': ['寿司', 'すし', 'スシ', 'Sushi'],
-    'Ramen': ['ラーメン', 'らーめん', 'つけ麺', 'Ramen'],
-    'Tempura': ['天ぷら', 'てんぷら', 'Tempura'],
-    'Yakitori': ['焼き鳥', 'やきとり', 'Yakitori', '鳥料理'],
-    'Yakiniku': ['焼肉', 'やきにく', 'Yakiniku', 'ホルモン'],
-    'Tonkatsu': ['とんかつ', 'トンカツ', 'Tonkatsu', 'カツ'],
-    'Unagi': ['うなぎ', 'ウナギ', 'Unagi', '鰻'],
-    'Japanese': ['日本料理', '和食', 'Japanese', '懐石', '割烹'],
-    'Soba': ['そば', 'ソバ', 'Soba', '蕎麦'],
-    'Udon': ['うどん', 'ウドン', 'Udon'],
-    'Curry': ['カレー', 'Curry', 'カリー'],
-    'Bakery': ['パン', 'ブーランジェリー', 'Bakery', 'ベーカリー'],
-    'Desserts': ['ケーキ', '和菓子', 'スイーツ', 'Dessert', 'パティスリー', 'たい焼き'],
-    'Pizza': ['ピザ', 'Pizza', 'Pizzeria', 'ピッツェリア', 'Trattoria', 'Italian']
-}
-
-def categorize_cuisine(cuisine_text):
-    """Categorize a restaurant's cuisine into filter categories"""
-    if not cuisine_text:
-        return []
-    
-    categories = []
-    cuisine_lower = cuisine_text.lower()
-    
-    for category, keywords in cuisine_categories.items():
-        for keyword in keywords:
-            if keyword.lower() in cuisine_lower:
-                categories.append(category)
-                break
-    
-    return categories
-
-# Create GeoJSON and categorize
-features = []
-category_counts = {}
-
-for r in restaurants:
-    if 'lat' in r and 'lng' in r:
-        # Use categories from data if available, otherwise categorize from cuisine
-        if r.get('categories'):
-            categories = r['categories']
-        else:
-            categories = categorize_cuisine(r.get('cuisine', ''))
-        
-        # Count categories
-        for cat in categories:
-            category_counts[cat] = category_counts.get(cat, 0) + 1
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [r['lng'], r['lat']]
-            },
-            "properties": {
-                "name": r.get('google_name', r['name']),  # Use English name from Google
-                "tabelog_rating": r['tabelog_rating'],
-                "google_rating": r['google_rating'],
-                "google_reviews": r.get('google_user_ratings_total', 0),
-                "cuisine": r.get('cuisine', ''),
-                "area": r.get('area', ''),
-                "address": r.get('google_address', ''),
-                "categories": categories,
-                "place_id": r.get('google_place_id', ''),
-                "price_level": r.get('price_level'),
-                "opening_hours": r.get('opening_hours', []),
-                "open_now": r.get('open_now'),
-                "photo_urls": r.get('photo_urls', [])
-            }
+import compact_data
+from cities import add_city_argument, get_city
+from clustering import CLUSTER_JS, build_clusters
+from cuisine_classifier import categorize_cuisine
+from filter_index import FILTER_JS, build_filter_index, build_filter_index_rows, feature_rating
+from opening_hours import IS_OPEN_JS, weekly_table
+from photo_pipeline import MEDIUM_WIDTH, PHOTO_DIR, THUMB_WIDTH, load_manifest, local_photo_urls
+from record_stream import iter_records, peak_rss_mb
+from service_worker import write_service_worker
+from spatial_index import NEARBY_JS, NEARBY_LIMIT, NEARBY_MINUTES, VIEWPORT_JS, GridIndex, walking_km
+from tile_precache import MAX_ZOOM, MIN_ZOOM, TILE_URL, build_manifest, parse_zooms, write_manifest
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DATA_PATH = get_city().final_path
+OUTPUT_PATH = 'index.html'
+DATA_DIR = 'data'
+
+# Where --stream splices the data into the rendered page
+STREAMED_DATA = '/* streamed restaurant data */'
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def restaurant_feature(r):
+    """GeoJSON feature for one restaurant, or None when it has no coordinates"""
+    if 'lat' not in r or 'lng' not in r:
+        return None
+
+    # Use categories from data if available, otherwise categorize from cuisine
+    if r.get('categories'):
+        categories = r['categories']
+    else:
+        categories = categorize_cuisine(r.get('cuisine', ''))
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [r['lng'], r['lat']]
+        },
+        "properties": {
+            "name": r.get('google_name', r['name']),  # Use English name from Google
+            "tabelog_rating": r['tabelog_rating'],
+            "google_rating": r['google_rating'],
+            "google_reviews": r.get('google_user_ratings_total', 0),
+            "cuisine": r.get('cuisine', ''),
+            "area": r.get('area', ''),
+            "address": r.get('google_address', ''),
+            "categories": categories,
+            "place_id": r.get('google_place_id', ''),
+            "price_level": r.get('price_level'),
+            "opening_hours": r.get('opening_hours', []),
+            "open_now": r.get('open_now'),
+            "hours": weekly_table(r.get('opening_hours')),
+            "photo_urls": r.get('photo_urls', [])
         }
-        features.append(feature)
+    }
+
+
+def feature_point(feature):
+    lng, lat = feature['geometry']['coordinates']
+    return lat, lng
+
+
+def build_geojson(restaurants):
+    """(geojson, category_counts) for every restaurant with coordinates"""
+    features = []
+    category_counts = {}
+
+    for r in restaurants:
+        feature = restaurant_feature(r)
+        if feature is not None:
+            # Count categories
+            for cat in feature['properties']['categories']:
+                category_counts[cat] = category_counts.get(cat, 0) + 1
+            features.append(feature)
+
+    geojson = {
+        "type": "FeatureCollection",
+        "features": features,
+        # Feature indices bucketed by ~500 m cell, for the "near me" list
+        "spatial_index": GridIndex.build([feature_point(f) for f in features]).to_dict(),
+        # Category bitsets and rating order for instant filtering
+        "filter_index": build_filter_index(features)
+    }
+    return geojson, category_counts
+
+
+class CompressedFileWriter:
+    """Writes text as UTF-8 to `path` plus .gz (and .br) siblings, hashing as it goes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.digest = hashlib.sha256()
+        self.files = {'json': open(path, 'wb')}
+        self.sizes = {'json': 0}
+        # mtime=0 and no filename keep the .gz byte-identical across rebuilds of the same data
+        self.files['gz'] = open(path + '.gz', 'wb')
+        self.gzip = gzip.GzipFile(filename='', mode='wb', compresslevel=9,
+                                  fileobj=self.files['gz'], mtime=0)
+        self.brotli = None
+        if brotli is not None:
+            self.files['br'] = open(path + '.br', 'wb')
+            self.brotli = brotli.Compressor(quality=11)
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.digest.update(data)
+        self.files['json'].write(data)
+        self.sizes['json'] += len(data)
+        self.gzip.write(data)
+        if self.brotli is not None:
+            self.files['br'].write(self.brotli.process(data))
+
+    def close(self):
+        self.gzip.close()
+        if self.brotli is not None:
+            self.files['br'].write(self.brotli.finish())
+        for ext, f in self.files.items():
+            if ext != 'json':
+                self.sizes[ext] = f.tell()
+            f.close()
 
-geojson = {
-    "type": "FeatureCollection",
-    "features": features
-}
 
-print(f"Created GeoJSON with {len(features)} restaurants")
-print(f"\nCategory counts:")
-for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
-    print(f"  {cat}: {count}")
+def stream_data_file(write_payload, data_dir=DATA_DIR, name='restaurants'):
+    """Content-hashed <name>.<hash>.json whose text `write_payload(write)` produces; returns its URL path"""
+    os.makedirs(data_dir, exist_ok=True)
 
-# Build HTML
-html = f'''<!DOCTYPE html>
+    # Old hashes are never referenced again once index.html is rewritten
+    for stale in glob.glob(os.path.join(data_dir, f'{glob.escape(name)}.*.json*')):
+        os.remove(stale)
+
+    # The name depends on the content, so write under a temporary name first
+    writer = CompressedFileWriter(os.path.join(data_dir, f'.{name}.tmp.json'))
+    try:
+        write_payload(writer.write)
+    finally:
+        writer.close()
+    path = os.path.join(data_dir, f'{name}.{writer.digest.hexdigest()[:12]}.json')
+    for ext in writer.files:
+        suffix = '' if ext == 'json' else '.' + ext
+        os.replace(writer.path + suffix, path + suffix)
+    if brotli is None:
+        print("⚠️  brotli not installed, skipping .br (pip install brotli)")
+
+    print(f"💾 Wrote {path} (" + ', '.join(f"{ext} {size / 1024:.0f} KB" for ext, size in writer.sizes.items()) + ")")
+    return path.replace(os.sep, '/')
+
+
+def write_data_file(data, data_dir=DATA_DIR, name='restaurants'):
+    """Write the content-hashed data file and its compressed siblings; returns its URL path"""
+    return stream_data_file(lambda write: write(compact_data.dumps(data)), data_dir, name)
+
+
+def data_script(geojson, data_url=None, columnar=None, photos_url=None):
+    """JS that defines `restaurants`: inline, or fetched from `data_url`
+
+    With a `columnar` payload (compact_data.encode) the page ships that
+    instead and decodes it back into GeoJSON; its photos, when split off
+    into `photos_url`, are fetched once the markers are up. A `geojson` of
+    None leaves the STREAMED_DATA placeholder where the inline data goes.
+    """
+    photos = ''
+    if photos_url is not None:
+        # Popups are built on click, so the URLs only have to be there by then
+        photos = f'''
+                fetch('{photos_url}')
+                    .then(response => {{
+                        if (!response.ok) throw new Error('HTTP ' + response.status);
+                        return response.json();
+                    }})
+                    .then(photos => decodePhotos(restaurants.features, photos))
+                    .catch(error => console.error('Failed to load photos:', error));'''
+
+    if columnar is not None:
+        decoder = compact_data.DECODER_JS + '\n\n        '
+        if data_url is None:
+            return decoder + f'''// Embedded restaurant data (columnar)
+        const restaurants = decodeRestaurants({compact_data.dumps(columnar)});'''
+        received = 'decodeRestaurants(data)'
+    else:
+        decoder = ''
+        if data_url is None:
+            data = STREAMED_DATA if geojson is None else json.dumps(geojson, ensure_ascii=False)
+            return f'''// Embedded restaurant data
+        const restaurants = {data};'''
+        received = 'data'
+    return decoder + f'''// Restaurant data lives in a separately cached file; markers appear once it arrives
+        let restaurants = {{ type: 'FeatureCollection', features: [] }};
+        fetch('{data_url}')
+            .then(response => {{
+                if (!response.ok) throw new Error('HTTP ' + response.status);
+                return response.json();
+            }})
+            .then(data => {{
+                restaurants = {received};
+                updateMarkers();{photos}
+            }})
+            .catch(error => console.error('Failed to load restaurant data:', error));'''
+
+
+def city_data_script(cities, default, columnar=False):
+    """JS that defines `restaurants` from per-city shards, fetched when a city is picked
+
+    `cities` maps slug -> City.shard_info() plus the shard's `url`.
+    """
+    received = 'decodeRestaurants(data)' if columnar else 'data'
+    decoder = compact_data.DECODER_JS + '\n\n        ' if columnar else ''
+    return decoder + f'''// Per-city data shards; each is fetched (and cached) the first time its city is shown
+        const CITIES = {json.dumps(cities, ensure_ascii=False)};
+        let restaurants = {{ type: 'FeatureCollection', features: [] }};
+        let currentCity = null;
+        const cityData = {{}};
+        
+        function loadCity(slug) {{
+            if (!CITIES[slug]) slug = '{default}';
+            const city = CITIES[slug];
+            currentCity = slug;
+            localStorage.setItem('city', slug);
+            document.getElementById('city-filter').value = slug;
+            document.getElementById('app-title').textContent = `${{city.emoji}} ${{city.name}} Food Finder`;
+            map.setView(city.center, city.zoom);
+            if (!cityData[slug]) {{
+                cityData[slug] = fetch(city.url)
+                    .then(response => {{
+                        if (!response.ok) throw new Error('HTTP ' + response.status);
+                        return response.json();
+                    }})
+                    .then(data => {received});
+            }}
+            cityData[slug]
+                .then(data => {{
+                    // Ignore a shard that arrives after the user moved on to another city
+                    if (currentCity !== slug) return;
+                    restaurants = data;
+                    updateMarkers();
+                }})
+                .catch(error => {{
+                    delete cityData[slug];
+                    console.error(`Failed to load ${{city.name}} data:`, error);
+                }});
+        }}
+        
+        // `map` only exists once the whole script has run
+        document.addEventListener('DOMContentLoaded', () => loadCity(localStorage.getItem('city') || '{default}'));'''
+
+
+def city_picker(cities):
+    """<select> for switching city in a multi-city build"""
+    if not cities:
+        return ''
+    options = ''.join(f'\n                <option value="{slug}">{info["emoji"]} {info["name"]}</option>'
+                      for slug, info in cities.items())
+    return f'''<div class="filter">
+            <label>City</label>
+            <select id="city-filter" onchange="loadCity(this.value)">{options}
+            </select>
+        </div>
+        
+        '''
+
+
+def data_preload(data_url=None):
+    """<link> that starts the data download while the page is still parsing"""
+    if data_url is None:
+        return ''
+    return f'<link rel="preload" href="{data_url}" as="fetch" crossorigin>\n    '
+
+
+def tile_precache_request(enabled):
+    """JS asking the active service worker to download the offline tiles"""
+    if not enabled:
+        return ''
+    return '''
+                        // Not on metered "data saver" connections
+                        if (!(navigator.connection && navigator.connection.saveData)) {
+                            navigator.serviceWorker.ready.then(ready => ready.active.postMessage({ type: 'precache-tiles' }));
+                        }'''
+
+
+def render_html(geojson, category_counts, data_url=None, columnar=None, canvas=False,
+                tile_url=TILE_URL, precache_tiles=False, feature_count=None, city=None, cities=None,
+                photos_url=None):
+    """The page; with `cities` (see city_data_script) it is the shared multi-city shell"""
+    if feature_count is None:
+        feature_count = len(geojson['features'])
+    city = city or get_city()
+    if cities:
+        script = city_data_script(cities, city.slug, columnar is not None)
+        place = 'Japan'
+    else:
+        script = data_script(geojson, data_url, columnar, photos_url)
+        place = city.name
+    return f'''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <meta name="theme-color" content="#667eea">
-    <meta name="description" content="Discover top-rated restaurants in Kyoto with live GPS tracking, walking times, and filters.">
-    <title>Kyoto Food Finder - Top-Rated Restaurants</title>
+    <meta name="description" content="Discover top-rated restaurants in {place} with live GPS tracking, walking times, and filters.">
+    <title>{place} Food Finder - Top-Rated Restaurants</title>
     
     <!-- PWA Manifest -->
     <link rel="manifest" href="manifest.json">
@@ -111,9 +336,9 @@ html = f'''<!DOCTYPE html>
     <link rel="apple-touch-icon" href="icon-192.png">
     <meta name="apple-mobile-web-app-capable" content="yes">
     <meta name="apple-mobile-web-app-status-bar-style" content="black-translucent">
-    <meta name="apple-mobile-web-app-title" content="Kyoto Food">
+    <meta name="apple-mobile-web-app-title" content="{place} Food">
     
-    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
+    {data_preload(data_url)}<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
     <style>
         * {{
             margin: 0;
@@ -174,6 +399,14 @@ html = f'''<!DOCTYPE html>
             background: #64748b;
         }}
         
+        body.dark-mode .nearby-list li {{
+            border-color: #334155;
+        }}
+        
+        body.dark-mode .nearby-list li:hover {{
+            background: #334155;
+        }}
+        
         body.dark-mode .gps-btn.active {{
             background: #10b981;
         }}
@@ -379,6 +612,50 @@ html = f'''<!DOCTYPE html>
             background: #22c55e;
         }}
         
+        .nearby {{
+            margin-top: 15px;
+            padding-top: 15px;
+            border-top: 1px solid #eee;
+        }}
+        
+        .nearby-list {{
+            list-style: none;
+            font-size: 13px;
+        }}
+        
+        .nearby-list li {{
+            display: flex;
+            justify-content: space-between;
+            gap: 8px;
+            padding: 6px 4px;
+            border-bottom: 1px solid #f3f4f6;
+            cursor: pointer;
+        }}
+        
+        .nearby-list li:hover {{
+            background: #f3f4f6;
+        }}
+        
+        .nearby-walk {{
+            color: #667eea;
+            white-space: nowrap;
+        }}
+        
+        .cluster-icon div {{
+            border-radius: 50%;
+            background: rgba(102, 126, 234, 0.85);
+            border: 3px solid rgba(255, 255, 255, 0.9);
+            color: white;
+            font-size: 13px;
+            font-weight: 600;
+            text-align: center;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+        }}
+        
+        body.dark-mode .cluster-icon div {{
+            border-color: #1a1a1a;
+        }}
+        
         .leaflet-popup-content {{
             margin: 15px;
             min-width: 200px;
@@ -483,9 +760,9 @@ html = f'''<!DOCTYPE html>
 </head>
 <body>
     <div class="header">
-        <h1>⛩️ Kyoto Food Finder</h1>
+        <h1 id="app-title">{city.emoji} {city.name} Food Finder</h1>
         <div style="display: flex; align-items: center; gap: 10px;">
-            <div class="stats">{len(features)} Restaurants • Tabelog 3.5+ & Google 4.2+</div>
+            <div class="stats">{feature_count} Restaurants • Tabelog 3.5+ & Google 4.2+</div>
             <button class="theme-toggle" id="theme-toggle" onclick="toggleTheme()" title="Toggle dark mode">
                 <span id="theme-icon">🌙</span>
             </button>
@@ -502,10 +779,10 @@ html = f'''<!DOCTYPE html>
             <button onclick="toggleControls()" style="background: #f3f4f6; border: none; font-size: 24px; cursor: pointer; padding: 8px; color: #333; border-radius: 5px; width: 40px; height: 40px; display: flex; align-items: center; justify-content: center;">✕</button>
         </div>
         
-        <div class="filter">
+        {city_picker(cities)}<div class="filter">
             <label>Google Rating</label>
             <select id="rating-filter">
-                <option value="4.2">4.2+ Stars ({len(features)})</option>
+                <option value="4.2">4.2+ Stars ({feature_count})</option>
                 <option value="4.5">4.5+ Stars</option>
                 <option value="4.7">4.7+ Stars</option>
                 <option value="4.9">4.9+ Stars</option>
@@ -614,6 +891,10 @@ html = f'''<!DOCTYPE html>
         </div>
         
         <button id="gps-btn" class="gps-btn">📍 Enable GPS Tracking</button>
+        <div id="nearby" class="nearby" style="display: none;">
+            <h3>🚶 Near Me ({NEARBY_MINUTES} min walk)</h3>
+            <ol id="nearby-list" class="nearby-list"></ol>
+        </div>
         <button id="install-btn" class="gps-btn" style="background: #10b981; display: none;">📲 Install App</button>
     </div>
     
@@ -621,22 +902,25 @@ html = f'''<!DOCTYPE html>
     
     <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
     <script>
-        // Embedded restaurant data
-        const restaurants = {json.dumps(geojson, ensure_ascii=False)};
+        {script}
         
-        // Initialize map (centered on Kyoto)
-        const map = L.map('map').setView([35.0116, 135.7681], 12);
+        // Initialize map (centered on {city.name})
+        const map = L.map('map').setView({list(city.center)}, {city.zoom});
         
         // Tile layers
-        const lightTiles = L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
+        // crossOrigin: CORS tile responses, which the service worker can cache at
+        // their real size (opaque ones count as megabytes of storage quota each)
+        const lightTiles = L.tileLayer('{tile_url}', {{
             attribution: '© OpenStreetMap contributors',
-            maxZoom: 19
+            maxZoom: 19,
+            crossOrigin: true
         }});
         
         const darkTiles = L.tileLayer('https://cartodb-basemaps-{{s}}.global.ssl.fastly.net/dark_all/{{z}}/{{x}}/{{y}}.png', {{
             attribution: '© OpenStreetMap contributors, © CARTO',
             subdomains: 'abcd',
-            maxZoom: 19
+            maxZoom: 19,
+            crossOrigin: true
         }});
         
         const darkLabels = null;
@@ -648,7 +932,14 @@ html = f'''<!DOCTYPE html>
         let userMarker = null;
         let userLocation = null;
         let gpsActive = false;
-        let markers = [];
+        let gpsWatchId = null;
+        let markers = [];          // markers[i] belongs to restaurants.features[i], created on first show
+        let shownMarkers = new Set();  // indices of the markers on the map
+        let markerSource = null;   // the data set `markers` were built from
+        
+        // Canvas draws thousands of circle markers much faster than one SVG node each
+        const markerRenderer = {'L.canvas({ padding: 0.5 })' if canvas else 'undefined'};
+        const clusterLayer = L.layerGroup().addTo(map);
         
         // Calculate distance between two points
         function getDistance(lat1, lon1, lat2, lon2) {{
@@ -679,6 +970,24 @@ html = f'''<!DOCTYPE html>
             }}
         }}
         
+        // One carousel image. Only the first is loaded with the popup; the rest keep
+        // their URLs in data-* attributes until changePhoto() shows them. Local photos
+        // (photo_pipeline.py) also offer the AVIF thumbnail and the medium size.
+        function photoImage(url, load, alt) {{
+            const formats = restaurants.photo_formats;
+            const local = formats && !/^https?:/.test(url);
+            const attr = load ? '' : 'data-';
+            let srcset = '';
+            if (local && formats.resized) {{
+                srcset = ` ${{attr}}srcset="${{url}} {THUMB_WIDTH}w, ${{url.replace('-t.', '-m.')}} {MEDIUM_WIDTH}w" sizes="300px"`;
+            }}
+            const img = `<img ${{attr}}src="${{url}}"${{srcset}} class="${{load ? 'active' : ''}}" alt="${{alt}}" decoding="async">`;
+            if (local && formats.avif && url.endsWith('.webp')) {{
+                return `<picture><source type="image/avif" ${{attr}}srcset="${{url.replace(/\.webp$/, '.avif')}}">${{img}}</picture>`;
+            }}
+            return img;
+        }}
+        
         // Create popup content
         function createPopup(props) {{
             let distanceHtml = '';
@@ -707,9 +1016,7 @@ html = f'''<!DOCTYPE html>
             let photoHtml = '';
             if (props.photo_urls && props.photo_urls.length > 0) {{
                 const carouselId = `carousel-${{Math.random().toString(36).substr(2, 9)}}`;
-                const photos = props.photo_urls.map((url, idx) => 
-                    `<img src="${{url}}" class="${{idx === 0 ? 'active' : ''}}" alt="${{props.name}}">`
-                ).join('');
+                const photos = props.photo_urls.map((url, idx) => photoImage(url, idx === 0, props.name)).join('');
                 
                 const prevBtn = props.photo_urls.length > 1 ? 
                     `<button class="carousel-btn prev" onclick="changePhoto('${{carouselId}}', -1)">‹</button>` : '';
@@ -721,11 +1028,12 @@ html = f'''<!DOCTYPE html>
                 photoHtml = `<div class="photo-carousel" id="${{carouselId}}">${{photos}}${{prevBtn}}${{nextBtn}}${{counter}}</div>`;
             }}
             
-            // Open/Closed status
+            // Open/Closed status, computed now rather than taken from the enrichment snapshot
+            const openNow = isOpenAt(props.hours, japanTime(new Date()));
             let statusHtml = '';
-            if (props.open_now === true) {{
+            if (openNow === true) {{
                 statusHtml = `<div style="display: inline-block; background: #10b981; color: white; padding: 4px 8px; border-radius: 4px; font-size: 12px; font-weight: 600; margin-bottom: 8px;">🟢 Open now</div>`;
-            }} else if (props.open_now === false) {{
+            }} else if (openNow === false) {{
                 statusHtml = `<div style="display: inline-block; background: #ef4444; color: white; padding: 4px 8px; border-radius: 4px; font-size: 12px; font-weight: 600; margin-bottom: 8px;">🔴 Closed</div>`;
             }} else {{
                 statusHtml = `<div style="display: inline-block; background: #94a3b8; color: white; padding: 4px 8px; border-radius: 4px; font-size: 12px; font-weight: 600; margin-bottom: 8px;">⚪ No hours data</div>`;
@@ -749,75 +1057,172 @@ html = f'''<!DOCTYPE html>
             `;
         }}
         
+        {IS_OPEN_JS}
+        
         // Get selected cuisines
         function getSelectedCuisines() {{
             const checkboxes = document.querySelectorAll('.cuisine-option input[type="checkbox"]:checked');
             return Array.from(checkboxes).map(cb => cb.value);
         }}
         
-        // Add markers
-        function addMarkers() {{
-            const minRating = parseFloat(document.getElementById('rating-filter').value);
-            const selectedCuisines = getSelectedCuisines();
-            const openNowOnly = document.getElementById('open-now-filter').checked;
-            
-            // Clear existing markers
-            markers.forEach(m => map.removeLayer(m));
-            markers = [];
-            
-            // Filter and add new markers
-            let count = 0;
-            restaurants.features.forEach(feature => {{
-                const props = feature.properties;
-                const coords = feature.geometry.coordinates;
-                
-                // Rating filter
-                if (props.google_rating < minRating) return;
-                
-                // Open Now filter - only exclude if explicitly closed
-                if (openNowOnly) {{
-                    if (props.open_now === false) return;
-                }}
-                
-                // Cuisine filter (if any selected)
-                if (selectedCuisines.length > 0) {{
-                    const hasMatch = selectedCuisines.some(cuisine => 
-                        props.categories && props.categories.includes(cuisine)
-                    );
-                    if (!hasMatch) return;
-                }}
-                
-                // Adjust marker style for dark mode
-                const isDarkMode = document.body.classList.contains('dark-mode');
-                const borderColor = isDarkMode ? '#1a1a1a' : '#ffffff';
-                
-                const marker = L.circleMarker([coords[1], coords[0]], {{
-                    radius: 6.4,
-                    fillColor: props.google_rating >= 4.7 ? '#10b981' :  // Bright emerald green
-                              props.google_rating >= 4.5 ? '#3b82f6' :  // Bright blue
-                              '#8b5cf6',  // Bright purple/violet
-                    color: borderColor,
-                    weight: 2.5,
-                    opacity: 1,
-                    fillOpacity: 0.95
+        // Current filter settings, read once per update
+        function getFilters() {{
+            return {{
+                minRating: parseFloat(document.getElementById('rating-filter').value),
+                selectedCuisines: getSelectedCuisines(),
+                openNowOnly: document.getElementById('open-now-filter').checked,
+                now: japanTime(new Date())
+            }};
+        }}
+        
+        {FILTER_JS}
+        
+        // Per-cuisine counts under the current rating / open-now filters
+        function updateCuisineCounts(base) {{
+            document.querySelectorAll('.cuisine-option input[type="checkbox"]').forEach(checkbox => {{
+                const counter = checkbox.parentElement.querySelector('.cuisine-count');
+                counter.textContent = `(${{popcount(andBits(base, categoryBits(checkbox.value)))}})`;
+            }});
+        }}
+        
+        {NEARBY_JS}
+        
+        // "Near me" list: nearest restaurants passing the filters, by walking time
+        function updateNearby() {{
+            const panel = document.getElementById('nearby');
+            if (!userLocation) {{
+                panel.style.display = 'none';
+                return;
+            }}
+            const {{ bits }} = selectRestaurants(getFilters());
+            const nearest = nearbyRestaurants(userLocation[0], userLocation[1], {NEARBY_LIMIT}, {walking_km(NEARBY_MINUTES)},
+                                              i => hasBit(bits, i));
+            const list = document.getElementById('nearby-list');
+            list.innerHTML = nearest.length > 0
+                ? nearest.map(([distance, i]) => 
+                    `<li data-index="${{i}}"><span>${{restaurants.features[i].properties.name}}</span><span class="nearby-walk">${{getWalkingTime(distance)}}</span></li>`
+                  ).join('')
+                : '<li>Nothing within walking distance</li>';
+            panel.style.display = 'block';
+        }}
+        
+        // Fly to a restaurant from the "near me" list and open its popup
+        function focusRestaurant(i) {{
+            const feature = restaurants.features[i];
+            const coords = feature.geometry.coordinates;
+            map.setView([coords[1], coords[0]], 17);
+            L.popup()
+                .setLatLng([coords[1], coords[0]])
+                .setContent(createPopup({{
+                    ...feature.properties,
+                    lat: coords[1],
+                    lng: coords[0]
+                }}))
+                .openOn(map);
+        }}
+        
+        document.getElementById('nearby-list').addEventListener('click', (e) => {{
+            const item = e.target.closest('li[data-index]');
+            if (item) focusRestaurant(parseInt(item.dataset.index, 10));
+        }});
+        
+        // Marker style; only the border depends on the theme
+        function markerStyle(props) {{
+            const isDarkMode = document.body.classList.contains('dark-mode');
+            return {{
+                radius: 6.4,
+                fillColor: props.google_rating >= 4.7 ? '#10b981' :  // Bright emerald green
+                          props.google_rating >= 4.5 ? '#3b82f6' :  // Bright blue
+                          '#8b5cf6',  // Bright purple/violet
+                color: isDarkMode ? '#1a1a1a' : '#ffffff',
+                weight: 2.5,
+                opacity: 1,
+                fillOpacity: 0.95
+            }};
+        }}
+        
+        // Start over when the data set changes (another city was loaded)
+        function ensureMarkers() {{
+            if (markerSource === restaurants) return;
+            shownMarkers.forEach(i => map.removeLayer(markers[i]));
+            shownMarkers = new Set();
+            markers = new Array(restaurants.features.length);
+            markerSource = restaurants;
+        }}
+        
+        // One persistent marker per feature, created the first time it is shown;
+        // popups are only rendered when opened
+        function markerFor(i) {{
+            if (!markers[i]) {{
+                const props = restaurants.features[i].properties;
+                const coords = restaurants.features[i].geometry.coordinates;
+                markers[i] = L.circleMarker([coords[1], coords[0]], {{
+                    ...markerStyle(props),
+                    renderer: markerRenderer
                 }});
-                
-                marker.bindPopup(createPopup({{
+                markers[i].bindPopup(() => createPopup({{
                     ...props,
                     lat: coords[1],
                     lng: coords[0]
                 }}));
-                
-                marker.addTo(map);
-                markers.push(marker);
-                count++;
+            }}
+            return markers[i];
+        }}
+        
+        {CLUSTER_JS}
+        
+        {VIEWPORT_JS}
+        
+        // Apply the filters: only markers whose visibility changed touch the map.
+        // With clusters (large data sets) only restaurants in and just around the
+        // viewport are considered, via the grid index, and panning re-runs this
+        function updateMarkers() {{
+            ensureMarkers();
+            const filters = getFilters();
+            const {{ minRating, selectedCuisines }} = filters;
+            const {{ base, bits }} = selectRestaurants(filters);
+            const level = clusterLevel();
+            const counts = level ? clusterCounts(level, bits) : null;
+            
+            const wanted = new Set();
+            const consider = i => {{
+                // Restaurants inside a cluster are drawn as part of it
+                if (hasBit(bits, i) === 1 && (!level || counts[level.assign[i]] < 2)) wanted.add(i);
+            }};
+            if (restaurants.clusters) {{
+                restaurantsInBounds(map.getBounds().pad(0.25)).forEach(consider);
+            }} else {{
+                for (let i = 0; i < restaurants.features.length; i++) consider(i);
+            }}
+            shownMarkers.forEach(i => {{
+                if (!wanted.has(i)) {{
+                    map.removeLayer(markers[i]);
+                    shownMarkers.delete(i);
+                }}
             }});
+            wanted.forEach(i => {{
+                if (!shownMarkers.has(i)) {{
+                    markerFor(i).addTo(map);
+                    shownMarkers.add(i);
+                }}
+            }});
+            updateClusterMarkers(level, counts);
+            updateCuisineCounts(base);
+            const count = popcount(bits);
             
             // Update stats
             const cuisineText = selectedCuisines.length > 0 ? 
                 ` • ${{selectedCuisines.join(', ')}}` : '';
             document.querySelector('.stats').textContent = 
                 `${{count}} Restaurants • Google ${{minRating}}+${{cuisineText}}`;
+            
+            updateNearby();
+        }}
+        
+        // Theme change: restyle the markers created so far; new ones read the theme themselves
+        function restyleMarkers() {{
+            const color = document.body.classList.contains('dark-mode') ? '#1a1a1a' : '#ffffff';
+            markers.forEach(marker => marker.setStyle({{ color: color }}));
         }}
         
         // GPS tracking
@@ -830,7 +1235,12 @@ html = f'''<!DOCTYPE html>
                     map.removeLayer(userMarker);
                     userMarker = null;
                 }}
+                if (gpsWatchId !== null) {{
+                    navigator.geolocation.clearWatch(gpsWatchId);
+                    gpsWatchId = null;
+                }}
                 userLocation = null;
+                updateNearby();
                 return;
             }}
             
@@ -843,7 +1253,7 @@ html = f'''<!DOCTYPE html>
             document.getElementById('gps-btn').textContent = '📍 GPS Active';
             document.getElementById('gps-btn').classList.add('active');
             
-            navigator.geolocation.watchPosition(
+            gpsWatchId = navigator.geolocation.watchPosition(
                 (position) => {{
                     const lat = position.coords.latitude;
                     const lng = position.coords.longitude;
@@ -864,10 +1274,14 @@ html = f'''<!DOCTYPE html>
                     
                     // Center map on user
                     map.setView([lat, lng], 14);
+                    
+                    updateNearby();
                 }},
                 (error) => {{
                     alert('Could not get your location');
                     gpsActive = false;
+                    navigator.geolocation.clearWatch(gpsWatchId);
+                    gpsWatchId = null;
                     document.getElementById('gps-btn').textContent = '📍 Enable GPS Tracking';
                     document.getElementById('gps-btn').classList.remove('active');
                 }},
@@ -880,13 +1294,22 @@ html = f'''<!DOCTYPE html>
         }}
         
         // Event listeners
-        document.getElementById('rating-filter').addEventListener('change', addMarkers);
-        document.getElementById('open-now-filter').addEventListener('change', addMarkers);
+        document.getElementById('rating-filter').addEventListener('change', updateMarkers);
+        document.getElementById('open-now-filter').addEventListener('change', updateMarkers);
+        // Covers zooming too: Leaflet fires moveend after every zoom
+        map.on('moveend', () => {{
+            if (restaurants.clusters) updateMarkers();
+        }});
+        
+        // Keep "Open Now Only" current as opening and closing times pass
+        setInterval(() => {{
+            if (document.getElementById('open-now-filter').checked) updateMarkers();
+        }}, 60 * 1000);
         document.getElementById('gps-btn').addEventListener('click', enableGPS);
         
         // Cuisine filter checkboxes
         document.querySelectorAll('.cuisine-option input[type="checkbox"]').forEach(checkbox => {{
-            checkbox.addEventListener('change', addMarkers);
+            checkbox.addEventListener('change', updateMarkers);
         }});
         
         // Photo carousel navigation
@@ -901,7 +1324,22 @@ html = f'''<!DOCTYPE html>
             images[currentIndex].classList.remove('active');
             
             currentIndex = (currentIndex + direction + images.length) % images.length;
-            images[currentIndex].classList.add('active');
+            const image = images[currentIndex];
+            // First time this photo is shown: start loading it
+            if (image.dataset.src) {{
+                const source = image.previousElementSibling;
+                if (source && source.dataset.srcset) {{
+                    source.srcset = source.dataset.srcset;
+                    source.removeAttribute('data-srcset');
+                }}
+                if (image.dataset.srcset) {{
+                    image.srcset = image.dataset.srcset;
+                    image.removeAttribute('data-srcset');
+                }}
+                image.src = image.dataset.src;
+                image.removeAttribute('data-src');
+            }}
+            image.classList.add('active');
             
             if (counter) {{
                 counter.textContent = currentIndex + 1;
@@ -938,8 +1376,8 @@ html = f'''<!DOCTYPE html>
             // Update icon
             icon.textContent = isDark ? '☀️' : '🌙';
             
-            // Refresh markers to update border colors
-            addMarkers();
+            // Update marker border colors
+            restyleMarkers();
             
             // Save preference
             localStorage.setItem('darkMode', isDark ? 'true' : 'false');
@@ -956,7 +1394,7 @@ html = f'''<!DOCTYPE html>
         }}
         
         // Initial load (markers will check dark mode status)
-        addMarkers();
+        updateMarkers();
         
         // Auto-collapse on mobile (run after DOM is ready)
         window.addEventListener('load', function() {{
@@ -972,9 +1410,10 @@ html = f'''<!DOCTYPE html>
         // Register Service Worker for PWA
         if ('serviceWorker' in navigator) {{
             window.addEventListener('load', function() {{
-                navigator.serviceWorker.register('/tokyo-food-finder/sw.js')
+                // Relative, so it works wherever the page is deployed
+                navigator.serviceWorker.register('sw.js')
                     .then(registration => {{
-                        console.log('ServiceWorker registered:', registration.scope);
+                        console.log('ServiceWorker registered:', registration.scope);{tile_precache_request(precache_tiles)}
                     }})
                     .catch(err => {{
                         console.log('ServiceWorker registration failed:', err);
@@ -1016,9 +1455,221 @@ html = f'''<!DOCTYPE html>
 </body>
 </html>'''
 
-# Save HTML
-with open('index.html', 'w', encoding='utf-8') as f:
-    f.write(html)
 
-print("\n✅ Built index.html with cuisine filters")
-print(f"📊 Total: {len(features)} restaurants with coordinates")
+def load_photo_manifest(photo_dir):
+    manifest = load_manifest(photo_dir)
+    print(f"📷 {len(manifest['photos'])} local photos from {photo_dir}")
+    if not manifest['photos']:
+        print("⚠️  No published photos yet, run photo_pipeline.py first")
+    return manifest
+
+
+def cluster_data(points):
+    clusters = build_clusters(points)
+    levels = clusters['levels']
+    print(f"🔵 Clusters for zooms {min(map(int, levels))}-{max(map(int, levels))}: "
+          + ', '.join(f"{len(level['centers'])}" for level in levels.values()))
+    return clusters
+
+
+def tile_manifest_for(args, points):
+    """Write tiles.json for --precache-tiles; returns its URL or None"""
+    if not args.precache_tiles:
+        return None
+    min_zoom, max_zoom = parse_zooms(args.precache_tiles)
+    if args.tile_url == TILE_URL:
+        print("⚠️  tile.openstreetmap.org's usage policy forbids bulk downloads; "
+              "use --tile-url for a tile server that allows offline use")
+    return write_manifest(build_manifest(points, args.tile_url, min_zoom, max_zoom), args.output)
+
+
+def print_category_counts(category_counts):
+    print(f"\nCategory counts:")
+    for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
+        print(f"  {cat}: {count}")
+
+
+def build(args):
+    """Build with the whole dataset in memory; returns (feature count, data URL, photos URL, tiles URL)"""
+    # Load restaurant data (with categories)
+    with open(args.input, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+
+    print(f"Loading {len(restaurants)} restaurants...")
+
+    # Create GeoJSON and categorize
+    geojson, category_counts = build_geojson(restaurants)
+    features = geojson['features']
+
+    print(f"Created GeoJSON with {len(features)} restaurants")
+    print_category_counts(category_counts)
+
+    if args.local_photos:
+        manifest = load_photo_manifest(args.local_photos)
+        for feature in features:
+            props = feature['properties']
+            props['photo_urls'] = local_photo_urls(props['photo_urls'], manifest)
+        geojson['photo_formats'] = manifest['formats']
+
+    if args.clusters:
+        geojson['clusters'] = cluster_data([feature_point(f) for f in features])
+
+    columnar = None
+    data_url = photos_url = None
+    if args.compact:
+        columnar = compact_data.encode(geojson)
+        if args.split_data:
+            # Photo references are nearly all of the bytes and only popups need them
+            photos_url = write_data_file(columnar.pop('photos'), args.data_dir, name='photos')
+        compact_data.print_size_report(geojson, columnar)
+    if args.split_data:
+        data_url = write_data_file(columnar if columnar is not None else geojson, args.data_dir)
+    tile_manifest = tile_manifest_for(args, [feature_point(f) for f in features])
+
+    html = render_html(geojson, category_counts, data_url, columnar, canvas=args.clusters,
+                       tile_url=args.tile_url, precache_tiles=tile_manifest is not None,
+                       city=get_city(args.city), photos_url=photos_url)
+
+    # Save HTML
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return len(features), data_url, photos_url, tile_manifest
+
+
+def write_feature_collection(write, features, extras, separators):
+    """Write {"type", "features", **extras} as JSON, copying the features from a spool file"""
+    item_separator, key_separator = separators
+    write(f'{{"type"{key_separator}"FeatureCollection"{item_separator}"features"{key_separator}[')
+    features.seek(0)
+    while True:
+        chunk = features.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        write(chunk)
+    write(']')
+    for key, value in extras.items():
+        write(f'{item_separator}"{key}"{key_separator}'
+              + json.dumps(value, ensure_ascii=False, separators=separators))
+    write('}')
+
+
+def stream_build(args):
+    """Build one record at a time; returns (feature count, data URL, photos URL, tiles URL)
+
+    Each feature is serialized as soon as it is read and spooled to a
+    temporary file; only coordinates, categories and ratings stay in memory
+    for the indexes. The page is then written around the spooled features
+    in chunks, so neither the input list, the feature list nor the page
+    string ever exists as a whole. The output is byte-identical to build().
+    """
+    manifest = load_photo_manifest(args.local_photos) if args.local_photos else None
+    # Inline data uses json.dumps defaults, the data file compact_data.dumps
+    separators = (',', ':') if args.split_data else (', ', ': ')
+
+    category_counts = {}
+    points = []
+    index_rows = []
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+        for r in iter_records(args.input):
+            feature = restaurant_feature(r)
+            if feature is None:
+                continue
+            props = feature['properties']
+            for cat in props['categories']:
+                category_counts[cat] = category_counts.get(cat, 0) + 1
+            if manifest is not None:
+                props['photo_urls'] = local_photo_urls(props['photo_urls'], manifest)
+            if points:
+                spool.write(separators[0])
+            spool.write(json.dumps(feature, ensure_ascii=False, separators=separators))
+            points.append(feature_point(feature))
+            index_rows.append((props['categories'], feature_rating(feature)))
+
+        print(f"Streamed {len(points)} restaurants with coordinates")
+        print_category_counts(category_counts)
+
+        # Same keys in the same order as build()
+        extras = {
+            'spatial_index': GridIndex.build(points).to_dict(),
+            'filter_index': build_filter_index_rows(index_rows),
+        }
+        del index_rows
+        if manifest is not None:
+            extras['photo_formats'] = manifest['formats']
+        if args.clusters:
+            extras['clusters'] = cluster_data(points)
+
+        def write_payload(write):
+            write_feature_collection(write, spool, extras, separators)
+
+        data_url = None
+        if args.split_data:
+            data_url = stream_data_file(write_payload, args.data_dir)
+        tile_manifest = tile_manifest_for(args, points)
+
+        html = render_html(None, category_counts, data_url, canvas=args.clusters, tile_url=args.tile_url,
+                           precache_tiles=tile_manifest is not None, feature_count=len(points),
+                           city=get_city(args.city))
+        head, tail = (html, '') if data_url else html.split(STREAMED_DATA)
+        del html
+
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(head)
+            if not data_url:
+                write_payload(f.write)
+            f.write(tail)
+        os.replace(tmp_path, args.output)
+    # Photos are only split off from the columnar payload, which --stream does not write
+    return len(points), data_url, None, tile_manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_city_argument(parser)
+    parser.add_argument('--input',
+                        help='JSON array of restaurants, or JSONL (one per line) with --stream '
+                             f'(default: the city\'s final file, {DATA_PATH} for Kyoto)')
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--split-data', action='store_true',
+                        help='write the data to a content-hashed file instead of inlining it')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--compact', action='store_true',
+                        help='ship the data in the columnar format from compact_data.py')
+    parser.add_argument('--local-photos', nargs='?', const=PHOTO_DIR, metavar='DIR',
+                        help=f'use thumbnails published by photo_pipeline.py (default dir: {PHOTO_DIR})')
+    parser.add_argument('--clusters', action='store_true',
+                        help='canvas markers plus precomputed per-zoom clusters, for 10k+ restaurants')
+    parser.add_argument('--precache-tiles', nargs='?', const=f'{MIN_ZOOM}-{MAX_ZOOM}', metavar='ZOOMS',
+                        help=f'let the service worker download the tiles around every restaurant '
+                             f'(default zooms: {MIN_ZOOM}-{MAX_ZOOM})')
+    parser.add_argument('--tile-url', default=TILE_URL,
+                        help='light tile layer template, e.g. a tile_precache.py --serve-stub server')
+    parser.add_argument('--stream', action='store_true',
+                        help='read and write the data incrementally, for 50k+ restaurant builds')
+    args = parser.parse_args()
+    if args.stream and args.compact:
+        # The columnar encoding needs every feature at once
+        parser.error('--stream does not support --compact')
+    args.input = args.input or get_city(args.city).final_path
+
+    print(f"📈 Peak RSS before build: {peak_rss_mb():.0f} MB")
+    if args.stream:
+        count, data_url, photos_url, tile_manifest = stream_build(args)
+    else:
+        count, data_url, photos_url, tile_manifest = build(args)
+
+    sw_path, precached = write_service_worker(args.output, data_url, tile_url=args.tile_url,
+                                              tile_manifest=tile_manifest,
+                                              lazy_data_urls=[photos_url] if photos_url else ())
+    print(f"🧰 Wrote {sw_path} precaching {precached} local assets")
+
+    print(f"\n✅ Built {args.output} with cuisine filters")
+    print(f"📊 Total: {count} restaurants with coordinates")
+    print(f"📦 HTML size: {os.path.getsize(args.output) / 1024:.0f} KB")
+    print(f"📈 Peak RSS after build: {peak_rss_mb():.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
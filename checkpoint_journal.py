@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL checkpoint journal for the enrichment scripts.
+
+Every processed restaurant is written as one fsync'd line, so a crash
+loses at most the row in flight. State is rebuilt by streaming the
+journal, and kyoto_final.json / kyoto_notfound.json are only written
+once, by compact(), at the end of a run.
+"""
+import glob
+import hashlib
+import json
+import os
+
+JOURNAL_PATH = 'kyoto_progress.jsonl'
+LEGACY_PROGRESS_PATH = 'kyoto_progress.json'
+
+ENRICHED = 'enriched'
+NOT_FOUND = 'not_found'
+
+
+def restaurant_key(restaurant):
+    """Stable identity of a kyoto_raw.json row (names alone are not unique)"""
+    return f"{restaurant['name']}|{restaurant.get('area', '')}|{restaurant.get('tabelog_rating', '')}"
+
+
+def shard_of(key, shards):
+    """Which of `shards` workers owns a key; stable across runs and restarts"""
+    return int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % shards
+
+def shard_path(shard, path=JOURNAL_PATH):
+    """Per-worker journal file, so worker processes never interleave writes"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.shard{shard}{ext}"
+
+def shard_paths(path=JOURNAL_PATH):
+    base, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(base)}.shard*{ext}"))
+
+
+class Journal:
+    """Append-only writer; one record per processed restaurant"""
+
+    def __init__(self, path=JOURNAL_PATH, fresh=False):
+        self.path = path
+        if fresh:
+            for stale in shard_paths(path):
+                os.remove(stale)
+        self._f = open(path, 'w' if fresh else 'a', encoding='utf-8')
+
+    def append(self, restaurant, status):
+        """Durably record `restaurant` (raw or enriched row) as ENRICHED/NOT_FOUND"""
+        record = {'key': restaurant_key(restaurant), 'status': status, 'restaurant': restaurant}
+        self._f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(path=JOURNAL_PATH):
+    """Yield journal records in write order, skipping a torn final line"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last line can be partial (crash mid-write)
+                print(f"⚠️  Skipping truncated journal line in {path}")
+
+
+def load_state(path=JOURNAL_PATH):
+    """Rebuild {key: record} from the journal and any shard journals; later records win"""
+    state = {}
+    for journal_path in [path, *shard_paths(path)]:
+        for record in replay(journal_path):
+            state[record['key']] = record
+    return state
+
+
+def merge_shards(path=JOURNAL_PATH):
+    """Fold finished shard journals into the main journal and delete them"""
+    paths = shard_paths(path)
+    if not paths:
+        return 0
+    merged = 0
+    with open(path, 'a', encoding='utf-8') as out:
+        for shard in paths:
+            for record in replay(shard):
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                merged += 1
+        out.flush()
+        os.fsync(out.fileno())
+    for shard in paths:
+        os.remove(shard)
+    return merged
+
+
+def migrate_legacy_progress(journal_path=JOURNAL_PATH, progress_path=LEGACY_PROGRESS_PATH):
+    """Seed a new journal from an old kyoto_progress.json snapshot, once"""
+    if os.path.exists(journal_path) or not os.path.exists(progress_path):
+        return False
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        progress = json.load(f)
+    with Journal(journal_path) as journal:
+        for restaurant in progress['enriched']:
+            journal.append(restaurant, ENRICHED)
+        for restaurant in progress['not_found']:
+            journal.append(restaurant, NOT_FOUND)
+    print(f"📦 Migrated {progress_path} into {journal_path}")
+    return True
+
+
+def split_state(state, order=None):
+    """(enriched, not_found) lists, in `order` (kyoto_raw.json rows) when given"""
+    records = list(state.values())
+    if order is not None:
+        position = {restaurant_key(r): i for i, r in enumerate(order)}
+        records.sort(key=lambda record: position.get(record['key'], len(position)))
+    enriched = [r['restaurant'] for r in records if r['status'] == ENRICHED]
+    not_found = [r['restaurant'] for r in records if r['status'] == NOT_FOUND]
+    return enriched, not_found
+
+
+def compact(state, order=None, final_path='kyoto_final.json', notfound_path='kyoto_notfound.json'):
+    """Write the end-of-run outputs from journal state; returns (enriched, not_found)"""
+    enriched, not_found = split_state(state, order)
+
+    with open(final_path, 'w', encoding='utf-8') as f:
+        json.dump(enriched, f, ensure_ascii=False, indent=2)
+
+    with open(notfound_path, 'w', encoding='utf-8') as f:
+        json.dump(not_found, f, ensure_ascii=False, indent=2)
+
+    return enriched, not_found
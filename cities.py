@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Per-city settings for the scrape -> enrich -> build pipeline.
+
+Every script that used to hardcode Kyoto takes --city and reads its Tabelog
+area, map view and file names from here. Kyoto keeps the original
+kyoto_*.json names, so existing checkouts need no renames.
+"""
+
+
+class City:
+    def __init__(self, slug, name, tabelog_area, center, zoom=12, emoji='🍽️'):
+        self.slug = slug
+        self.name = name
+        self.tabelog_area = tabelog_area  # tabelog.com/<area>/rstLst/
+        self.center = center              # (lat, lng)
+        self.zoom = zoom
+        self.emoji = emoji
+
+    @property
+    def raw_path(self):
+        return f'{self.slug}_raw.json'
+
+    @property
+    def final_path(self):
+        return f'{self.slug}_final.json'
+
+    @property
+    def notfound_path(self):
+        return f'{self.slug}_notfound.json'
+
+    @property
+    def journal_path(self):
+        return f'{self.slug}_progress.jsonl'
+
+    @property
+    def refresh_path(self):
+        return f'{self.slug}_refresh.jsonl'
+
+    def shard_info(self):
+        """What the multi-city page needs to know before a city's data is loaded"""
+        return {'name': self.name, 'center': list(self.center), 'zoom': self.zoom, 'emoji': self.emoji}
+
+
+CITIES = {city.slug: city for city in [
+    City('kyoto', 'Kyoto', 'kyoto', (35.0116, 135.7681), emoji='⛩️'),
+    City('tokyo', 'Tokyo', 'tokyo', (35.6812, 139.7671), emoji='🗼'),
+    City('osaka', 'Osaka', 'osaka', (34.6937, 135.5023), emoji='🏯'),
+]}
+DEFAULT_CITY = 'kyoto'
+
+
+def get_city(slug=DEFAULT_CITY):
+    try:
+        return CITIES[slug]
+    except KeyError:
+        raise ValueError(f"unknown city {slug!r} (known: {', '.join(CITIES)})") from None
+
+
+def add_city_argument(parser):
+    parser.add_argument('--city', choices=sorted(CITIES), default=DEFAULT_CITY,
+                        help=f'which city to work on (default: {DEFAULT_CITY})')
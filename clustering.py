@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Precomputed zoom-level clusters for large maps.
+
+Builds a supercluster-style hierarchy at build time. Starting from the
+individual restaurants at MAX_ZOOM + 1, each zoom level greedily merges
+the previous level's clusters that are within RADIUS_PX screen pixels of
+each other into their weighted centroid. Every level ships its cluster
+centers plus a direct restaurant -> cluster assignment, so the page only
+looks the current zoom up (and counts the restaurants that pass the
+filters) instead of clustering anything at load.
+"""
+import math
+
+MIN_ZOOM = 8
+MAX_ZOOM = 15     # above this every restaurant is drawn on its own
+RADIUS_PX = 50
+TILE_SIZE = 256
+
+
+def mercator_x(lng):
+    return lng / 360 + 0.5
+
+def mercator_y(lat):
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return min(max(y, 0.0), 1.0)
+
+def mercator_lng(x):
+    return (x - 0.5) * 360
+
+def mercator_lat(y):
+    return 360 * math.atan(math.exp((180 - y * 360) * math.pi / 180)) / math.pi - 90
+
+
+def _cluster_level(items, radius):
+    """Greedy merge of [(x, y, count)] within `radius`; returns (clusters, item -> cluster)"""
+    grid = {}
+    for i, (x, y, _) in enumerate(items):
+        grid.setdefault((int(x // radius), int(y // radius)), []).append(i)
+
+    clusters = []
+    parent = [-1] * len(items)
+    radius_sq = radius * radius
+    for i, (x, y, count) in enumerate(items):
+        if parent[i] >= 0:
+            continue
+        cluster = len(clusters)
+        parent[i] = cluster
+        sum_x, sum_y, total = x * count, y * count, count
+        gx, gy = int(x // radius), int(y // radius)
+        for cx in (gx - 1, gx, gx + 1):
+            for cy in (gy - 1, gy, gy + 1):
+                for j in grid.get((cx, cy), ()):
+                    if parent[j] >= 0:
+                        continue
+                    jx, jy, j_count = items[j]
+                    if (jx - x) ** 2 + (jy - y) ** 2 <= radius_sq:
+                        parent[j] = cluster
+                        sum_x += jx * j_count
+                        sum_y += jy * j_count
+                        total += j_count
+        clusters.append((sum_x / total, sum_y / total, total))
+    return clusters, parent
+
+
+def build_clusters(points, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, radius_px=RADIUS_PX):
+    """{min_zoom, max_zoom, levels: {zoom: {centers: [[lng, lat, count]], assign: [...]}}}
+
+    `points` are [(lat, lng)] in feature order; assign[i] is the index into
+    centers of the cluster holding points[i] at that zoom.
+    """
+    items = [(mercator_x(lng), mercator_y(lat), 1) for lat, lng in points]
+    assign = list(range(len(points)))
+    levels = {}
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        radius = radius_px / (TILE_SIZE * 2 ** zoom)
+        items, parent = _cluster_level(items, radius)
+        assign = [parent[a] for a in assign]
+        levels[str(zoom)] = {
+            'centers': [[round(mercator_lng(x), 6), round(mercator_lat(y), 6), count] for x, y, count in items],
+            'assign': assign,
+        }
+    return {'min_zoom': min_zoom, 'max_zoom': max_zoom, 'levels': levels}
+
+
+# Page side: cluster counts for the restaurants that pass the filters
+CLUSTER_JS = '''// Precomputed clusters (see clustering.py) for the current zoom, or null when
+        // every restaurant is drawn individually
+        function clusterLevel() {
+            const clusters = restaurants.clusters;
+            if (!clusters) return null;
+            const zoom = Math.round(map.getZoom());
+            if (zoom > clusters.max_zoom) return null;
+            return clusters.levels[Math.max(zoom, clusters.min_zoom)];
+        }
+
+        // Visible restaurants per cluster; a cluster of one is drawn as the restaurant itself
+        function clusterCounts(level, bits) {
+            const counts = new Uint32Array(level.centers.length);
+            for (let i = 0; i < level.assign.length; i++) {
+                if (hasBit(bits, i)) counts[level.assign[i]]++;
+            }
+            return counts;
+        }
+
+        function updateClusterMarkers(level, counts) {
+            clusterLayer.clearLayers();
+            if (!level) return;
+            level.centers.forEach(([lng, lat], c) => {
+                if (counts[c] < 2) return;
+                const size = counts[c] < 10 ? 30 : counts[c] < 100 ? 38 : 46;
+                L.marker([lat, lng], {
+                    icon: L.divIcon({
+                        className: 'cluster-icon',
+                        html: `<div style="width: ${size}px; height: ${size}px; line-height: ${size}px;">${counts[c]}</div>`,
+                        iconSize: [size, size]
+                    })
+                }).on('click', () => {
+                    map.setView([lat, lng], Math.min(map.getZoom() + 2, restaurants.clusters.max_zoom + 1));
+                }).addTo(clusterLayer);
+            });
+        }'''
+
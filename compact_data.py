@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Compact columnar encoding of the map's GeoJSON.
+
+Instead of one object per feature that repeats every property key, each
+property the page reads becomes one array (a column); the address and the
+raw opening-hours lines, which it never shows, are left out. Repetitive
+values (cuisines, areas, category lists, weekly hours tables and the days
+they are made of) are dictionary-encoded, coordinates are quantized to
+integers, and photo URLs are reduced to their photo_reference with the
+shared URL template stored once (so the API key no longer appears
+thousands of times). DECODER_JS turns the payload back into the
+FeatureCollection the page works with.
+
+The photo_reference tokens are 95% of the payload and do not compress, so
+encoding alone barely changes the gzipped size (1430 KB -> 1370 KB on the
+Kyoto data). The saving comes from build_map.py --split-data, which ships
+the photos as their own file, fetched after the markers are drawn: the
+data the first paint waits for is 87 KB (27 KB gzipped).
+
+tests/test_compact_data.py checks the round trip and the page decoder.
+"""
+import gzip
+import json
+
+FORMAT = 'columnar-3'
+
+# 1e-5 degrees is about 1.1 m on the ground, finer than any marker
+COORD_SCALE = 100000
+
+PHOTO_REF_PARAM = 'photo_reference='
+
+# Opening-hours minutes go up to 1440 (the midnight split), so 11 bits each
+DAY_BITS = 11
+DAY_MASK = (1 << DAY_BITS) - 1
+
+
+class Dictionary:
+    """Assigns a stable small integer to each distinct value"""
+
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def code(self, value):
+        key = json.dumps(value) if isinstance(value, list) else value
+        if key not in self._index:
+            self._index[key] = len(self.values)
+            self.values.append(value)
+        return self._index[key]
+
+
+def split_photo_url(url):
+    """(prefix, photo_reference, suffix) of a Places photo URL"""
+    start = url.find(PHOTO_REF_PARAM)
+    if start < 0:
+        return url, '', ''
+    start += len(PHOTO_REF_PARAM)
+    end = url.find('&', start)
+    if end < 0:
+        end = len(url)
+    return url[:start], url[start:end], url[end:]
+
+
+def pack_day(intervals):
+    """One day's flat [start, end, ...] minutes as one integer per interval"""
+    return [start << DAY_BITS | end for start, end in zip(intervals[::2], intervals[1::2])]
+
+
+def unpack_day(packed):
+    return [minute for value in packed for minute in (value >> DAY_BITS, value & DAY_MASK)]
+
+
+def encode_photos(features):
+    """{"templates", "photos"}: per feature, its photo references and URL templates"""
+    templates = Dictionary()
+    column = []
+    for f in features:
+        photos = []
+        for url in f['properties']['photo_urls'] or []:
+            prefix, ref, suffix = split_photo_url(url)
+            if not ref:
+                # Local photos (photo_pipeline.py): share the directory as the template
+                prefix, ref = url[:url.rfind('/') + 1], url[url.rfind('/') + 1:]
+            template = templates.code((prefix, suffix))
+            photos.append(ref if template == 0 else [template, ref])
+        column.append(photos)
+    return {'templates': [list(t) for t in templates.values], 'photos': column}
+
+
+def encode(geojson):
+    """Columnar payload for a FeatureCollection produced by build_map.py
+
+    Only the properties the page reads are kept. The photos are under
+    "photos" (see encode_photos) so build_map.py can ship them separately.
+    """
+    features = geojson['features']
+    cuisines, areas, category_lists = Dictionary(), Dictionary(), Dictionary()
+    hour_days, hours_tables = Dictionary(), Dictionary()
+
+    lngs = [round(f['geometry']['coordinates'][0] * COORD_SCALE) for f in features]
+    lats = [round(f['geometry']['coordinates'][1] * COORD_SCALE) for f in features]
+    origin = [min(lngs, default=0), min(lats, default=0)]
+
+    columns = {key: [] for key in ('name', 'tabelog_rating', 'google_rating', 'google_reviews',
+                                   'cuisine', 'area', 'categories', 'place_id', 'price_level', 'hours')}
+    for f in features:
+        p = f['properties']
+        columns['name'].append(p['name'])
+        columns['tabelog_rating'].append(p['tabelog_rating'])
+        columns['google_rating'].append(p['google_rating'])
+        columns['google_reviews'].append(p['google_reviews'])
+        columns['cuisine'].append(cuisines.code(p['cuisine']))
+        columns['area'].append(areas.code(p['area']))
+        # Whole lists, in their original order; a few dozen distinct combinations cover every row
+        columns['categories'].append(category_lists.code(p['categories']))
+        columns['place_id'].append(p['place_id'])
+        columns['price_level'].append(p['price_level'])
+        hours = p['hours']
+        if hours is not None:
+            # Most restaurants share their days with others, if not their whole week
+            hours = hours_tables.code([hour_days.code(pack_day(day)) for day in hours])
+        columns['hours'].append(hours)
+
+    return {
+        'format': FORMAT,
+        'count': len(features),
+        'coord_scale': COORD_SCALE,
+        'origin': origin,
+        'lng': [v - origin[0] for v in lngs],
+        'lat': [v - origin[1] for v in lats],
+        'dict': {
+            'cuisine': cuisines.values,
+            'area': areas.values,
+            'categories': category_lists.values,
+            'hour_days': hour_days.values,
+            'hours': hours_tables.values,
+        },
+        'columns': columns,
+        'photos': encode_photos(features),
+        'spatial_index': geojson.get('spatial_index'),
+        'clusters': geojson.get('clusters'),
+        'filter_index': geojson.get('filter_index'),
+        'photo_formats': geojson.get('photo_formats'),
+    }
+
+
+def decode_photos(features, photos):
+    """Set photo_urls on decoded `features` from an encode_photos() payload"""
+    templates = photos['templates']
+    for feature, refs in zip(features, photos['photos']):
+        urls = []
+        for photo in refs:
+            template, ref = (0, photo) if isinstance(photo, str) else photo
+            prefix, suffix = templates[template]
+            urls.append(prefix + ref + suffix)
+        feature['properties']['photo_urls'] = urls
+
+
+def decode(data):
+    """Inverse of encode() for the properties it keeps; the reference for DECODER_JS"""
+    d, c = data['dict'], data['columns']
+    scale = data['coord_scale']
+    weeks = [[unpack_day(d['hour_days'][day]) for day in week] for week in d['hours']]
+    features = []
+    for i in range(data['count']):
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [(data['origin'][0] + data['lng'][i]) / scale,
+                                (data['origin'][1] + data['lat'][i]) / scale]
+            },
+            "properties": {
+                "name": c['name'][i],
+                "tabelog_rating": c['tabelog_rating'][i],
+                "google_rating": c['google_rating'][i],
+                "google_reviews": c['google_reviews'][i],
+                "cuisine": d['cuisine'][c['cuisine'][i]],
+                "area": d['area'][c['area'][i]],
+                "categories": list(d['categories'][c['categories'][i]]),
+                "place_id": c['place_id'][i],
+                "price_level": c['price_level'][i],
+                "hours": None if c['hours'][i] is None else weeks[c['hours'][i]],
+                "photo_urls": []
+            }
+        })
+    if data.get('photos') is not None:
+        decode_photos(features, data['photos'])
+    return {"type": "FeatureCollection", "features": features,
+            "spatial_index": data['spatial_index'], "clusters": data.get('clusters'),
+            "filter_index": data['filter_index'], "photo_formats": data.get('photo_formats')}
+
+
+DECODER_JS = '''// Expand the columnar payload (see compact_data.py) into GeoJSON features
+        function decodeRestaurants(data) {
+            const d = data.dict, c = data.columns, scale = data.coord_scale;
+            const days = d.hour_days.map(day => day.flatMap(value => [value >> 11, value & 2047]));
+            const weeks = d.hours.map(week => week.map(day => days[day]));
+            const features = new Array(data.count);
+            for (let i = 0; i < data.count; i++) {
+                features[i] = {
+                    type: 'Feature',
+                    geometry: {
+                        type: 'Point',
+                        coordinates: [(data.origin[0] + data.lng[i]) / scale,
+                                      (data.origin[1] + data.lat[i]) / scale]
+                    },
+                    properties: {
+                        name: c.name[i],
+                        tabelog_rating: c.tabelog_rating[i],
+                        google_rating: c.google_rating[i],
+                        google_reviews: c.google_reviews[i],
+                        cuisine: d.cuisine[c.cuisine[i]],
+                        area: d.area[c.area[i]],
+                        categories: d.categories[c.categories[i]].slice(),
+                        place_id: c.place_id[i],
+                        price_level: c.price_level[i],
+                        hours: c.hours[i] === null ? null : weeks[c.hours[i]],
+                        photo_urls: []
+                    }
+                };
+            }
+            if (data.photos) decodePhotos(features, data.photos);
+            return {
+                type: 'FeatureCollection',
+                features: features,
+                spatial_index: data.spatial_index,
+                clusters: data.clusters,
+                filter_index: data.filter_index,
+                photo_formats: data.photo_formats
+            };
+        }
+
+        // Photo URLs, from the payload or from their own file (build_map.py --split-data)
+        function decodePhotos(features, photos) {
+            features.forEach((feature, i) => {
+                feature.properties.photo_urls = photos.photos[i].map(photo => {
+                    const [template, ref] = typeof photo === 'string' ? [0, photo] : photo;
+                    const [prefix, suffix] = photos.templates[template];
+                    return prefix + ref + suffix;
+                });
+            });
+        }'''
+
+
+def dumps(data):
+    """Serialized payload exactly as build_map.py ships it"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def size_report(geojson, payload):
+    """[(label, raw bytes, gzip bytes)] for the plain GeoJSON vs the columnar payload"""
+    rows = []
+    for label, text in (('geojson', json.dumps(geojson, ensure_ascii=False)),
+                        ('columnar', dumps(payload))):
+        raw = text.encode('utf-8')
+        rows.append((label, len(raw), len(gzip.compress(raw, compresslevel=9, mtime=0))))
+    return rows
+
+
+def print_size_report(geojson, payload):
+    (_, before, before_gz), (_, after, after_gz) = size_report(geojson, payload)
+    print(f"🗜️  Payload: {before / 1024:.0f} KB -> {after / 1024:.0f} KB ({before / after:.1f}x), "
+          f"gzip {before_gz / 1024:.0f} KB -> {after_gz / 1024:.0f} KB ({before_gz / after_gz:.1f}x)")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Cuisine keyword tables and the shared keyword matcher.
+
+Every table is compiled once into an Aho-Corasick automaton, so a text
+is scanned a single time no matter how many keywords or categories the
+table has, and every matching category comes back from that one scan.
+Used by build_map.py (filter categories) and the enrichment scripts
+(scoring a place against every cuisine at once).
+
+Run directly to fill in the filter categories of every restaurant that
+enrichment left without any (pipeline.py's categorize stage).
+"""
+import argparse
+import json
+from collections import deque
+
+CUISINES = ['Sushi', 'Ramen', 'Udon', 'Soba', 'Tempura', 'Unagi', 'Yakitori',
+            'Yakiniku', 'Tonkatsu', 'Kaiseki', 'Curry', 'Nabe', 'Izakaya',
+            'Cafe', 'Tea House', 'Bakery', 'Sweets', 'Italian', 'French',
+            'Chinese', 'Pizza', 'Steak']
+
+# Cuisine keywords matched against names and editorial summaries
+CUISINE_KEYWORDS = {
+    'Sushi': ['sushi', '寿司', 'すし', 'omakase'],
+    'Ramen': ['ramen', 'ラーメン', 'らーめん', 'tsukemen', 'つけ麺'],
+    'Udon': ['udon', 'うどん', '饂飩'],
+    'Soba': ['soba', 'そば', '蕎麦'],
+    'Tempura': ['tempura', '天ぷら', '天麩羅'],
+    'Unagi': ['unagi', 'うなぎ', '鰻', 'eel'],
+    'Yakitori': ['yakitori', '焼き鳥', '焼鳥', 'やきとり'],
+    'Yakiniku': ['yakiniku', '焼肉', 'wagyu', 'horumon', 'ホルモン'],
+    'Tonkatsu': ['tonkatsu', 'とんかつ', '豚かつ', 'katsu'],
+    'Kaiseki': ['kaiseki', '懐石', '会席', 'kappo', '割烹', 'ryotei', '料亭'],
+    'Curry': ['curry', 'カレー'],
+    'Nabe': ['nabe', '鍋', 'sukiyaki', 'shabu', 'すき焼き', 'しゃぶしゃぶ', 'yudofu', '湯豆腐'],
+    'Izakaya': ['izakaya', '居酒屋'],
+    'Cafe': ['cafe', 'café', 'coffee', '珈琲', 'カフェ', 'kissaten', '喫茶'],
+    'Tea House': ['tea house', 'teahouse', 'matcha', '茶屋', '茶房', '甘味処'],
+    'Bakery': ['bakery', 'boulangerie', 'パン', 'ベーカリー'],
+    'Sweets': ['sweets', 'dessert', 'patisserie', 'wagashi', '甘味', '和菓子', 'スイーツ'],
+    'Italian': ['italian', 'trattoria', 'osteria', 'イタリアン'],
+    'French': ['french', 'bistro', 'brasserie', 'フレンチ'],
+    'Chinese': ['chinese', 'dim sum', '中華', '餃子', 'gyoza'],
+    'Pizza': ['pizza', 'pizzeria', 'ピザ', 'ピッツァ'],
+    'Steak': ['steak', 'teppanyaki', 'ステーキ', '鉄板焼'],
+}
+
+# Map filter categories (Japanese Tabelog genres -> English categories)
+FILTER_CATEGORIES = {
+    'Sushi': ['寿司', 'すし', 'スシ', 'Sushi'],
+    'Ramen': ['ラーメン', 'らーめん', 'つけ麺', 'Ramen'],
+    'Tempura': ['天ぷら', 'てんぷら', 'Tempura'],
+    'Yakitori': ['焼き鳥', 'やきとり', 'Yakitori', '鳥料理'],
+    'Yakiniku': ['焼肉', 'やきにく', 'Yakiniku', 'ホルモン'],
+    'Tonkatsu': ['とんかつ', 'トンカツ', 'Tonkatsu', 'カツ'],
+    'Unagi': ['うなぎ', 'ウナギ', 'Unagi', '鰻'],
+    'Japanese': ['日本料理', '和食', 'Japanese', '懐石', '割烹'],
+    'Soba': ['そば', 'ソバ', 'Soba', '蕎麦'],
+    'Udon': ['うどん', 'ウドン', 'Udon'],
+    'Curry': ['カレー', 'Curry', 'カリー'],
+    'Bakery': ['パン', 'ブーランジェリー', 'Bakery', 'ベーカリー'],
+    'Desserts': ['ケーキ', '和菓子', 'スイーツ', 'Dessert', 'パティスリー', 'たい焼き'],
+    'Pizza': ['ピザ', 'Pizza', 'Pizzeria', 'ピッツェリア', 'Trattoria', 'Italian']
+}
+
+# Google place types that imply a cuisine ('restaurant', 'food', ... say nothing)
+GOOGLE_TYPE_CUISINES = {
+    'cafe': 'Cafe',
+    'coffee_shop': 'Cafe',
+    'bakery': 'Bakery',
+}
+
+# How much each source of evidence counts towards a cuisine
+NAME_WEIGHT = 3
+SUMMARY_WEIGHT = 2
+TYPE_WEIGHT = 2
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every keyword of a {category: [keywords]} table.
+
+    Matching is case-insensitive substring matching, like `kw.lower() in
+    text.lower()` for every keyword, but done in one pass over the text.
+    """
+
+    def __init__(self, table):
+        self.categories = list(table)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [0]  # bitmask of category indices ending at each node
+
+        for index, keywords in enumerate(table.values()):
+            for keyword in keywords:
+                node = 0
+                for ch in keyword.lower():
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][ch] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append(0)
+                    node = nxt
+                self._out[node] |= 1 << index
+
+        # Breadth-first failure links; each node inherits its suffix's matches
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def match_mask(self, text):
+        """Bitmask of matching category indices (bit i = self.categories[i])"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        found = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found |= out[node]
+        return found
+
+    def match(self, text):
+        """Matching categories, in table order"""
+        if not text:
+            return []
+        found = self.match_mask(text)
+        return [category for index, category in enumerate(self.categories) if found >> index & 1]
+
+
+cuisine_matcher = KeywordMatcher(CUISINE_KEYWORDS)
+filter_matcher = KeywordMatcher(FILTER_CATEGORIES)
+
+
+def match_keywords(text, matcher=cuisine_matcher):
+    """Cuisines whose keywords occur in `text` (case-insensitive)"""
+    return matcher.match(text)
+
+
+def categorize_cuisine(cuisine_text):
+    """Categorize a restaurant's cuisine into filter categories"""
+    return filter_matcher.match(cuisine_text)
+
+
+def score_cuisines(name='', types=(), summary=''):
+    """{cuisine: score} from everything we know about one place"""
+    scores = {}
+    for cuisine in match_keywords(name):
+        scores[cuisine] = scores.get(cuisine, 0) + NAME_WEIGHT
+    for cuisine in match_keywords(summary):
+        scores[cuisine] = scores.get(cuisine, 0) + SUMMARY_WEIGHT
+    for place_type in types:
+        cuisine = GOOGLE_TYPE_CUISINES.get(place_type)
+        if cuisine:
+            scores[cuisine] = scores.get(cuisine, 0) + TYPE_WEIGHT
+    return scores
+
+
+def pick_cuisine(scores):
+    """(winner, candidates): a clear winner, or the tied/unknown candidates to probe"""
+    if not scores:
+        return None, list(CUISINES)
+    best = max(scores.values())
+    top = [cuisine for cuisine in CUISINES if scores.get(cuisine) == best]
+    if len(top) == 1:
+        return top[0], []
+    return None, top
+
+
+def categorize_restaurants(restaurants):
+    """Give every restaurant without categories the ones from its cuisine text; returns how many"""
+    filled = 0
+    for r in restaurants:
+        if not r.get('categories'):
+            r['categories'] = categorize_cuisine(r.get('cuisine', ''))
+            filled += 1
+    return filled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default='kyoto_final.json')
+    parser.add_argument('--output', default='kyoto_categorized.json')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+    filled = categorize_restaurants(restaurants)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(restaurants, f, ensure_ascii=False, indent=2)
+    print(f"🏷️  {filled} of {len(restaurants)} restaurants categorized from their cuisine text -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,19 @@
 #!/usr/bin/env python3
 """
 Fast cuisine enrichment script for Kyoto restaurants.
-Uses Google Places API text search - faster than detailed lookups.
+Asks Place Details for the stored place_id's types only (the cuisine field
+tier), falling back to a text search for places without a place_id.
 """
 import json
 import os
 import time
 from datetime import datetime
 
-# Load API key
-with open('.env') as f:
-    for line in f:
-        if line.startswith('GOOGLE_PLACES'):
-            API_KEY = line.split('=')[1].strip()
-            break
+from cuisine_classifier import GOOGLE_TYPE_CUISINES, match_keywords
+from geojson_patches import PatchLog, apply_patches, read_patches
+from places_client import PlacesClient
 
-import requests
+client = PlacesClient()
 
 # Load restaurants needing enrichment
 with open('kyoto_geojson.json') as f:
@@ -35,89 +33,43 @@ for i, feat in enumerate(data['features']):
 
 print(f"Total needing enrichment: {len(needs_enrichment)}")
 
-# Load progress if exists
+# Load progress if exists (plus patches from an interrupted run)
 progress_file = 'enrichment_progress.json'
+patch_file = 'enrich_fast.patches.jsonl'
 processed = set()
 if os.path.exists(progress_file):
     with open(progress_file) as f:
         progress = json.load(f)
         processed = set(progress.get('processed', []))
-        print(f"Resuming - already processed: {len(processed)}")
+pending = read_patches(patch_file)
+processed |= set(pending)
+if processed:
+    print(f"Resuming - already processed: {len(processed)}")
 
 # Filter to process
 to_process = [r for r in needs_enrichment if r['place_id'] not in processed]
 print(f"Remaining to process: {len(to_process)}")
 
-# Cuisine keywords to search for
-CUISINE_KEYWORDS = {
-    'Sushi': ['sushi', '寿司'],
-    'Ramen': ['ramen', 'ラーメン'],
-    'Udon': ['udon', '饂饨'],
-    'Soba': ['soba', '蕎麦'],
-    'Tempura': ['tempura', '天ぷら'],
-    'Unagi': ['unagi', 'うなぎ', '鳗鱼'],
-    'Yakitori': ['yakitori', '焼き鳥'],
-    'Yakiniku': ['yakiniku', '焼肉'],
-    'Tonkatsu': ['tonkatsu', '豚かつ'],
-    'Kaiseki': ['kaiseki', '懐石'],
-    'Curry': ['curry', 'カレー'],
-    'Nabe': ['nabe', '鍋'],
-    'Izakaya': ['izakaya', '居酒屋'],
-    'Cafe': ['cafe', '咖啡', 'coffee'],
-    'Tea House': ['tea house', '茶屋', '茶房'],
-    'Bakery': ['bakery', 'パン', '面包'],
-    'Sweets': ['sweets', '甘味', ' sweets'],
-    'Italian': ['italian', 'イタリアン'],
-    'French': ['french', 'フレンチ'],
-    'Chinese': ['chinese', '中華'],
-    'Pizza': ['pizza', 'ピザ'],
-    'Steak': ['steak', 'ステーキ'],
-}
+def place_types(place_id, name):
+    """Google types for a place: one types-only details call, or a text search without a place_id"""
+    if place_id:
+        data = client.details(place_id, tier='cuisine', language='en')
+        if data.get('status') == 'OK':
+            return data['result'].get('types', [])
+    results = client.text_search(f"{name} Kyoto", language='en').get('results', [])
+    return results[0].get('types', []) if results else None
 
 def search_cuisine(place_id, name, address):
-    """Use text search to find cuisine type."""
+    """Map Google types and name keywords to cuisine categories."""
     try:
-        # Search by name + "Kyoto" + cuisine keywords
-        search_query = f"{name} Kyoto"
+        types = place_types(place_id, name)
         
-        url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-        params = {
-            'query': search_query,
-            'key': API_KEY,
-            'language': 'en'
-        }
-        
-        resp = requests.get(url, params=params, timeout=10)
-        results = resp.json().get('results', [])
-        
-        if not results:
+        if types is None:
             return None
-            
-        # Get the place types
-        place_types = results[0].get('types', [])
         
-        # Map Google types to our categories
-        type_mapping = {
-            'cafe': 'Cafe',
-            'coffee_shop': 'Cafe',
-            'bakery': 'Bakery',
-            'restaurant': None,  # Too generic
-            'food': None,
-            'meal_takeaway': None,
-            'meal_delivery': None,
-        }
-        
-        found_cuisines = set()
-        for ptype in place_types:
-            if ptype in type_mapping and type_mapping[ptype]:
-                found_cuisines.add(type_mapping[ptype])
-        
-        # Also search for specific cuisines in name
-        name_lower = name.lower()
-        for cuisine, keywords in CUISINE_KEYWORDS.items():
-            for kw in keywords:
-                if kw.lower() in name_lower:
-                    found_cuisines.add(cuisine)
+        # Google types that imply a cuisine, plus the cuisines named in the place's name
+        found_cuisines = {GOOGLE_TYPE_CUISINES[ptype] for ptype in types if ptype in GOOGLE_TYPE_CUISINES}
+        found_cuisines.update(match_keywords(name))
         
         return list(found_cuisines) if found_cuisines else None
         
@@ -125,9 +77,10 @@ def search_cuisine(place_id, name, address):
         print(f"  Error: {e}")
         return None
 
-# Process in batches
+# Process in batches; each result is one appended patch, not a file rewrite
 BATCH_SIZE = 25
 batch_num = 0
+patches = PatchLog(patch_file)
 
 for i in range(0, len(to_process), BATCH_SIZE):
     batch = to_process[i:i+BATCH_SIZE]
@@ -150,27 +103,36 @@ for i in range(0, len(to_process), BATCH_SIZE):
             idx = restaurant['index']
             old_cats = data['features'][idx]['properties'].get('categories', [])
             data['features'][idx]['properties']['categories'] = cuisines
+            patches.append(place_id, {'categories': cuisines})
             print(f"  ✓ {name}: {old_cats} → {cuisines}")
         else:
+            patches.append(place_id)
             print(f"  - {name}: No specific cuisine found")
         
         processed.add(place_id)
         
-        # Save progress
-        with open(progress_file, 'w') as f:
-            json.dump({'processed': list(processed), 'timestamp': datetime.now().isoformat()}, f)
-        
         # Rate limiting
         time.sleep(0.1)
     
-    # Save intermediate results
-    with open('kyoto_geojson.json', 'w') as f:
-        json.dump(data, f)
-    
-    print(f"Saved progress - {len(processed)}/{len(needs_enrichment)}")
+    print(f"Progress - {len(processed)}/{len(needs_enrichment)}")
+
+patches.close()
+
+# Apply all patches to kyoto_geojson.json in one pass, then fold them into
+# the progress file so the log can start empty next time
+changed = apply_patches([patch_file])
+with open(progress_file, 'w') as f:
+    json.dump({'processed': list(processed), 'timestamp': datetime.now().isoformat()}, f)
+os.remove(patch_file)
+print(f"Applied patches to {changed} features")
+
+# Show categories from pending patches of an interrupted run too
+for feat in data['features']:
+    feat['properties'].update(pending.get(feat['properties'].get('place_id'), {}))
 
 print(f"\n=== DONE ===")
 print(f"Processed: {len(processed)} restaurants")
+client.report_calls()
 
 # Final summary
 from collections import Counter
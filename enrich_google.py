@@ -1,128 +1,128 @@
 #!/usr/bin/env python3
 """
-Enrich Kyoto restaurants with Google Places data
+Enrich Kyoto restaurants with Google Places data (--city for another city)
 """
-import requests
-import time
+import argparse
 import json
-import os
-from dotenv import load_dotenv
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+from checkpoint_journal import ENRICHED, NOT_FOUND, Journal, compact, load_state
+from cities import add_city_argument, get_city
+from places_client import (MIN_GOOGLE_RATING, CacheMiss, LookupFailed, QuotaExceeded, add_client_arguments,
+                           client_from_args, search_google_places)
+from rate_limit import ThroughputMeter
 
-GOOGLE_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
+def enrich(restaurants, client, workers=8, city=None):
+    """Look up every raw row, journaling as it goes; returns (enriched, not_found, failed)
 
-def search_google_places(name, city="Kyoto"):
-    """Search Google Places API for restaurant"""
-    if not GOOGLE_API_KEY:
-        return None
+    Writes the city's final/notfound files at the end. Rows whose lookup
+    failed (network errors, unexpected statuses) are left out of the
+    journal, so resume_enrich.py retries them. On a quota error or an
+    offline cache miss the journal is kept for resume_enrich.py and the
+    exception propagates, without the row being journaled.
+    """
+    city = city or get_city()
+    passed = 0
+    failed = []
+    meter = ThroughputMeter(len(restaurants))
+    journal = Journal(city.journal_path, fresh=True)
     
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        'query': f"{name} {city} Japan",
-        'key': GOOGLE_API_KEY
-    }
+    def lookup(restaurant):
+        try:
+            return search_google_places(restaurant['name'], city.name, strict=True)
+        except LookupFailed as e:
+            return e
+    
+    # Lookups run in the pool; results are consumed in input order so the
+    # output is the same as a serial run
+    pool = ThreadPoolExecutor(max_workers=workers)
+    lookups = pool.map(lookup, restaurants)
     
     try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-        
-        if data['status'] == 'OK' and data['results']:
-            place = data['results'][0]
-            place_id = place.get('place_id')
+        for i, (restaurant, google_data) in enumerate(zip(restaurants, lookups), 1):
+            print(f"[{i}/{len(restaurants)}] {restaurant['name']}")
+            meter.maybe_report(i, client.live_calls)
+            
+            if isinstance(google_data, LookupFailed):
+                print(f"  ⚠️  Lookup failed, left for resume_enrich.py: {google_data}")
+                failed.append(restaurant)
+                continue
             
-            # Get place details
-            details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-            details_params = {
-                'place_id': place_id,
-                'fields': 'name,rating,user_ratings_total,formatted_address,geometry,place_id,opening_hours,price_level,photos',
-                'key': GOOGLE_API_KEY
-            }
+            if not google_data:
+                print("  ❌ Not found")
+                journal.append(restaurant, NOT_FOUND)
+                continue
             
-            details_response = requests.get(details_url, params=details_params, timeout=10)
-            details_data = details_response.json()
+            # Filter by Google rating
+            if google_data['google_rating'] and google_data['google_rating'] >= MIN_GOOGLE_RATING:
+                combined = {**restaurant, **google_data}
+                journal.append(combined, ENRICHED)
+                passed += 1
+                print(f"  ✅ Google {google_data['google_rating']} ⭐")
+            else:
+                print(f"  ❌ Google {google_data.get('google_rating', 'N/A')} ⭐")
+                journal.append(restaurant, NOT_FOUND)
             
-            if details_data['status'] == 'OK':
-                result = details_data['result']
-                
-                # Get up to 5 photo URLs
-                photo_urls = []
-                if 'photos' in result:
-                    for photo in result['photos'][:5]:
-                        photo_ref = photo['photo_reference']
-                        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photo_reference={photo_ref}&key={GOOGLE_API_KEY}"
-                        photo_urls.append(photo_url)
-                
-                return {
-                    'google_name': result.get('name'),
-                    'google_rating': result.get('rating'),
-                    'google_user_ratings_total': result.get('user_ratings_total'),
-                    'google_address': result.get('formatted_address'),
-                    'google_place_id': result.get('place_id'),
-                    'lat': result['geometry']['location']['lat'],
-                    'lng': result['geometry']['location']['lng'],
-                    'price_level': result.get('price_level'),
-                    'opening_hours': result.get('opening_hours', {}).get('weekday_text', []),
-                    'open_now': result.get('opening_hours', {}).get('open_now'),
-                    'photo_urls': photo_urls
-                }
-    except Exception as e:
-        print(f"  Google error: {e}")
+            if i % 100 == 0:
+                print(f"\n💾 {i} rows journaled: {passed} enriched so far\n")
+    except (QuotaExceeded, CacheMiss):
+        pool.shutdown(cancel_futures=True)
+        journal.close()
+        raise
     
-    return None
+    pool.shutdown()
+    journal.close()
+    
+    meter.report(len(restaurants), client.live_calls)
+    # Compact the journal into the final outputs
+    enriched, not_found = compact(load_state(journal.path), order=restaurants,
+                                  final_path=city.final_path, notfound_path=city.notfound_path)
+    return enriched, not_found, failed
 
 def main():
-    print("Loading Kyoto restaurants...")
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=8,
+                        help='concurrent lookups; --places-rate still caps the total (default: 8)')
+    add_city_argument(parser)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    client = client_from_args(args, pool_size=args.workers)
+    city = get_city(args.city)
+    
+    print(f"Loading {city.name} restaurants...")
     
-    with open('kyoto_raw.json', 'r', encoding='utf-8') as f:
+    with open(city.raw_path, 'r', encoding='utf-8') as f:
         restaurants = json.load(f)
     
     print(f"Found {len(restaurants)} restaurants to enrich\n")
     
-    enriched = []
-    not_found = []
-    
-    for i, restaurant in enumerate(restaurants, 1):
-        print(f"[{i}/{len(restaurants)}] {restaurant['name']}")
-        
-        google_data = search_google_places(restaurant['name'])
-        
-        if not google_data:
-            print("  ❌ Not found")
-            not_found.append(restaurant)
-            time.sleep(0.5)
-            continue
-        
-        # Filter by Google rating
-        if google_data['google_rating'] and google_data['google_rating'] >= 4.2:
-            combined = {**restaurant, **google_data}
-            enriched.append(combined)
-            print(f"  ✅ Google {google_data['google_rating']} ⭐")
-        else:
-            print(f"  ❌ Google {google_data.get('google_rating', 'N/A')} ⭐")
-            not_found.append(restaurant)
-        
-        time.sleep(0.5)
-        
-        # Save progress every 100 restaurants
-        if i % 100 == 0:
-            with open('kyoto_progress.json', 'w', encoding='utf-8') as f:
-                json.dump({'enriched': enriched, 'not_found': not_found, 'last_index': i}, f, ensure_ascii=False, indent=2)
-            print(f"\n💾 Progress saved: {len(enriched)} enriched so far\n")
+    try:
+        enriched, not_found, failed = enrich(restaurants, client, args.workers, city)
+    except QuotaExceeded as e:
+        print(f"\n🛑 Quota error, stopping: {e}")
+        print(f"Journal kept in {city.journal_path} - run resume_enrich.py --city {city.slug} "
+              f"to continue without repeating lookups")
+        sys.exit(3)
+    except CacheMiss as e:
+        print(f"\n🛑 Not in the offline cache, stopping: {e}")
+        print(f"Journal kept in {city.journal_path} - run resume_enrich.py --city {city.slug} "
+              f"online to look up the rest")
+        sys.exit(3)
     
     print(f"\n\n=== FINAL RESULTS ===")
+    if client.prefilter_rating is not None:
+        print(f"Details calls saved by two-phase lookup: {client.stats['details_saved']}")
     print(f"Total scraped (Tabelog 3.5+): {len(restaurants)}")
     print(f"Passed filters (Tabelog 3.5+ AND Google 4.2+): {len(enriched)}")
     print(f"Failed: {len(not_found)}")
+    client.report_calls()
     
-    # Save final results
-    with open('kyoto_final.json', 'w', encoding='utf-8') as f:
-        json.dump(enriched, f, ensure_ascii=False, indent=2)
-    
-    with open('kyoto_notfound.json', 'w', encoding='utf-8') as f:
-        json.dump(not_found, f, ensure_ascii=False, indent=2)
-    
-    print(f"\n✅ Saved {len(enriched)} Kyoto restaurants to kyoto_final.json")
+    print(f"\n✅ Saved {len(enriched)} {city.name} restaurants to {city.final_path}")
+    if failed:
+        print(f"⚠️  {len(failed)} lookups failed and are not in the journal - "
+              f"run resume_enrich.py --city {city.slug} to retry them")
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
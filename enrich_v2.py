@@ -1,20 +1,28 @@
 #!/usr/bin/env python3
 """
-Enhanced cuisine enrichment - search specifically for each cuisine type.
+Enhanced cuisine enrichment - classify each place against every cuisine at once.
+
+One details lookup per place (types, editorial summary) is scored
+locally against all cuisines; targeted "{cuisine} {name}" searches are
+only used to break ties, within a per-place call budget.
 """
+import argparse
 import json
 import os
-import time
-from datetime import datetime
-
-# Load API key
-with open('.env') as f:
-    for line in f:
-        if line.startswith('GOOGLE_PLACES'):
-            API_KEY = line.split('=')[1].strip()
-            break
 
-import requests
+from cuisine_classifier import pick_cuisine, score_cuisines
+from geojson_patches import PatchLog, apply_patches, read_patches
+from places_client import (NOT_FOUND_STATUSES, CacheMiss, LookupFailed, QuotaExceeded, add_client_arguments,
+                           client_from_args)
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--call-budget', type=int, default=4,
+                    help='max Places calls per place, including the first lookup (default: 4)')
+parser.add_argument('--limit', type=int,
+                    help='stop after this many places (default: all remaining)')
+add_client_arguments(parser)
+args = parser.parse_args()
+client = client_from_args(args)
 
 # Load restaurants
 with open('kyoto_geojson.json') as f:
@@ -34,89 +42,135 @@ for i, feat in enumerate(data['features']):
 
 print(f"Total needing enrichment: {len(needs_enrichment)}")
 
-# Load progress
+# Load progress (plus patches from an interrupted run)
 progress_file = 'enrich_v2_progress.json'
+patch_file = 'enrich_v2.patches.jsonl'
 processed = {}
 if os.path.exists(progress_file):
     with open(progress_file) as f:
         processed = json.load(f)
-        print(f"Resuming - already processed: {len(processed)}")
+for place_id, props in read_patches(patch_file).items():
+    processed[place_id] = props.get('categories', [None])[0]
+if processed:
+    print(f"Resuming - already processed: {len(processed)}")
+
+# The cuisine tier plus the summary; the name is already in the GeoJSON
+CLASSIFY_EXTRA_FIELDS = 'editorial_summary'
+
+def clean_search_name(name):
+    return name.replace('(', ' ').replace(')', ' ').split(',')[0][:30]
+
+def check_status(data, what):
+    """Raise LookupFailed unless `data` is an answer (OK or a real "not found")"""
+    status = data.get('status')
+    if status != 'OK' and status not in NOT_FOUND_STATUSES:
+        raise LookupFailed(f"{what}: unexpected status {status}")
 
-CUISINES = ['Sushi', 'Ramen', 'Udon', 'Soba', 'Tempura', 'Unagi', 'Yakitori', 
-            'Yakiniku', 'Tonkatsu', 'Kaiseki', 'Curry', 'Nabe', 'Izakaya', 
-            'Cafe', 'Tea House', 'Bakery', 'Sweets', 'Italian', 'French', 
-            'Chinese', 'Pizza', 'Steak']
+def lookup_place(place_id, search_name):
+    """(place, calls): types and editorial summary, by place_id or else a text search"""
+    calls = 0
+    if place_id:
+        calls += 1
+        data = client.details(place_id, tier='cuisine', fields=CLASSIFY_EXTRA_FIELDS, language='en')
+        check_status(data, 'details')
+        if data['status'] == 'OK':
+            return data['result'], calls
+    calls += 1
+    data = client.text_search(f"{search_name} Kyoto", language='en')
+    check_status(data, 'text search')
+    results = data.get('results', [])
+    return (results[0] if results else {}), calls
 
-def find_cuisine_for_place(name, address):
-    """Search for specific cuisine matches near the place."""
-    # Clean name for search
-    search_name = name.replace('(', ' ').replace(')', ' ').split(',')[0][:30]
+def probe_cuisine(cuisine, search_name):
+    """Targeted search: does "{cuisine} {name} Kyoto" find this place?"""
+    data = client.text_search(f"{cuisine} {search_name} Kyoto", language='en')
+    check_status(data, f'{cuisine} probe')
+    results = data.get('results', [])
+    if results:
+        # Check if result matches our place reasonably well
+        result_name = results[0].get('name', '').lower()
+        return search_name.lower()[:10] in result_name or result_name[:10] in search_name.lower()
+    return False
+
+def find_cuisine_for_place(place_id, name, budget):
+    """Score every cuisine from one lookup; probe ties with what is left of the call budget"""
+    search_name = clean_search_name(name)
+    
+    place, calls = lookup_place(place_id, search_name)
+    scores = score_cuisines(
+        name=name,
+        types=place.get('types', []),
+        summary=place.get('editorial_summary', {}).get('overview', ''),
+    )
+    cuisine, candidates = pick_cuisine(scores)
     
-    # Try searching for "cuisine + name" in Kyoto
-    for cuisine in CUISINES:
-        try:
-            query = f"{cuisine} {search_name} Kyoto"
-            url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-            params = {'query': query, 'key': API_KEY, 'language': 'en'}
-            
-            resp = requests.get(url, params=params, timeout=8)
-            results = resp.json().get('results', [])
-            
-            if results:
-                # Check if result matches our place reasonably well
-                result_name = results[0].get('name', '').lower()
-                if search_name.lower()[:10] in result_name or result_name[:10] in search_name.lower():
-                    return cuisine
-                    
-        except Exception as e:
-            continue
-        
-        time.sleep(0.05)  # Rate limit
+    # Only ambiguous places pay for targeted searches. A failed probe fails
+    # the place, so it is retried next run instead of settling on a guess
+    for candidate in candidates:
+        if calls >= budget:
+            break
+        calls += 1
+        if probe_cuisine(candidate, search_name):
+            return candidate, calls
     
-    return None
+    return cuisine, calls
 
 # Process
-total = len(needs_enrichment)
-start_idx = len(processed)
+todo = [r for r in needs_enrichment if r['place_id'] not in processed]
+if args.limit is not None:
+    todo = todo[:args.limit]
 
-print(f"Starting from index {start_idx}/{total}")
+print(f"Processing {len(todo)} of {len(needs_enrichment)} places (budget {args.call_budget} calls each)")
 
-for i in range(start_idx, min(start_idx + 100, total)):  # Process 100 at a time
-    restaurant = needs_enrichment[i]
+calls_used = 0
+done = 0
+patches = PatchLog(patch_file)
+for restaurant in todo:
     place_id = restaurant['place_id']
     name = restaurant['name']
     
-    if place_id in processed:
+    try:
+        cuisine, calls = find_cuisine_for_place(place_id, name, args.call_budget)
+    except QuotaExceeded as e:
+        print(f"🛑 Quota error, stopping: {e}")
+        break
+    except CacheMiss as e:
+        print(f"🛑 Not in the offline cache, stopping: {e}")
+        break
+    except Exception as e:
+        # LookupFailed or a network error: not recorded, so the next run retries it
+        print(f"  ⚠️  {name}: {e}, will retry next run")
         continue
-    
-    cuisine = find_cuisine_for_place(name, restaurant.get('address', ''))
+    calls_used += calls
     
     if cuisine:
         idx = restaurant['index']
-        old_cats = data['features'][idx]['properties'].get('categories', [])
         data['features'][idx]['properties']['categories'] = [cuisine]
-        print(f"  ✓ {name}: {cuisine}")
+        patches.append(place_id, {'categories': [cuisine]})
+        print(f"  ✓ {name}: {cuisine} ({calls} calls)")
     else:
+        patches.append(place_id)
         print(f"  - {name}: (keep Japanese)")
     
     processed[place_id] = cuisine
-    time.sleep(0.05)
+    done += 1
     
-    # Save progress every 10
-    if (i + 1) % 10 == 0:
-        with open(progress_file, 'w') as f:
-            json.dump(processed, f)
-        with open('kyoto_geojson.json', 'w') as f:
-            json.dump(data, f)
-        print(f"Saved progress: {i+1}/{total}")
-
-# Final save
+    if done % 10 == 0:
+        print(f"Progress: {len(processed)}/{len(needs_enrichment)}")
+
+patches.close()
+
+# Apply all patches to kyoto_geojson.json in one pass, then fold them into
+# the progress file so the log can start empty next time
+changed = apply_patches([patch_file])
 with open(progress_file, 'w') as f:
     json.dump(processed, f)
-with open('kyoto_geojson.json', 'w') as f:
-    json.dump(data, f)
+os.remove(patch_file)
+print(f"Applied patches to {changed} features")
 
-print(f"\n=== DONE ({i+1} processed) ===")
+print(f"\n=== DONE ({done} processed, {calls_used} calls, "
+      f"{calls_used / max(done, 1):.1f} per place, {client.live_calls} live) ===")
+client.report_calls()
 
 # Summary
 from collections import Counter
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Precomputed filter index for the map page.
+
+Every category gets a bitset over the features (bit i = feature i, packed
+into 32-bit words), and the features are listed in descending Google
+rating order so a minimum-rating filter is one binary search plus a
+prefix. The page answers any combination of cuisines, minimum rating and
+"open now" with word-wise AND/OR over typed arrays, and the per-cuisine
+counts in the filter panel are popcounts of the same bitsets. select()
+is the reference for the page's selectRestaurants(); tests/test_filter_index.py
+checks it against a plain per-feature filter.
+"""
+import bisect
+
+WORD_BITS = 32
+
+
+def bitset(indices, size):
+    words = [0] * ((size + WORD_BITS - 1) // WORD_BITS)
+    for i in indices:
+        words[i // WORD_BITS] |= 1 << (i % WORD_BITS)
+    return words
+
+
+def bitset_members(words):
+    return [w * WORD_BITS + b for w, word in enumerate(words) for b in range(WORD_BITS) if word >> b & 1]
+
+
+def build_filter_index(features):
+    """{size, categories: {category: words}, rating_order, ratings} for a feature list"""
+    return build_filter_index_rows(
+        [(feature['properties']['categories'], feature_rating(feature)) for feature in features])
+
+
+def build_filter_index_rows(rows):
+    """build_filter_index() from [(categories, rating)] rows, in feature order"""
+    size = len(rows)
+    members = {}
+    for i, (categories, _) in enumerate(rows):
+        for category in categories:
+            members.setdefault(category, set()).add(i)
+    order = sorted(range(size), key=lambda i: (-rows[i][1], i))
+    return {
+        'size': size,
+        'categories': {category: bitset(indices, size) for category, indices in sorted(members.items())},
+        'rating_order': order,
+        'ratings': [rows[i][1] for i in order],  # descending
+    }
+
+
+def feature_rating(feature):
+    return feature['properties']['google_rating'] or 0
+
+
+def select(index, min_rating, categories=(), allowed=None):
+    """Sorted feature indices passing the filters; `allowed` is an optional extra bitset"""
+    size = index['size']
+    # ratings are descending; count how many are >= min_rating
+    negated = [-rating for rating in index['ratings']]
+    prefix = bisect.bisect_right(negated, -min_rating)
+    words = bitset(index['rating_order'][:prefix], size)
+
+    if categories:
+        union = [0] * len(words)
+        for category in categories:
+            for w, word in enumerate(index['categories'].get(category, ())):
+                union[w] |= word
+        words = [a & b for a, b in zip(words, union)]
+    if allowed is not None:
+        words = [a & b for a, b in zip(words, allowed)]
+    return bitset_members(words)
+
+
+FILTER_JS = '''// Bitsets over the features (bit i = restaurants.features[i]); see filter_index.py
+        function popcount(bits) {
+            let total = 0;
+            for (let w = 0; w < bits.length; w++) {
+                let x = bits[w];
+                x -= (x >>> 1) & 0x55555555;
+                x = (x & 0x33333333) + ((x >>> 2) & 0x33333333);
+                total += (((x + (x >>> 4)) & 0x0F0F0F0F) * 0x01010101) >>> 24;
+            }
+            return total;
+        }
+
+        function hasBit(bits, i) {
+            return (bits[i >>> 5] >>> (i & 31)) & 1;
+        }
+
+        function andBits(a, b) {
+            const out = new Uint32Array(a.length);
+            for (let w = 0; w < a.length; w++) out[w] = a[w] & b[w];
+            return out;
+        }
+
+        // Typed arrays and per-threshold / per-minute results, rebuilt when the data changes
+        let filterCache = { source: null };
+
+        // The empty placeholder a --split-data page starts with has no index: nothing matches
+        const EMPTY_FILTER_INDEX = { size: 0, categories: {}, ratings: [], rating_order: [] };
+
+        function filterIndex() {
+            if (filterCache.source !== restaurants) {
+                const index = restaurants.filter_index || EMPTY_FILTER_INDEX;
+                const words = Math.ceil(index.size / 32);
+                const categories = {};
+                for (const [category, bits] of Object.entries(index.categories)) {
+                    categories[category] = Uint32Array.from(bits);
+                }
+                filterCache = {
+                    source: restaurants,
+                    index: index,
+                    empty: new Uint32Array(words),
+                    categories: categories,
+                    rating: {},
+                    openKey: null,
+                    open: null
+                };
+            }
+            return filterCache;
+        }
+
+        function categoryBits(category) {
+            const cache = filterIndex();
+            return cache.categories[category] || cache.empty;
+        }
+
+        // Restaurants rated >= minRating: binary search the descending ratings, set the prefix
+        function ratingBits(minRating) {
+            const cache = filterIndex();
+            if (!cache.rating[minRating]) {
+                const ratings = cache.index.ratings;
+                let lo = 0, hi = ratings.length;
+                while (lo < hi) {
+                    const mid = (lo + hi) >>> 1;
+                    if (ratings[mid] >= minRating) lo = mid + 1; else hi = mid;
+                }
+                const bits = new Uint32Array(cache.empty.length);
+                for (let k = 0; k < lo; k++) {
+                    const i = cache.index.rating_order[k];
+                    bits[i >>> 5] |= 1 << (i & 31);
+                }
+                cache.rating[minRating] = bits;
+            }
+            return cache.rating[minRating];
+        }
+
+        // Restaurants not known to be closed at `now`; recomputed at most once a minute
+        function openBits(now) {
+            const cache = filterIndex();
+            const key = now[0] * 1440 + now[1];
+            if (cache.openKey !== key) {
+                const bits = new Uint32Array(cache.empty.length);
+                restaurants.features.forEach((feature, i) => {
+                    if (isOpenAt(feature.properties.hours, now) !== false) bits[i >>> 5] |= 1 << (i & 31);
+                });
+                cache.open = bits;
+                cache.openKey = key;
+            }
+            return cache.open;
+        }
+
+        // {base: rating (+ open) matches, bits: base AND any selected cuisine}
+        function selectRestaurants(filters) {
+            let base = ratingBits(filters.minRating);
+            if (filters.openNowOnly) base = andBits(base, openBits(filters.now));
+            if (filters.selectedCuisines.length === 0) return { base: base, bits: base };
+            const union = new Uint32Array(base.length);
+            for (const cuisine of filters.selectedCuisines) {
+                const bits = categoryBits(cuisine);
+                for (let w = 0; w < union.length; w++) union[w] |= bits[w];
+            }
+            return { base: base, bits: andBits(base, union) };
+        }'''
+
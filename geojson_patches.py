@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Incremental updates for kyoto_geojson.json.
+
+Enrichment scripts append one small patch per processed place (keyed by
+place_id) instead of rewriting the whole GeoJSON after every batch; the
+patches are applied to the file in a single pass at the end of a run, or
+on demand by running this script.
+"""
+import argparse
+import glob
+import json
+import os
+
+GEOJSON_PATH = 'kyoto_geojson.json'
+PATCH_GLOB = '*.patches.jsonl'
+
+
+class PatchLog:
+    """Append-only log of {place_id, set: {property: value}} records"""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'a', encoding='utf-8')
+
+    def append(self, place_id, properties=None):
+        """Record the properties to set on a feature ({} = processed, unchanged)"""
+        record = {'place_id': place_id, 'set': properties or {}}
+        self._f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_patches(path):
+    """{place_id: merged properties} from one log; later records win"""
+    patches = {}
+    if not os.path.exists(path):
+        return patches
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from a crash
+            patches.setdefault(record['place_id'], {}).update(record['set'])
+    return patches
+
+
+def apply_patches(patch_paths, geojson_path=GEOJSON_PATH):
+    """Apply every pending patch in one read + one atomic write; returns features changed"""
+    merged = {}
+    for path in patch_paths:
+        for place_id, properties in read_patches(path).items():
+            merged.setdefault(place_id, {}).update(properties)
+    merged = {place_id: props for place_id, props in merged.items() if props}
+    if not merged:
+        return 0
+
+    with open(geojson_path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    changed = 0
+    for feature in data['features']:
+        properties = merged.get(feature['properties'].get('place_id'))
+        if properties:
+            feature['properties'].update(properties)
+            changed += 1
+
+    tmp_path = geojson_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, geojson_path)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('patches', nargs='*',
+                        help=f'patch logs to apply (default: every {PATCH_GLOB})')
+    parser.add_argument('--geojson', default=GEOJSON_PATH)
+    args = parser.parse_args()
+
+    paths = args.patches or sorted(glob.glob(PATCH_GLOB))
+    pending = sum(len(read_patches(path)) for path in paths)
+    print(f"{pending} pending patches in {len(paths)} logs")
+
+    changed = apply_patches(paths, args.geojson)
+    print(f"✅ Updated {changed} features in {args.geojson}")
+    print("Patch logs are kept; the enrichment scripts fold them into their progress files")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Build several cities into one app: a shared shell plus per-city data shards.
+
+Every city runs its pipeline stages in its own worker process:
+  scrape  Tabelog crawl (scrape_kyoto.py --async-crawl) -> <city>_raw.json
+  enrich  pooled Google lookups (enrich_google.py)      -> <city>_final.json
+  shard   GeoJSON with its indexes                      -> data/<city>.<hash>.json
+
+A slow or failing city never holds up the others, and its worker output
+goes to <city>_build.log. The shell (index.html, sw.js) is written once
+all workers finish. It has a city picker and fetches a city's shard the
+first time that city is shown. The service worker keeps shards across
+updates without precaching them, so adding a city costs the other cities
+nothing. A city whose pipeline failed keeps its previous shard, when
+there is one.
+
+    python multi_city.py --cities kyoto tokyo                      # shards from existing data
+    python multi_city.py --cities kyoto tokyo osaka --stages scrape,enrich,shard
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import compact_data
+from build_map import DATA_DIR, OUTPUT_PATH, build_geojson, render_html, write_data_file
+from cities import CITIES, DEFAULT_CITY, get_city
+from clustering import build_clusters
+from places_cache import CACHE_PATH, PlacesCache
+from places_client import DEFAULT_RATE, PlacesClient, QuotaExceeded, set_default_client
+from service_worker import write_service_worker
+from tile_precache import TILE_URL
+
+STAGES = ('scrape', 'enrich', 'shard')
+
+
+def run_stages(city, stages, options):
+    """The pipeline for one city; returns its shard info, or None without a shard stage"""
+    if 'scrape' in stages:
+        from scrape_kyoto import crawl_tabelog_kyoto_async
+        restaurants = asyncio.run(crawl_tabelog_kyoto_async(min_rating=3.5, area=city.tabelog_area))
+        with open(city.raw_path, 'w', encoding='utf-8') as f:
+            json.dump(restaurants, f, ensure_ascii=False, indent=2)
+        print(f"Scraped {len(restaurants)} {city.name} restaurants into {city.raw_path}")
+
+    if 'enrich' in stages:
+        from enrich_google import enrich
+        with open(city.raw_path, 'r', encoding='utf-8') as f:
+            restaurants = json.load(f)
+        client = PlacesClient(cache=PlacesCache(options['cache_path']), rate=options['places_rate'],
+                              pool_size=options['workers'])
+        set_default_client(client)
+        enriched, _, failed = enrich(restaurants, client, options['workers'], city)
+        print(f"Enriched {len(enriched)} {city.name} restaurants into {city.final_path}")
+        if failed:
+            print(f"⚠️  {len(failed)} lookups failed and are not in {city.journal_path}; "
+                  f"resume_enrich.py --city {city.slug} retries them")
+
+    if 'shard' not in stages:
+        return None
+    with open(city.final_path, 'r', encoding='utf-8') as f:
+        geojson, category_counts = build_geojson(json.load(f))
+    features = geojson['features']
+    if options['clusters']:
+        geojson['clusters'] = build_clusters(
+            [(f['geometry']['coordinates'][1], f['geometry']['coordinates'][0]) for f in features])
+    data = compact_data.encode(geojson) if options['compact'] else geojson
+    url = write_data_file(data, options['data_dir'], name=city.slug)
+    return {'url': url, 'count': len(features), 'category_counts': category_counts}
+
+
+def run_city(slug, stages, options):
+    """Worker process entry point: run_stages() with its output in <city>_build.log"""
+    city = get_city(slug)
+    with open(f'{slug}_build.log', 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            return run_stages(city, stages, options)
+        except Exception:
+            traceback.print_exc()
+            raise
+
+
+def existing_shard(slug, data_dir=DATA_DIR):
+    """URL of the shard an earlier run left for `slug`, if any"""
+    paths = glob.glob(os.path.join(data_dir, f'{glob.escape(slug)}.*.json'))
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime).replace(os.sep, '/')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cities', nargs='+', choices=sorted(CITIES), default=[DEFAULT_CITY])
+    parser.add_argument('--stages', default='shard',
+                        help=f'comma-separated subset of {",".join(STAGES)} (default: shard)')
+    parser.add_argument('--processes', type=int, help='worker processes (default: one per city)')
+    parser.add_argument('--workers', type=int, default=8, help='lookup threads per city in the enrich stage')
+    parser.add_argument('--places-rate', type=float, default=DEFAULT_RATE,
+                        help=f'max live Places calls per second across all cities (default: {DEFAULT_RATE})')
+    parser.add_argument('--cache-path', default=CACHE_PATH)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--compact', action='store_true',
+                        help='ship the shards in the columnar format from compact_data.py')
+    parser.add_argument('--clusters', action='store_true',
+                        help='canvas markers plus precomputed per-zoom clusters, for 10k+ restaurants')
+    parser.add_argument('--tile-url', default=TILE_URL)
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    processes = args.processes or len(args.cities)
+    options = {
+        'workers': args.workers,
+        # One quota for the whole run, split between the cities running at once
+        'places_rate': args.places_rate / min(processes, len(args.cities)),
+        'cache_path': args.cache_path,
+        'data_dir': args.data_dir,
+        'compact': args.compact,
+        'clusters': args.clusters,
+    }
+
+    print(f"🏙️  {', '.join(args.cities)}: {' -> '.join(stages)} in {processes} processes")
+    results = {}
+    failed = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(run_city, slug, stages, options): slug for slug in args.cities}
+        for future in as_completed(futures):
+            slug = futures[future]
+            try:
+                results[slug] = future.result()
+            except QuotaExceeded as e:
+                failed.append(slug)
+                print(f"🛑 {slug}: quota error ({e}); lookups so far are kept in {get_city(slug).journal_path}, "
+                      f"resume with resume_enrich.py --city {slug}")
+            except Exception as e:
+                failed.append(slug)
+                print(f"❌ {slug}: {type(e).__name__}: {e} (see {slug}_build.log)")
+            else:
+                shard = results[slug]
+                print(f"✅ {slug}: " + (f"{shard['count']} restaurants in {shard['url']}" if shard else 'done'))
+
+    if 'shard' not in stages:
+        sys.exit(1 if failed else 0)
+
+    # Shell: every city, in the order given, with its shard URL
+    cities = {}
+    category_counts = {}
+    total = 0
+    for slug in args.cities:
+        shard = results.get(slug)
+        if shard is None:
+            url = existing_shard(slug, args.data_dir)
+            if url is None:
+                print(f"⚠️  {slug} has no shard, leaving it out of the app")
+                continue
+            print(f"♻️  {slug}: keeping the previous shard {url}")
+            shard = {'url': url, 'count': 0, 'category_counts': {}}
+        cities[slug] = {**get_city(slug).shard_info(), 'url': shard['url']}
+        total += shard['count']
+        for cat, count in shard['category_counts'].items():
+            category_counts[cat] = category_counts.get(cat, 0) + count
+
+    if not cities:
+        print("❌ No city has data, nothing to build")
+        sys.exit(1)
+
+    html = render_html(None, category_counts, columnar=True if args.compact else None, canvas=args.clusters,
+                       tile_url=args.tile_url, feature_count=total,
+                       city=get_city(next(iter(cities))), cities=cities)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(html)
+    sw_path, precached = write_service_worker(args.output, tile_url=args.tile_url,
+                                              lazy_data_urls=[info['url'] for info in cities.values()])
+
+    print(f"\n✅ Built {args.output} for {len(cities)} cities ({total} restaurants)")
+    print(f"🧰 Wrote {sw_path} precaching {precached} local assets, shards cached on first use")
+    print(f"📦 Shell size: {len(html.encode('utf-8')) / 1024:.0f} KB")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Parse Google Places `weekday_text` opening hours into a weekly table.
+
+    ["Monday: 11:30 AM – 2:00 PM, 5:30 – 10:00 PM", ..., "Sunday: Closed"]
+
+becomes seven lists (Monday first) of flat [start, end, start, end, ...]
+minute-of-day pairs, end exclusive. Ranges that run past midnight are
+split onto the next day (Sunday wraps to Monday), so the page can answer
+"open at time T" by scanning the one or two intervals of a single day.
+tests/test_opening_hours.py holds the cases, taken from real Places strings.
+"""
+import re
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAY_MINUTES = 24 * 60
+
+# Google separates times with thin/narrow no-break spaces and an en dash
+_SPACES = re.compile(r'\s+')
+_RANGE_SEP = re.compile(r'\s*[–—-]\s*')
+_TIME = re.compile(r'^(\d{1,2})(?::(\d{2}))?\s*([AP]M)?$', re.IGNORECASE)
+
+
+def _parse_time(text):
+    """(hour, minute, 'AM'/'PM'/None)"""
+    match = _TIME.match(text)
+    if not match:
+        raise ValueError(f"unrecognised time {text!r}")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = match.group(3).upper() if match.group(3) else None
+    if minute > 59 or hour > (12 if meridiem else 24):
+        raise ValueError(f"time out of range {text!r}")
+    return hour, minute, meridiem
+
+
+def _to_minutes(hour, minute, meridiem):
+    if meridiem is not None:
+        hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+    return hour * 60 + minute
+
+
+def parse_range(text):
+    """(start, end) minutes for 'H:MM [AM|PM] – H:MM AM|PM'; end may exceed 1440"""
+    parts = _RANGE_SEP.split(text.strip())
+    if len(parts) != 2:
+        raise ValueError(f"unrecognised range {text!r}")
+    start_h, start_m, start_meridiem = _parse_time(parts[0])
+    end_h, end_m, end_meridiem = _parse_time(parts[1])
+    # "5:30 – 10:00 PM": the first time shares the second one's AM/PM
+    if start_meridiem is None:
+        start_meridiem = end_meridiem
+
+    start = _to_minutes(start_h, start_m, start_meridiem)
+    end = _to_minutes(end_h, end_m, end_meridiem)
+    if end <= start:
+        end += DAY_MINUTES  # crosses midnight ("6:00 PM – 2:00 AM", "... – 12:00 AM")
+    return start, end
+
+
+def parse_day(text):
+    """(weekday index, [(start, end), ...]) for one 'Monday: ...' line"""
+    day, _, spec = _SPACES.sub(' ', text).partition(':')
+    day = day.strip()
+    if day not in DAYS:
+        raise ValueError(f"unrecognised weekday in {text!r}")
+    spec = spec.strip()
+    if spec.lower() == 'closed':
+        return DAYS.index(day), []
+    if spec.lower() in ('open 24 hours', '24 hours'):
+        return DAYS.index(day), [(0, DAY_MINUTES)]
+    return DAYS.index(day), [parse_range(part) for part in spec.split(',')]
+
+
+def _merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def parse_weekday_text(lines):
+    """Weekly table for a weekday_text list; raises ValueError on unparseable input"""
+    days = [[] for _ in DAYS]
+    for line in lines:
+        day, ranges = parse_day(line)
+        for start, end in ranges:
+            offset = 0
+            while start < end:
+                # Cut at each midnight and carry the rest into the following day
+                cut = min(end, DAY_MINUTES)
+                days[(day + offset) % 7].append((start, cut))
+                start, end = 0, end - DAY_MINUTES
+                offset += 1
+    return [[minute for interval in _merge(intervals) for minute in interval] for intervals in days]
+
+
+def weekly_table(lines):
+    """Weekly table, or None when there are no hours or they cannot be parsed"""
+    if not lines:
+        return None
+    try:
+        return parse_weekday_text(lines)
+    except ValueError:
+        return None
+
+
+def is_open(table, weekday, minute):
+    """Open at `minute` past midnight on `weekday` (0 = Monday)? None if unknown"""
+    if table is None:
+        return None
+    intervals = table[weekday]
+    return any(intervals[i] <= minute < intervals[i + 1] for i in range(0, len(intervals), 2))
+
+
+# Browser counterpart of is_open(); restaurants are in Japan, so time is JST
+IS_OPEN_JS = '''// Minute-of-week in Japan time (UTC+9, no DST): [weekday (0 = Monday), minute]
+        function japanTime(date) {
+            const jst = new Date(date.getTime() + 9 * 60 * 60 * 1000);
+            return [(jst.getUTCDay() + 6) % 7, jst.getUTCHours() * 60 + jst.getUTCMinutes()];
+        }
+
+        // Open at `when` (from japanTime) per the weekly hours table; null if unknown
+        function isOpenAt(hours, when) {
+            if (!hours) return null;
+            const intervals = hours[when[0]];
+            for (let i = 0; i < intervals.length; i += 2) {
+                if (intervals[i] <= when[1] && when[1] < intervals[i + 1]) return true;
+            }
+            return false;
+        }'''
+
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Download restaurant photos once and publish small local copies.
+
+Every Places photo_reference in kyoto_final.json is fetched a single time
+and turned into a thumbnail (WebP, plus AVIF when Pillow can write it) and
+a medium-size WebP under content-hashed names in photos/. The manifest
+(photos/manifest.json) maps each photo_reference to its files, so reruns
+only download new references. `build_map.py --local-photos` then points
+the popups at these files instead of the key-bearing Photo API URLs.
+
+Pillow is optional: without it the downloaded image is published as-is.
+
+Testing without Google:
+    python photo_pipeline.py --serve-stub 8766 &
+    PLACES_BASE_URL=http://127.0.0.1:8766 python photo_pipeline.py
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from compact_data import split_photo_url
+from places_client import DEFAULT_RATE, PlacesClient, QuotaExceeded
+
+try:
+    from PIL import Image
+    Image.init()
+except ImportError:
+    Image = None
+
+PHOTO_DIR = 'photos'
+MANIFEST_NAME = 'manifest.json'
+DATA_PATH = 'kyoto_final.json'
+
+SOURCE_WIDTH = 800
+THUMB_WIDTH = 400     # popup carousel is ~250 px wide, x1.5 for high-DPI screens
+MEDIUM_WIDTH = 800
+WEBP_QUALITY = 75
+AVIF_QUALITY = 55
+
+# Bump when the variants change so every photo is regenerated under new names
+PIPELINE_VERSION = 1
+
+SOURCE_EXTENSIONS = {b'\xff\xd8\xff': 'jpg', b'\x89PNG': 'png', b'RIFF': 'webp'}
+
+
+def can_write(format_name):
+    return Image is not None and format_name in Image.SAVE
+
+
+def source_extension(data):
+    for magic, extension in SOURCE_EXTENSIONS.items():
+        if data.startswith(magic):
+            return extension
+    return 'jpg'
+
+
+def render_variant(image, width, format_name, quality):
+    """Encoded bytes of `image` scaled down to `width` (never up)"""
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format_name, quality=quality)
+    return out.getvalue()
+
+
+def make_variants(data):
+    """{variant name: (extension, bytes)} for one downloaded photo"""
+    if Image is None:
+        return {'thumb': (source_extension(data), data)}
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    variants = {
+        'thumb': ('webp', render_variant(image, THUMB_WIDTH, 'WEBP', WEBP_QUALITY)),
+        'medium': ('webp', render_variant(image, MEDIUM_WIDTH, 'WEBP', WEBP_QUALITY)),
+    }
+    if can_write('AVIF'):
+        variants['thumb_avif'] = ('avif', render_variant(image, THUMB_WIDTH, 'AVIF', AVIF_QUALITY))
+    return variants
+
+
+def publish(data, photo_dir):
+    """Write every variant of a photo; returns {variant name: path}"""
+    digest = hashlib.sha256(data + f'v{PIPELINE_VERSION}'.encode()).hexdigest()[:16]
+    suffixes = {'thumb': 't', 'medium': 'm', 'thumb_avif': 't'}  # the page derives -m/.avif from -t
+    paths = {}
+    for name, (extension, content) in make_variants(data).items():
+        path = f"{photo_dir}/{digest}-{suffixes[name]}.{extension}"
+        if not os.path.exists(path):
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        paths[name] = path
+    return paths
+
+
+def photo_references(restaurants):
+    """Every distinct photo_reference, in data order"""
+    seen = {}
+    for r in restaurants:
+        for url in r.get('photo_urls') or []:
+            _, ref, _ = split_photo_url(url)
+            if ref:
+                seen.setdefault(ref, None)
+    return list(seen)
+
+
+def manifest_path(photo_dir=PHOTO_DIR):
+    return os.path.join(photo_dir, MANIFEST_NAME)
+
+
+def load_manifest(photo_dir=PHOTO_DIR):
+    path = manifest_path(photo_dir)
+    if not os.path.exists(path):
+        return {'version': PIPELINE_VERSION, 'formats': {}, 'photos': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != PIPELINE_VERSION:
+        print(f"♻️  Manifest is from pipeline v{manifest.get('version')}, regenerating every photo")
+        return {'version': PIPELINE_VERSION, 'formats': {}, 'photos': {}}
+    return manifest
+
+
+def save_manifest(manifest, photo_dir=PHOTO_DIR):
+    path = manifest_path(photo_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_done(entry):
+    return entry is not None and all(os.path.exists(path) for path in entry.values())
+
+
+def run(restaurants, photo_dir=PHOTO_DIR, workers=8, rate=DEFAULT_RATE, limit=None):
+    """Process every new photo reference; returns (processed, skipped, failed)"""
+    os.makedirs(photo_dir, exist_ok=True)
+    manifest = load_manifest(photo_dir)
+    refs = photo_references(restaurants)
+    todo = [ref for ref in refs if not is_done(manifest['photos'].get(ref))]
+    skipped = len(refs) - len(todo)
+    if limit is not None:
+        todo = todo[:limit]
+    print(f"📷 {len(refs)} photo references: {skipped} already processed, {len(todo)} to fetch")
+
+    manifest['formats'] = {'avif': can_write('AVIF'), 'resized': Image is not None}
+    if Image is None:
+        print("⚠️  Pillow not installed, publishing the downloaded images without resizing (pip install Pillow)")
+
+    client = PlacesClient(rate=rate, pool_size=workers)
+
+    def process(ref):
+        try:
+            return ref, publish(client.photo(ref, maxwidth=SOURCE_WIDTH), photo_dir)
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            print(f"  ❌ {ref[:16]}…: {e}")
+            return ref, None
+
+    processed = failed = 0
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for i, (ref, paths) in enumerate(pool.map(process, todo), 1):
+            if paths is None:
+                failed += 1
+            else:
+                manifest['photos'][ref] = paths
+                processed += 1
+            if i % 100 == 0:
+                save_manifest(manifest, photo_dir)
+                print(f"  {i}/{len(todo)} photos")
+        pool.shutdown()
+    except QuotaExceeded as e:
+        # Drop the queued downloads; only those already in flight still reach Google
+        pool.shutdown(cancel_futures=True)
+        print(f"🛑 {e}; rerun later to continue")
+    finally:
+        save_manifest(manifest, photo_dir)
+        client.close()
+    return processed, skipped, failed
+
+
+def local_photo_urls(photo_urls, manifest):
+    """Thumbnail paths for photos the pipeline has published; other URLs unchanged"""
+    local = []
+    for url in photo_urls or []:
+        _, ref, _ = split_photo_url(url)
+        entry = manifest['photos'].get(ref)
+        local.append(entry['thumb'] if entry else url)
+    return local
+
+
+def stub_image(ref):
+    """Deterministic placeholder image for the stub server"""
+    color = hashlib.sha256(ref.encode()).digest()[:3]
+    if Image is not None:
+        out = io.BytesIO()
+        Image.new('RGB', (SOURCE_WIDTH, 600), tuple(color)).save(out, 'JPEG', quality=90)
+        return out.getvalue(), 'image/jpeg'
+
+    # 16x12 solid PNG written by hand
+    width, height = 16, 12
+    raw = b''.join(b'\x00' + bytes(color) * width for _ in range(height))
+
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    png = (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+           + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+    return png, 'image/png'
+
+
+class StubPhotoHandler(BaseHTTPRequestHandler):
+    """Answers .../photo?photo_reference=... like the Places Photo API"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        ref = parse_qs(url.query).get('photo_reference', [''])[0]
+        if not url.path.endswith('/photo') or not ref:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body, content_type = stub_image(ref)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=DATA_PATH)
+    parser.add_argument('--photo-dir', default=PHOTO_DIR)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'max photo downloads per second (default: {DEFAULT_RATE})')
+    parser.add_argument('--limit', type=int, help='only fetch this many new photos')
+    parser.add_argument('--serve-stub', type=int, metavar='PORT',
+                        help='serve placeholder photos on 127.0.0.1:PORT instead of running the pipeline')
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        print(f"📷 Stub Places Photo API on http://127.0.0.1:{args.serve_stub}")
+        ThreadingHTTPServer(('127.0.0.1', args.serve_stub), StubPhotoHandler).serve_forever()
+        return
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+
+    processed, skipped, failed = run(restaurants, args.photo_dir, args.workers, args.rate, args.limit)
+    print(f"\n✅ {processed} photos processed, {skipped} skipped, {failed} failed")
+    print(f"📄 Manifest: {manifest_path(args.photo_dir)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Run the data pipeline, re-running only the stages whose inputs changed.
+
+Each stage declares the files it reads and writes:
+
+  scrape      scrape_kyoto.py --scrape-only   -> <city>_raw.json
+  enrich      enrich_google.py                <city>_raw.json -> <city>_final.json
+  photos      photo_pipeline.py               <city>_final.json -> photos/manifest.json
+  categorize  cuisine_classifier.py           <city>_final.json -> <city>_categorized.json
+  build       build_map.py                    <city>_categorized.json -> index.html, sw.js
+
+The build's files follow --build-args: --local-photos adds the photo
+manifest to its inputs (so photos runs first), --output moves index.html
+and sw.js, and --split-data adds the content-hashed data files, which are
+recorded by name after each build.
+
+A stage's inputs also include its script and every local module the script
+imports when loaded, found by reading its module-level import statements.
+Inputs and outputs are fingerprinted by content hash in .pipeline_state.json,
+per city and stage.
+Hashes and import lists are cached there by size and mtime, so checking an
+up-to-date pipeline reads no file contents. A stage is skipped when its
+command, input hashes and output hashes all match its last successful run.
+Editing only the cuisine keyword table therefore re-runs categorize and
+build, and nothing else.
+
+Stages start as soon as the stages producing their inputs have finished,
+so independent ones (photos and categorize) run at the same time. The
+stages that call Tabelog or Google (scrape, enrich, photos) only run with
+--network. Otherwise their existing outputs are used as they are.
+
+    python pipeline.py                 # bring the local stages up to date
+    python pipeline.py --network       # everything, including API calls
+    python pipeline.py build --dry-run
+    python pipeline.py --build-args="--split-data --local-photos"
+"""
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from build_map import DATA_DIR, OUTPUT_PATH
+from cities import add_city_argument, get_city
+from photo_pipeline import PHOTO_DIR, manifest_path
+from service_worker import SW_NAME
+from tile_precache import MANIFEST_NAME as TILES_MANIFEST_NAME
+
+STATE_PATH = '.pipeline_state.json'
+LOG_DIR = 'pipeline_logs'
+
+
+class Stage:
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), network=False,
+                 city=None, output_globs=()):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)    # data files; the script's code is added by code_inputs()
+        self.outputs = list(outputs)
+        self.network = network
+        self.city = city
+        self.output_globs = list(output_globs)  # outputs named at run time, recorded afterwards
+
+    @property
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+    @property
+    def key(self):
+        """Name of the stage's record in the state file and of its log"""
+        return f'{self.city}/{self.name}' if self.city else self.name
+
+    def produced(self):
+        """The declared outputs plus the files currently matching output_globs"""
+        matched = sorted(path for pattern in self.output_globs for path in glob.glob(pattern))
+        return self.outputs + [path for path in matched if path not in self.outputs]
+
+
+def build_options(build_args):
+    """The build_map.py options in `build_args` that decide which files it reads and writes"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--split-data', action='store_true')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--local-photos', nargs='?', const=PHOTO_DIR)
+    parser.add_argument('--precache-tiles', nargs='?', const='default')
+    return parser.parse_known_args(list(build_args))[0]
+
+
+def city_stages(city, build_args=()):
+    """The pipeline for one city, in dependency order"""
+    categorized = f'{city.slug}_categorized.json'
+    build = build_options(build_args)
+    photo_dir = build.local_photos or PHOTO_DIR
+    site = os.path.dirname(build.output)
+
+    build_inputs = [categorized, 'manifest.json', 'icon-192.png', 'icon-512.png']
+    if build.local_photos:
+        build_inputs.append(manifest_path(photo_dir))
+    build_outputs = [build.output, os.path.join(site, SW_NAME)]
+    if build.precache_tiles:
+        build_outputs.append(os.path.join(site, TILES_MANIFEST_NAME))
+    # Named after their content hash; build_map.py deletes the previous build's
+    data_files = []
+    if build.split_data:
+        names = ['restaurants', 'photos'] if build.compact else ['restaurants']
+        data_files = [os.path.join(build.data_dir, f'{name}.*.json*') for name in names]
+
+    stage = partial(Stage, city=city.slug)
+    return [
+        stage('scrape', 'scrape_kyoto.py', ['--scrape-only', '--async-crawl', '--city', city.slug],
+              outputs=[city.raw_path], network=True),
+        stage('enrich', 'enrich_google.py', ['--city', city.slug],
+              inputs=[city.raw_path], outputs=[city.final_path, city.notfound_path], network=True),
+        stage('photos', 'photo_pipeline.py', ['--input', city.final_path, '--photo-dir', photo_dir],
+              inputs=[city.final_path], outputs=[manifest_path(photo_dir)], network=True),
+        stage('categorize', 'cuisine_classifier.py', ['--input', city.final_path, '--output', categorized],
+              inputs=[city.final_path], outputs=[categorized]),
+        stage('build', 'build_map.py', ['--city', city.slug, '--input', categorized] + list(build_args),
+              inputs=build_inputs, outputs=build_outputs, output_globs=data_files),
+    ]
+
+
+def module_level(tree):
+    """Statements run on import: the module body and its if/try/with blocks, not function bodies"""
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop(0)
+        yield node
+        if isinstance(node, (ast.If, ast.Try, ast.With, ast.ExceptHandler)):
+            pending.extend(child for child in ast.iter_child_nodes(node)
+                           if isinstance(child, (ast.stmt, ast.ExceptHandler)))
+
+
+def local_imports(path, root='.'):
+    """Modules next to `path` that it imports directly when loaded
+
+    Imports inside functions (such as a self-check main() importing
+    build_map) are left out; they only matter when that function runs.
+    """
+    with open(os.path.join(root, path), 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in module_level(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = name.split('.')[0] + '.py'
+            if module not in modules and os.path.exists(os.path.join(root, module)):
+                modules.append(module)
+    return modules
+
+
+def code_inputs(script, imports=local_imports):
+    """`script` plus every module next to it that it imports, transitively"""
+    found = []
+    pending = [script]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.append(path)
+        pending.extend(imports(path))
+    return sorted(found)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Fingerprints:
+    """Per-file `compute` results (content hashes by default), redone only when a file's size or mtime changed"""
+
+    def __init__(self, known=None, compute=sha256_file):
+        self.known = known if known is not None else {}  # path -> [size, mtime_ns, result]
+        self.compute = compute
+
+    def __call__(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.known.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        result = self.compute(path)
+        self.known[path] = [stat.st_size, stat.st_mtime_ns, result]
+        return result
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'files': {}, 'module_imports': {}, 'stages': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    # 'imports' also listed imports inside functions; rescan everything once
+    state.pop('imports', None)
+    state.setdefault('module_imports', {})
+    # Records from before they were kept per city would never be matched again
+    state['stages'] = {key: record for key, record in state['stages'].items() if '/' in key}
+    return state
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stale_reason(stage, record, fingerprint, imports=local_imports):
+    """Why `stage` has to run, or None when its last run is still valid"""
+    if record is None:
+        return 'never run'
+    if record['command'] != stage.command[1:]:
+        return 'command changed'
+    for path, digest in record['inputs'].items():
+        if fingerprint(path) != digest:
+            return f'{path} changed'
+    if set(record['inputs']) != set(stage.inputs + code_inputs(stage.script, imports)):
+        return 'inputs changed'
+    # Recorded outputs include the files matched by output_globs at the time
+    for path in stage.outputs + [path for path in record['outputs'] if path not in stage.outputs]:
+        if path not in record['outputs'] or fingerprint(path) != record['outputs'][path]:
+            return f'{path} missing or modified'
+    return None
+
+
+def upstream(stages):
+    """{stage name: names of the stages producing its inputs}"""
+    producers = {path: stage.name for stage in stages for path in stage.outputs}
+    return {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages}
+
+
+def select(stages, targets):
+    """The target stages plus everything they depend on, in pipeline order"""
+    if not targets:
+        return stages
+    deps = upstream(stages)
+    wanted = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def log_path(stage):
+    return os.path.join(LOG_DIR, stage.key.replace('/', '-') + '.log')
+
+
+def run_stage(stage):
+    """Run one stage with its output in pipeline_logs/<city>-<stage>.log; returns (ok, seconds)"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    started = time.monotonic()
+    with open(log_path(stage), 'w', encoding='utf-8') as log:
+        result = subprocess.run(stage.command, stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode == 0, time.monotonic() - started
+
+
+def run(stages, state, network=False, force=(), jobs=4, dry_run=False):
+    """Bring `stages` up to date; returns the names of the stages that failed"""
+    fingerprint = Fingerprints(state['files'])
+    imports = Fingerprints(state['module_imports'], local_imports)
+    deps = upstream(stages)
+    by_name = {stage.name: stage for stage in stages}
+    done, failed, blocked = set(), set(), set()
+    running = {}
+
+    def ready(stage):
+        settled = done | failed | blocked
+        return stage.name not in settled and deps[stage.name] <= settled \
+            and stage.name not in {name for name, _ in running.values()}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while True:
+            for stage in stages:
+                if not ready(stage):
+                    continue
+                if deps[stage.name] & (failed | blocked):
+                    blocked.add(stage.name)
+                    print(f"⏭️  {stage.name}: skipped, an upstream stage failed")
+                    continue
+                reason = 'forced' if stage.name in force else \
+                    stale_reason(stage, state['stages'].get(stage.key), fingerprint, imports)
+                if reason is None:
+                    done.add(stage.name)
+                    print(f"✔️  {stage.name}: up to date")
+                elif stage.network and not network:
+                    done.add(stage.name)
+                    print(f"🌐 {stage.name}: {reason}, but needs --network; using its current outputs")
+                elif dry_run:
+                    done.add(stage.name)
+                    print(f"🔸 {stage.name}: would run ({reason})")
+                else:
+                    print(f"▶️  {stage.name}: running ({reason})")
+                    # Hash the inputs as they are now, so edits made while the stage runs trigger a rerun
+                    inputs = {path: fingerprint(path) for path in stage.inputs + code_inputs(stage.script, imports)}
+                    running[pool.submit(run_stage, stage)] = (stage.name, inputs)
+
+            if not running:
+                if all(stage.name in done | failed | blocked for stage in stages):
+                    break
+                continue  # stages settled in this pass may have unblocked others
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, inputs = running.pop(future)
+                ok, seconds = future.result()
+                stage = by_name[name]
+                if ok:
+                    done.add(name)
+                    state['stages'][stage.key] = {
+                        'command': stage.command[1:],
+                        'inputs': inputs,
+                        'outputs': {path: fingerprint(path) for path in stage.produced()},
+                    }
+                    save_state(state)
+                    print(f"✅ {name}: done in {seconds:.1f}s")
+                else:
+                    failed.add(name)
+                    state['stages'].pop(stage.key, None)
+                    save_state(state)
+                    print(f"❌ {name}: failed after {seconds:.1f}s, see {log_path(stage)}")
+    # Keep the hashes and import lists of files checked but not run, so the next check skips them
+    save_state(state)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('targets', nargs='*', help='stages to bring up to date (default: all)')
+    add_city_argument(parser)
+    parser.add_argument('--network', action='store_true',
+                        help='also run the stages that call Tabelog or Google when they are stale')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help='run STAGE even if it is up to date (repeatable)')
+    parser.add_argument('--jobs', type=int, default=4, help='stages run at the same time (default: 4)')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would run')
+    parser.add_argument('--build-args', default='', metavar='OPTIONS',
+                        help='extra build_map.py options; pass them with "=", e.g. --build-args="--split-data"')
+    args = parser.parse_args()
+
+    stages = city_stages(get_city(args.city), args.build_args.split())
+    names = [stage.name for stage in stages]
+    for name in args.targets + args.force:
+        if name not in names:
+            parser.error(f"unknown stage {name!r} (stages: {', '.join(names)})")
+
+    state = load_state()
+    started = time.monotonic()
+    failed = run(select(stages, args.targets), state, args.network, set(args.force), args.jobs, args.dry_run)
+    print(f"\n{'❌' if failed else '✅'} Pipeline finished in {time.monotonic() - started:.1f}s"
+          + (f", failed: {', '.join(sorted(failed))}" if failed else ''))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
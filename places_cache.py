@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Persistent SQLite cache for Google Places responses.
+
+Entries are content-addressed by endpoint + normalized request params
+(the API key is never part of the key), expire per endpoint, and the
+least recently used rows are evicted once the cache outgrows max_bytes.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = 'places_cache.sqlite3'
+
+DAY = 24 * 60 * 60
+
+# How long a cached response stays fresh, per endpoint
+DEFAULT_TTLS = {
+    'textsearch': 30 * DAY,  # name -> place_id barely ever changes
+    'details': 7 * DAY,      # ratings and hours drift
+}
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Only cache answers that are actually about the place
+CACHEABLE_STATUSES = {'OK', 'ZERO_RESULTS', 'NOT_FOUND'}
+
+
+def normalize_params(params):
+    """Canonical form of request params so equivalent calls share a key"""
+    normalized = {}
+    for name, value in params.items():
+        if name == 'key' or value is None:
+            continue
+        value = ' '.join(str(value).split())
+        if name == 'fields':
+            value = ','.join(sorted(set(value.split(','))))
+        normalized[name] = value
+    return normalized
+
+def cache_key(endpoint, params):
+    payload = json.dumps([endpoint, normalize_params(params)], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PlacesCache:
+    """Size-bounded LRU response cache backed by one SQLite file"""
+
+    def __init__(self, path=CACHE_PATH, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Shared by sharded worker processes, so wait on locks instead of failing
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            body TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self._db.commit()
+        self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, endpoint, params):
+        """Cached response for this request, or None if missing/expired"""
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT body, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[1] > self.ttls.get(endpoint, 0):
+                self.misses += 1
+                return None
+            self._db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, endpoint, params, data):
+        """Store a response, evicting least recently used rows past max_bytes"""
+        if data.get('status') not in CACHEABLE_STATUSES:
+            return
+        key = cache_key(endpoint, params)
+        body = json.dumps(data, ensure_ascii=False)
+        size = len(body.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                             (key, endpoint, body, size, now, now))
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY last_used LIMIT 100').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._total -= size
+                if self._total <= self.max_bytes:
+                    break
+
+    def purge_expired(self):
+        """Drop every expired row; returns how many were removed"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for endpoint, ttl in self.ttls.items():
+                cur = self._db.execute('DELETE FROM responses WHERE endpoint = ? AND created < ?',
+                                       (endpoint, now - ttl))
+                removed += cur.rowcount
+            self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            self._db.commit()
+        return removed
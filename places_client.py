@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Shared Google Places client used by every scrape/enrichment script.
+
+One requests.Session is kept per client so text searches and details
+lookups reuse pooled keep-alive connections instead of paying a new TLS
+handshake per call.
+"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+from places_cache import CACHE_PATH, PlacesCache
+from rate_limit import TokenBucket
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
+
+# Overridable so the scripts can be pointed at a local stub server
+PLACES_BASE_URL = os.getenv('PLACES_BASE_URL', "https://maps.googleapis.com/maps/api/place")
+
+# Place Details field masks per use case. Google bills a details call by
+# the costliest field category in its mask, and every field adds bytes, so
+# callers ask for their tier only. Tiers can be combined into one call.
+FIELD_TIERS = {
+    # New place: the text search hit already has name, rating, address and location
+    'discovery': 'opening_hours,price_level,photos',
+    'cuisine': 'types',
+    # What drifts after enrichment (refresh_places.py)
+    'refresh': 'rating,user_ratings_total,opening_hours',
+    'photos': 'photos',
+}
+
+MAX_PHOTOS = 5
+
+# Restaurants below this Google rating are dropped by every enrichment run
+MIN_GOOGLE_RATING = 4.2
+
+# Calls per second against the live API (cache hits are not throttled)
+DEFAULT_RATE = 10.0
+
+
+# Statuses that mean "stop and retry later", not "this place does not exist"
+QUOTA_STATUSES = {'OVER_QUERY_LIMIT', 'OVER_DAILY_LIMIT', 'REQUEST_DENIED'}
+
+# The only answers that really mean "Google has no such place"
+NOT_FOUND_STATUSES = {'ZERO_RESULTS', 'NOT_FOUND'}
+
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a request is not in the local cache"""
+
+
+class QuotaExceeded(Exception):
+    """Google refused the call (quota, billing or key); nothing about the place is known"""
+
+
+class LookupFailed(Exception):
+    """A lookup broke (network error, unexpected status); retrying may still find the place"""
+
+
+class PlacesClient:
+    """Pooled, retrying client for the Places text search and details endpoints"""
+
+    def __init__(self, api_key=GOOGLE_API_KEY, base_url=PLACES_BASE_URL,
+                 connect_timeout=5, read_timeout=10, retries=3, backoff=0.5, pool_size=10,
+                 cache=None, offline=False, rate=None, prefilter_rating=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.offline = offline
+        self.limiter = TokenBucket(rate) if rate else None
+        # Two-phase mode: skip Place Details when the text search rating already fails
+        self.prefilter_rating = prefilter_rating
+        self.stats = Counter()
+        # Live calls per endpoint or details tier: [calls, seconds, response bytes]
+        self.call_stats = defaultdict(lambda: [0, 0.0, 0])
+        self._stats_lock = threading.Lock()
+
+        # HTTP-level retries (connection errors, 429, 5xx) with exponential backoff
+        retry = Retry(total=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({'GET'}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+
+    def count(self, stat, n=1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def record_call(self, label, seconds, size):
+        with self._stats_lock:
+            entry = self.call_stats[label]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += size
+
+    def report_calls(self):
+        """Print latency and response size of the live calls, per endpoint/tier"""
+        for label, (calls, seconds, size) in sorted(self.call_stats.items()):
+            print(f"  📡 {label}: {calls} calls • {1000 * seconds / calls:.0f} ms avg • "
+                  f"{size / calls / 1024:.1f} KB avg • {size / 1024:.0f} KB total")
+
+    @property
+    def live_calls(self):
+        """HTTP requests actually sent to Google so far"""
+        return self.stats['textsearch'] + self.stats['details']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get(self, endpoint, params, fresh=False, label=None):
+        """Serve from the cache if possible, otherwise call the API and cache the answer
+
+        fresh=True skips the cached copy (the new answer is still stored),
+        except in offline mode where the cache is all there is.
+        """
+        if self.cache and (not fresh or self.offline):
+            data = self.cache.get(endpoint, params)
+            if data is not None:
+                self.count('cache_hits')
+                return data
+        if self.offline:
+            raise CacheMiss(f"{endpoint} {params} not cached")
+
+        data = self._fetch(endpoint, params, label or endpoint)
+        if self.cache:
+            self.cache.put(endpoint, params, data)
+        return data
+
+    def _fetch(self, endpoint, params, label=None):
+        """GET {base_url}/{endpoint}/json, backing off on OVER_QUERY_LIMIT"""
+        url = f"{self.base_url}/{endpoint}/json"
+        params = {**params, 'key': self.api_key}
+
+        for attempt in range(self.retries + 1):
+            if self.limiter:
+                self.limiter.acquire()
+            self.count(endpoint)
+            started = time.monotonic()
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            self.record_call(label or endpoint, time.monotonic() - started, len(response.content))
+            if response.status_code == 429:
+                raise QuotaExceeded(f"{endpoint}: HTTP 429 after {self.retries} retries")
+            response.raise_for_status()
+            data = response.json()
+            # Places reports quota throttling as HTTP 200 + status
+            if data.get('status') != 'OVER_QUERY_LIMIT' or attempt == self.retries:
+                break
+            time.sleep(self.backoff * 2 ** attempt)
+
+        if data.get('status') in QUOTA_STATUSES:
+            raise QuotaExceeded(f"{endpoint}: {data['status']} {data.get('error_message', '')}".rstrip())
+        return data
+
+    def text_search(self, query, **params):
+        """Raw text search response for `query`"""
+        return self._get('textsearch', {'query': query, **params})
+
+    def details(self, place_id, tier='discovery', fields=None, fresh=False, **params):
+        """Raw Place Details response for `place_id`
+
+        The field mask is the FIELD_TIERS entry for `tier` (or the union for
+        a tuple of tiers), plus any comma-separated `fields`.
+        """
+        tiers = (tier,) if isinstance(tier, str) else tuple(tier)
+        masks = [FIELD_TIERS[name] for name in tiers] + ([fields] if fields else [])
+        mask = ','.join(dict.fromkeys(field for m in masks for field in m.split(',')))
+        return self._get('details', {'place_id': place_id, 'fields': mask, **params}, fresh,
+                         label=f"details:{'+'.join(tiers)}")
+
+    def photo_url(self, photo_reference, maxwidth=800):
+        return f"{self.base_url}/photo?maxwidth={maxwidth}&photo_reference={photo_reference}&key={self.api_key}"
+
+    def photo(self, photo_reference, maxwidth=800):
+        """Image bytes for a photo reference (Google redirects to the image itself)"""
+        if self.offline:
+            raise CacheMiss(f"photo {photo_reference} is never cached")
+        if self.limiter:
+            self.limiter.acquire()
+        self.count('photo')
+        response = self.session.get(f"{self.base_url}/photo", timeout=self.timeout, params={
+            'maxwidth': maxwidth, 'photo_reference': photo_reference, 'key': self.api_key})
+        if response.status_code in (403, 429):
+            raise QuotaExceeded(f"photo: HTTP {response.status_code}")
+        response.raise_for_status()
+        return response.content
+
+    def search_place(self, name, city="Kyoto", strict=False):
+        """Find a restaurant by name and return its flattened Google data, or None
+
+        QuotaExceeded and (offline) CacheMiss propagate: neither says anything
+        about the place, so callers must not record it as not found. Other
+        failures are printed and return None, unless `strict`, where only a
+        ZERO_RESULTS/NOT_FOUND answer returns None and the rest raise
+        LookupFailed.
+        """
+        if not self.api_key and not self.offline:
+            return None
+
+        try:
+            data = self.text_search(f"{name} {city} Japan")
+            status = data['status'] if data['status'] != 'OK' or data['results'] else 'ZERO_RESULTS'
+
+            if status == 'OK':
+                place = data['results'][0]
+                place_id = place.get('place_id')
+
+                rating = place.get('rating')
+                if self.prefilter_rating is not None and rating is not None and rating < self.prefilter_rating:
+                    self.count('details_saved')
+                    return self.flatten_search_result(place)
+
+                details_data = self.details(place_id, tier='discovery')
+
+                if details_data['status'] == 'OK':
+                    return self.flatten_details({**place, **details_data['result']})
+                status = details_data['status']
+
+            if status not in NOT_FOUND_STATUSES:
+                raise LookupFailed(f"unexpected status {status}")
+        except (QuotaExceeded, CacheMiss):
+            raise
+        except Exception as e:
+            if strict:
+                raise e if isinstance(e, LookupFailed) else LookupFailed(str(e)) from e
+            print(f"  Google error: {e}")
+
+        return None
+
+    def search_places(self, names, city="Kyoto", max_workers=4):
+        """Batch version of search_place; results come back in input order"""
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda name: self.search_place(name, city), names))
+
+    def flatten_search_result(self, place):
+        """Partial record from a text search hit (no hours, price level or photos)"""
+        return {
+            'google_name': place.get('name'),
+            'google_rating': place.get('rating'),
+            'google_user_ratings_total': place.get('user_ratings_total'),
+            'google_address': place.get('formatted_address'),
+            'google_place_id': place.get('place_id'),
+            'lat': place['geometry']['location']['lat'],
+            'lng': place['geometry']['location']['lng'],
+        }
+
+    def flatten_details(self, result):
+        """Map a text search hit merged with its discovery details onto kyoto_final.json fields"""
+        # Get up to 5 photo URLs
+        photo_urls = [self.photo_url(photo['photo_reference'])
+                      for photo in result.get('photos', [])[:MAX_PHOTOS]]
+
+        return {
+            'google_name': result.get('name'),
+            'google_rating': result.get('rating'),
+            'google_user_ratings_total': result.get('user_ratings_total'),
+            'google_address': result.get('formatted_address'),
+            'google_place_id': result.get('place_id'),
+            'lat': result['geometry']['location']['lat'],
+            'lng': result['geometry']['location']['lng'],
+            'price_level': result.get('price_level'),
+            'opening_hours': result.get('opening_hours', {}).get('weekday_text', []),
+            'open_now': result.get('opening_hours', {}).get('open_now'),
+            'photo_urls': photo_urls
+        }
+
+    def refresh_place(self, place_id, photos=True):
+        """Current volatile fields of a known place, or None if Google no longer has it
+
+        One details call with the refresh tier (plus photos), answered live
+        except in offline mode; keys are the ones flatten_details() uses.
+        Only a NOT_FOUND answer returns None; any other non-OK status raises
+        LookupFailed, since it says nothing about the place.
+        """
+        data = self.details(place_id, tier=('refresh', 'photos') if photos else 'refresh', fresh=True)
+        if data['status'] in NOT_FOUND_STATUSES:
+            return None
+        if data['status'] != 'OK':
+            raise LookupFailed(f"unexpected status {data['status']}")
+        result = data['result']
+        fresh = {
+            'google_rating': result.get('rating'),
+            'google_user_ratings_total': result.get('user_ratings_total'),
+            'opening_hours': result.get('opening_hours', {}).get('weekday_text', []),
+            'open_now': result.get('opening_hours', {}).get('open_now'),
+        }
+        if photos:
+            fresh['photo_urls'] = [self.photo_url(photo['photo_reference'])
+                                   for photo in result.get('photos', [])[:MAX_PHOTOS]]
+        return fresh
+
+
+def add_client_arguments(parser):
+    """Register the shared --offline/--no-cache/--places-rate options"""
+    group = parser.add_argument_group('Google Places')
+    group.add_argument('--offline', action='store_true',
+                       help='answer only from the local response cache, never call Google')
+    group.add_argument('--no-cache', action='store_true',
+                       help='bypass the local response cache')
+    group.add_argument('--cache-path', default=CACHE_PATH,
+                       help=f'response cache file (default: {CACHE_PATH})')
+    group.add_argument('--places-rate', type=float, default=DEFAULT_RATE,
+                       help=f'max live Places calls per second (default: {DEFAULT_RATE})')
+    group.add_argument('--two-phase', action='store_true',
+                       help=f'filter on the text search rating first and only fetch details '
+                            f'for places rated {MIN_GOOGLE_RATING}+')
+
+def client_from_args(args, **kwargs):
+    """Build a client from add_client_arguments() options and make it the default"""
+    options = {
+        'cache': None if args.no_cache else PlacesCache(args.cache_path),
+        'offline': args.offline,
+        'rate': args.places_rate,
+        'prefilter_rating': MIN_GOOGLE_RATING if args.two_phase else None,
+        **kwargs,
+    }
+    client = PlacesClient(**options)
+    set_default_client(client)
+    return client
+
+
+_default_client = None
+
+def set_default_client(client):
+    global _default_client
+    _default_client = client
+
+def get_client():
+    """Process-wide client so every caller shares one connection pool"""
+    global _default_client
+    if _default_client is None:
+        _default_client = PlacesClient()
+    return _default_client
+
+def search_google_places(name, city="Kyoto", strict=False):
+    """Search Google Places API for restaurant"""
+    return get_client().search_place(name, city, strict)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiter and throughput meter shared by the scraping and
+enrichment scripts
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow `rate` requests per second with bursts of up to `capacity`.
+
+    Safe to share between threads (acquire) and between asyncio tasks
+    (acquire_async), so one bucket can throttle a whole worker pool.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block the current thread until a token is available"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a token is available"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ThroughputMeter:
+    """Periodically print rows/s and calls/s for a long-running loop"""
+
+    def __init__(self, total, interval=5.0):
+        self.total = total
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def rates(self, rows, calls):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return rows / elapsed, calls / elapsed
+
+    def report(self, rows, calls):
+        rows_per_s, calls_per_s = self.rates(rows, calls)
+        print(f"  ⏱️  {rows}/{self.total} rows • {rows_per_s:.1f} rows/s • {calls_per_s:.1f} calls/s")
+
+    def maybe_report(self, rows, calls):
+        """Report at most once per interval"""
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(rows, calls)
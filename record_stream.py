@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Read restaurant records one at a time instead of json.load()-ing the file.
+
+`build_map.py --stream` uses iter_records() so a 50k-place city never has
+the whole input list in memory. JSONL files (one record per line) are read
+line by line; JSON arrays go through ijson when it is installed and
+otherwise through a small incremental decoder over fixed-size chunks.
+
+Run directly to compare iter_records() against json.load() on a file and
+print the peak RSS of each.
+"""
+import json
+import re
+import resource
+import sys
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """Yield the items of the top-level JSON array in text file `f`"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, started = '', 0, False, False
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("unexpected end of JSON array")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise ValueError(f"expected a JSON array, found {char!r}")
+            started = True
+            pos += 1
+        elif char == ']':
+            return
+        elif char == ',':
+            pos += 1
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                item, end, error = None, None, e
+            # A failed or buffer-ending decode may just be a record cut off by the chunk boundary
+            if end is None or (end == len(buffer) and not eof):
+                if eof:
+                    # Only a failed decode gets here: nothing more will arrive to complete it
+                    raise error
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield item
+            pos = end
+
+
+def iter_records(path):
+    """Yield the records of a JSON array file or a JSONL file, one at a time"""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ijson is not None:
+        with open(path, 'rb') as f:
+            yield from ijson.items(f, 'item', use_float=True)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from iter_json_array(f)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'kyoto_final.json'
+    print(f"Peak RSS at start: {peak_rss_mb():.1f} MB ({'ijson' if ijson else 'stdlib decoder'})")
+    streamed = sum(1 for _ in iter_records(path))
+    print(f"Streamed {streamed} records, peak RSS {peak_rss_mb():.1f} MB")
+    if path.endswith('.jsonl'):
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        loaded = json.load(f)
+    print(f"json.load() of {len(loaded)} records, peak RSS {peak_rss_mb():.1f} MB")
+
+    # Small chunks exercise the record-cut-at-chunk-boundary path
+    with open(path, 'r', encoding='utf-8') as f:
+        chunked = list(iter_json_array(f, chunk_size=97))
+    if chunked != loaded or streamed != len(loaded):
+        print("❌ Streamed records differ from json.load()")
+        sys.exit(1)
+    print("✅ Streamed records match json.load()")
+
+
+if __name__ == '__main__':
+    main()
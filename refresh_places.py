@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Refresh ratings, review counts, hours and photos of already-enriched places.
+
+A full re-enrichment repeats the text search for every row even though
+kyoto_final.json already stores each place_id. This script goes straight
+to Place Details by place_id and asks only for the fields that drift
+(the refresh and photos tiers in places_client.FIELD_TIERS): one call per
+place instead of two, with a much smaller field mask.
+
+Places are refreshed most-overdue first. The order is by hours since the
+last refresh (google_refreshed_at) weighted by review volume, so busy
+places are checked more often. Places refreshed within --min-age are
+skipped, and --limit caps a run. Only changed fields are written. Each
+place's delta goes to an append-only log (kyoto_refresh.jsonl) as it
+arrives, and the log is folded into kyoto_final.json in one atomic
+rewrite at the end. A crashed or quota-stopped run keeps its lookups:
+the next run applies the log first. Only NOT_FOUND counts a place as
+gone; other failed lookups are retried on the next run. --offline
+answers come from the response cache, so they do not count as a refresh.
+
+    python refresh_places.py                         # nightly: everything due
+    python refresh_places.py --limit 200 --min-age 0
+
+Testing without Google:
+    python refresh_places.py --serve-stub 8767 &
+    PLACES_BASE_URL=http://127.0.0.1:8767 python refresh_places.py --input /tmp/final.json
+"""
+import argparse
+import calendar
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cities import add_city_argument, get_city
+from compact_data import split_photo_url
+from geojson_patches import PatchLog, read_patches
+from places_client import MIN_GOOGLE_RATING, QuotaExceeded, add_client_arguments, client_from_args
+from rate_limit import ThroughputMeter
+
+REFRESHED_KEY = 'google_refreshed_at'
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# A nightly run at a slightly different time still picks up yesterday's places
+DEFAULT_MIN_AGE_HOURS = 20
+
+# Older kyoto_final.json files use the GeoJSON property names
+LEGACY_KEYS = {'google_user_ratings_total': 'google_reviews'}
+
+
+def place_id_of(restaurant):
+    return restaurant.get('google_place_id') or restaurant.get('place_id')
+
+
+def record_key(restaurant, field):
+    """Name of `field` (a flatten_details() key) in this record's layout"""
+    if 'google_place_id' not in restaurant and LEGACY_KEYS.get(field) in restaurant:
+        return LEGACY_KEYS[field]
+    return field
+
+
+def hours_since_refresh(restaurant, now):
+    """Hours since the last refresh; never-refreshed places count from the epoch"""
+    stamp = restaurant.get(REFRESHED_KEY)
+    refreshed = calendar.timegm(time.strptime(stamp, TIMESTAMP_FORMAT)) if stamp else 0
+    return (now - refreshed) / 3600
+
+
+def priority(restaurant, now):
+    """Higher is more overdue: staleness, weighted up for places with many reviews"""
+    reviews = restaurant.get(record_key(restaurant, 'google_user_ratings_total')) or 0
+    return hours_since_refresh(restaurant, now) * math.log2(2 + reviews)
+
+
+def due_places(restaurants, now, min_age_hours=DEFAULT_MIN_AGE_HOURS, limit=None):
+    """Records to refresh this run, most overdue first"""
+    due = [r for r in restaurants
+           if place_id_of(r) and hours_since_refresh(r, now) >= min_age_hours]
+    due.sort(key=lambda r: priority(r, now), reverse=True)
+    return due[:limit] if limit is not None else due
+
+
+def photo_refs(urls):
+    return [split_photo_url(url)[1] for url in urls or []]
+
+
+def delta(restaurant, fresh):
+    """{record key: new value} for the fields that changed"""
+    changes = {}
+    for field, value in fresh.items():
+        key = record_key(restaurant, field)
+        old = restaurant.get(key)
+        # Photo URLs carry the API key; only a different set of photos is a change
+        if field == 'photo_urls' and photo_refs(old) == photo_refs(value):
+            continue
+        if old != value:
+            changes[key] = value
+    return changes
+
+
+def refresh(places, client, log, workers=8, now=None, photos=True):
+    """Look up each place and log its delta; returns (changed, unchanged, gone, failed)
+
+    Stops early on a quota error, with everything looked up so far logged.
+    Offline answers come from the response cache, so they update the
+    fields but not google_refreshed_at: the place is still due.
+    """
+    stamp = None if client.offline else time.strftime(TIMESTAMP_FORMAT, time.gmtime(now))
+    changed = unchanged = 0
+    gone, failed = [], []
+    meter = ThroughputMeter(len(places))
+
+    def lookup(restaurant):
+        try:
+            return client.refresh_place(place_id_of(restaurant), photos)
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            return e
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for i, (restaurant, fresh) in enumerate(zip(places, pool.map(lookup, places)), 1):
+            meter.maybe_report(i, client.live_calls)
+            if isinstance(fresh, Exception):
+                print(f"  ⚠️  {restaurant['name']}: {fresh}")
+                failed.append(restaurant)
+                continue
+            if fresh is None:
+                print(f"  ❓ {restaurant['name']}: Google no longer has {place_id_of(restaurant)}")
+                gone.append(restaurant)
+                continue
+            changes = delta(restaurant, fresh)
+            if changes:
+                changed += 1
+                print(f"  🔄 {restaurant['name']}: {', '.join(sorted(changes))}")
+            else:
+                unchanged += 1
+            if stamp is not None:
+                changes[REFRESHED_KEY] = stamp
+            if changes:
+                log.append(place_id_of(restaurant), changes)
+    except QuotaExceeded:
+        pool.shutdown(cancel_futures=True)
+        raise
+    pool.shutdown()
+    meter.report(len(places), client.live_calls)
+    return changed, unchanged, gone, failed
+
+
+def apply_deltas(log_path, data_path):
+    """Fold a refresh log into the dataset in one atomic rewrite; returns records updated"""
+    deltas = read_patches(log_path)
+    if not deltas:
+        return 0
+    with open(data_path, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+
+    updated = 0
+    for restaurant in restaurants:
+        changes = deltas.get(place_id_of(restaurant))
+        if changes:
+            restaurant.update(changes)
+            updated += 1
+
+    tmp_path = data_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(restaurants, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, data_path)
+    return updated
+
+
+def stub_details(place_id, fields):
+    """Deterministic details result that drifts from day to day, cut to the field mask"""
+    seed = hashlib.sha256(f"{place_id}|{time.strftime('%Y-%m-%d')}".encode()).digest()
+    result = {
+        'place_id': place_id,
+        'types': ['restaurant', 'food', 'point_of_interest', 'establishment'],
+        'price_level': 1 + seed[5] % 4,
+        'rating': round(4.0 + seed[0] / 255, 1),
+        'user_ratings_total': 50 + seed[1] * 4,
+        'opening_hours': {
+            'open_now': seed[2] % 2 == 0,
+            'weekday_text': [f"{day}: 11:00 AM – {8 + seed[3] % 3}:00 PM" for day in
+                             ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')],
+        },
+        'photos': [{'photo_reference': f"stub-{place_id}-{n}", 'height': 3024, 'width': 4032,
+                    'html_attributions': ['<a href="https://maps.google.com/maps/contrib/0">A Google User</a>']}
+                   for n in range(1 + seed[4] % 3)],
+    }
+    return {name: value for name, value in result.items() if name in fields}
+
+
+class StubDetailsHandler(BaseHTTPRequestHandler):
+    """Answers .../details/json?place_id=... like the Place Details API"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        place_id = query.get('place_id', [''])[0]
+        if url.path.endswith('/details/json') and place_id:
+            fields = query.get('fields', [''])[0].split(',')
+            data = {'status': 'OK', 'result': stub_details(place_id, fields)}
+        else:
+            data = {'status': 'INVALID_REQUEST'}
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_city_argument(parser)
+    parser.add_argument('--input', help="dataset to refresh in place (default: the city's final file)")
+    parser.add_argument('--min-age', type=float, default=DEFAULT_MIN_AGE_HOURS, metavar='HOURS',
+                        help=f'skip places refreshed this recently (default: {DEFAULT_MIN_AGE_HOURS})')
+    parser.add_argument('--limit', type=int, help='refresh at most this many places, most overdue first')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='concurrent lookups; --places-rate still caps the total (default: 8)')
+    parser.add_argument('--skip-photos', action='store_true',
+                        help='leave photo_urls alone and drop photos from the field mask')
+    parser.add_argument('--serve-stub', type=int, metavar='PORT',
+                        help='serve fake Place Details on 127.0.0.1:PORT instead of refreshing')
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        print(f"🗺️  Stub Place Details API on http://127.0.0.1:{args.serve_stub}")
+        ThreadingHTTPServer(('127.0.0.1', args.serve_stub), StubDetailsHandler).serve_forever()
+        return
+
+    city = get_city(args.city)
+    data_path = args.input or city.final_path
+    log_path = city.refresh_path
+
+    if os.path.exists(log_path):
+        updated = apply_deltas(log_path, data_path)
+        os.remove(log_path)
+        print(f"♻️  Applied {updated} deltas left by an interrupted run")
+
+    with open(data_path, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+    now = time.time()
+    places = due_places(restaurants, now, args.min_age, args.limit)
+    print(f"🔄 {len(places)} of {len(restaurants)} {city.name} places due for a refresh")
+    if not places:
+        return
+
+    client = client_from_args(args, pool_size=args.workers)
+    started = time.monotonic()
+    stopped = False
+    with PatchLog(log_path) as log:
+        try:
+            changed, unchanged, gone, failed = refresh(places, client, log, args.workers, now,
+                                                       photos=not args.skip_photos)
+        except QuotaExceeded as e:
+            print(f"\n🛑 Quota error, stopping: {e}")
+            stopped = True
+
+    updated = apply_deltas(log_path, data_path)
+    os.remove(log_path)
+    elapsed = time.monotonic() - started
+
+    if stopped:
+        print(f"💾 Kept the {updated} places refreshed before the error in {data_path}")
+        sys.exit(3)
+
+    with open(data_path, 'r', encoding='utf-8') as f:
+        below = sum(1 for r in json.load(f) if (r.get('google_rating') or 0) < MIN_GOOGLE_RATING)
+
+    print(f"\n=== REFRESH RESULTS ===")
+    print(f"Changed: {changed}, unchanged: {unchanged}, gone: {len(gone)}, failed: {len(failed)}")
+    print(f"Details calls: {client.stats['details']} "
+          f"(a full re-enrichment would make {2 * len(places)}) in {elapsed:.1f}s")
+    client.report_calls()
+    if below:
+        print(f"⚠️  {below} places are now rated below {MIN_GOOGLE_RATING}; "
+              f"they stay until the next full enrichment")
+    print(f"\n✅ Refreshed {updated} places in {data_path}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
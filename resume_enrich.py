@@ -1,140 +1,161 @@
 #!/usr/bin/env python3
 """
-Resume enriching Kyoto restaurants from last saved progress
+Resume enriching Kyoto restaurants (--city for another city) from the
+journal enrich_google.py or multi_city.py left behind.
+
+Remaining work is every <city>_raw.json row whose restaurant key is not in
+<city>_progress.jsonl yet, so any restart point works (including after a
+quota error) without repeating a single lookup. Rows whose lookup failed
+were never journaled, so they are retried too. --shards N splits the
+remaining rows across N worker processes, each journaling to its own
+shard file.
 """
-import requests
-import time
+import argparse
 import json
-import os
-from dotenv import load_dotenv
+import sys
+from multiprocessing import Process
+
+from checkpoint_journal import (ENRICHED, NOT_FOUND, Journal, compact, load_state, merge_shards,
+                                migrate_legacy_progress, restaurant_key, shard_of, shard_path,
+                                split_state)
+from cities import add_city_argument, get_city
+from places_client import (MIN_GOOGLE_RATING, CacheMiss, LookupFailed, QuotaExceeded, add_client_arguments,
+                           client_from_args, search_google_places)
 
-load_dotenv()
+def remaining_rows(all_restaurants, state, shard=None, shards=1):
+    """(position, restaurant) pairs not yet journaled, optionally only one shard's share"""
+    rows = []
+    for i, restaurant in enumerate(all_restaurants, 1):
+        key = restaurant_key(restaurant)
+        if key in state:
+            continue
+        if shard is not None and shard_of(key, shards) != shard:
+            continue
+        rows.append((i, restaurant))
+    return rows
 
-GOOGLE_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
+def enrich_rows(rows, journal, total, label='', city=None):
+    """Look up each row and journal the outcome; stops cleanly on quota errors
 
-def search_google_places(name, city="Kyoto"):
-    """Search Google Places API for restaurant"""
-    if not GOOGLE_API_KEY:
-        return None
-    
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        'query': f"{name} {city} Japan",
-        'key': GOOGLE_API_KEY
-    }
-    
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+    Rows whose lookup failed are left out of the journal so the next run
+    retries them; only a real "no such place" answer is NOT_FOUND.
+    """
+    city = city or get_city()
+    for i, restaurant in rows:
+        print(f"{label}[{i}/{total}] {restaurant['name']}")
+        
+        try:
+            google_data = search_google_places(restaurant['name'], city.name, strict=True)
+        except QuotaExceeded as e:
+            print(f"{label}🛑 Quota error, stopping: {e}")
+            return False
+        except CacheMiss as e:
+            print(f"{label}🛑 Not in the offline cache, stopping: {e}")
+            return False
+        except LookupFailed as e:
+            print(f"{label}  ⚠️  Lookup failed, will retry next run: {e}")
+            continue
+        
+        if not google_data:
+            print(f"{label}  ❌ Not found")
+            journal.append(restaurant, NOT_FOUND)
+            continue
         
-        if data['status'] == 'OK' and data['results']:
-            place = data['results'][0]
-            place_id = place.get('place_id')
-            
-            # Get place details
-            details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-            details_params = {
-                'place_id': place_id,
-                'fields': 'name,rating,user_ratings_total,formatted_address,geometry,place_id,opening_hours,price_level,photos',
-                'key': GOOGLE_API_KEY
-            }
-            
-            details_response = requests.get(details_url, params=details_params, timeout=10)
-            details_data = details_response.json()
-            
-            if details_data['status'] == 'OK':
-                result = details_data['result']
-                
-                # Get up to 5 photo URLs
-                photo_urls = []
-                if 'photos' in result:
-                    for photo in result['photos'][:5]:
-                        photo_ref = photo['photo_reference']
-                        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photo_reference={photo_ref}&key={GOOGLE_API_KEY}"
-                        photo_urls.append(photo_url)
-                
-                return {
-                    'google_name': result.get('name'),
-                    'google_rating': result.get('rating'),
-                    'google_user_ratings_total': result.get('user_ratings_total'),
-                    'google_address': result.get('formatted_address'),
-                    'google_place_id': result.get('place_id'),
-                    'lat': result['geometry']['location']['lat'],
-                    'lng': result['geometry']['location']['lng'],
-                    'price_level': result.get('price_level'),
-                    'opening_hours': result.get('opening_hours', {}).get('weekday_text', []),
-                    'open_now': result.get('opening_hours', {}).get('open_now'),
-                    'photo_urls': photo_urls
-                }
-    except Exception as e:
-        print(f"  Google error: {e}")
+        # Filter by Google rating
+        if google_data['google_rating'] and google_data['google_rating'] >= MIN_GOOGLE_RATING:
+            combined = {**restaurant, **google_data}
+            journal.append(combined, ENRICHED)
+            print(f"{label}  ✅ Google {google_data['google_rating']} ⭐")
+        else:
+            print(f"{label}  ❌ Google {google_data.get('google_rating', 'N/A')} ⭐")
+            journal.append(restaurant, NOT_FOUND)
     
-    return None
+    return True
 
-def main():
-    print("Loading progress...")
-    
-    # Load progress
-    with open('kyoto_progress.json', 'r', encoding='utf-8') as f:
-        progress = json.load(f)
-    
-    enriched = progress['enriched']
-    not_found = progress['not_found']
-    last_index = progress['last_index']
+def report_savings(client, label=''):
+    if client.prefilter_rating is not None:
+        print(f"{label}Details calls saved by two-phase lookup: {client.stats['details_saved']}")
+    client.report_calls()
+
+def run_shard(args, shard, all_restaurants):
+    """Worker process: enrich one shard's remaining rows into its own journal"""
+    city = get_city(args.city)
+    # Split the global call budget between the workers
+    client = client_from_args(args, rate=args.places_rate / args.shards)
+    rows = remaining_rows(all_restaurants, load_state(city.journal_path), shard, args.shards)
+    print(f"[shard {shard}] {len(rows)} restaurants to process")
     
-    print(f"Resuming from restaurant #{last_index + 1}")
-    print(f"Current stats: {len(enriched)} passed, {len(not_found)} failed\n")
+    with Journal(shard_path(shard, city.journal_path)) as journal:
+        ok = enrich_rows(rows, journal, len(all_restaurants), label=f"[shard {shard}] ", city=city)
+    report_savings(client, label=f"[shard {shard}] ")
+    sys.exit(0 if ok else 3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shards', type=int, default=1,
+                        help='split the remaining work across N worker processes (default: 1)')
+    parser.add_argument('--shard-index', type=int,
+                        help='only run this shard of --shards in the current process (no compaction)')
+    add_city_argument(parser)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    city = get_city(args.city)
     
     # Load all restaurants
-    with open('kyoto_raw.json', 'r', encoding='utf-8') as f:
+    with open(city.raw_path, 'r', encoding='utf-8') as f:
         all_restaurants = json.load(f)
     
     total = len(all_restaurants)
-    remaining = all_restaurants[last_index:]
     
+    # Seed the journal from an old <city>_progress.json snapshot (only Kyoto
+    # ever had one) the first time, before any shard reads it
+    migrate_legacy_progress(city.journal_path, f'{city.slug}_progress.json')
+    
+    if args.shard_index is not None:
+        run_shard(args, args.shard_index, all_restaurants)
+    
+    print("Loading progress...")
+    
+    # Rebuild state by streaming the journal
+    merge_shards(city.journal_path)
+    state = load_state(city.journal_path)
+    enriched, not_found = split_state(state)
+    remaining = remaining_rows(all_restaurants, state)
+    
+    print(f"Journal has {len(state)} processed restaurants")
+    print(f"Current stats: {len(enriched)} passed, {len(not_found)} failed\n")
     print(f"Processing {len(remaining)} remaining restaurants...\n")
     
-    for i, restaurant in enumerate(remaining, last_index + 1):
-        print(f"[{i}/{total}] {restaurant['name']}")
-        
-        google_data = search_google_places(restaurant['name'])
-        
-        if not google_data:
-            print("  ❌ Not found")
-            not_found.append(restaurant)
-            time.sleep(0.5)
-            continue
-        
-        # Filter by Google rating
-        if google_data['google_rating'] and google_data['google_rating'] >= 4.2:
-            combined = {**restaurant, **google_data}
-            enriched.append(combined)
-            print(f"  ✅ Google {google_data['google_rating']} ⭐")
-        else:
-            print(f"  ❌ Google {google_data.get('google_rating', 'N/A')} ⭐")
-            not_found.append(restaurant)
-        
-        time.sleep(0.5)
-        
-        # Save progress every 50 restaurants
-        if i % 50 == 0:
-            with open('kyoto_progress.json', 'w', encoding='utf-8') as f:
-                json.dump({'enriched': enriched, 'not_found': not_found, 'last_index': i}, f, ensure_ascii=False, indent=2)
-            print(f"\n💾 Progress saved: {len(enriched)} total passed\n")
+    if args.shards > 1:
+        workers = [Process(target=run_shard, args=(args, shard, all_restaurants))
+                   for shard in range(args.shards)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        merge_shards(city.journal_path)
+    else:
+        client = client_from_args(args)
+        with Journal(city.journal_path) as journal:
+            enrich_rows(remaining, journal, total, city=city)
+        report_savings(client)
+    
+    state = load_state(city.journal_path)
+    left = len(remaining_rows(all_restaurants, state))
+    if left:
+        print(f"\n⏸️  {left} restaurants still unprocessed - rerun to continue (no lookups will repeat)")
+        sys.exit(3)
+    
+    # Compact the journal into the final outputs
+    enriched, not_found = compact(state, order=all_restaurants,
+                                  final_path=city.final_path, notfound_path=city.notfound_path)
     
     print(f"\n\n=== FINAL RESULTS ===")
     print(f"Total scraped (Tabelog 3.5+): {total}")
     print(f"Passed filters (Tabelog 3.5+ AND Google 4.2+): {len(enriched)}")
     print(f"Failed: {len(not_found)}")
     
-    # Save final results
-    with open('kyoto_final.json', 'w', encoding='utf-8') as f:
-        json.dump(enriched, f, ensure_ascii=False, indent=2)
-    
-    with open('kyoto_notfound.json', 'w', encoding='utf-8') as f:
-        json.dump(not_found, f, ensure_ascii=False, indent=2)
-    
-    print(f"\n✅ Saved {len(enriched)} Kyoto restaurants to kyoto_final.json")
+    print(f"\n✅ Saved {len(enriched)} {city.name} restaurants to {city.final_path}")
 
 if __name__ == '__main__':
     main()
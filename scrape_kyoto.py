@@ -1,160 +1,120 @@
 #!/usr/bin/env python3
 """
 Scrape Kyoto restaurants from Tabelog (3.5+) and cross-reference with Google (4.2+)
+
+--city scrapes another city from cities.py instead (its own <city>_*.json files).
 """
 import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import time
 import json
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from cities import add_city_argument, get_city
+from places_client import search_google_places
+from rate_limit import TokenBucket
+
+MAX_PAGES = 100
 
-GOOGLE_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
+TABELOG_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+}
 
-def scrape_tabelog_kyoto(page_num, min_rating=3.5):
-    """Scrape a single page of Kyoto Tabelog results"""
-    # Kyoto URL - sorted by rating
-    url = f"https://tabelog.com/kyoto/rstLst/{page_num}/?SrtT=rt"
+def parse_tabelog_page(content, min_rating=3.5):
+    """Parse a Tabelog listing page into (restaurants, should_continue)"""
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Find restaurant listings
+    listings = soup.find_all('div', class_='list-rst')
+    
+    if not listings:
+        return None, False
+    
+    restaurants = []
+    should_continue = True
+    
+    for listing in listings:
+        try:
+            # Extract rating
+            rating_elem = listing.find('span', class_='c-rating__val')
+            if not rating_elem:
+                continue
+            
+            rating = float(rating_elem.text.strip())
+            
+            # Check if we should continue (ratings are descending)
+            if rating < min_rating:
+                should_continue = False
+                break
+            
+            # Extract name
+            name_elem = listing.find('a', class_='list-rst__rst-name-target')
+            if not name_elem:
+                continue
+            
+            name = name_elem.text.strip()
+            
+            # Extract area
+            area_elem = listing.find('div', class_='list-rst__area')
+            area = area_elem.text.strip() if area_elem else 'Unknown'
+            
+            # Extract cuisine
+            cuisine_elem = listing.find('div', class_='list-rst__genre')
+            cuisine = cuisine_elem.text.strip() if cuisine_elem else 'Japanese'
+            
+            restaurants.append({
+                'name': name,
+                'tabelog_rating': rating,
+                'area': area,
+                'cuisine': cuisine
+            })
+            
+            print(f"  Found: {name} ({rating})")
+            
+        except Exception as e:
+            print(f"  Error parsing listing: {e}")
+            continue
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-    }
+    return restaurants, should_continue
+
+def scrape_tabelog_kyoto(page_num, min_rating=3.5, area='kyoto'):
+    """Scrape a single page of Tabelog results for `area` (Kyoto by default)"""
+    # Area listing - sorted by rating
+    url = f"https://tabelog.com/{area}/rstLst/{page_num}/?SrtT=rt"
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        response = requests.get(url, headers=TABELOG_HEADERS, timeout=30)
         if response.status_code != 200:
             return None, False
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find restaurant listings
-        listings = soup.find_all('div', class_='list-rst')
-        
-        if not listings:
-            return None, False
-        
-        restaurants = []
-        should_continue = True
-        
-        for listing in listings:
-            try:
-                # Extract rating
-                rating_elem = listing.find('span', class_='c-rating__val')
-                if not rating_elem:
-                    continue
-                
-                rating = float(rating_elem.text.strip())
-                
-                # Check if we should continue (ratings are descending)
-                if rating < min_rating:
-                    should_continue = False
-                    break
-                
-                # Extract name
-                name_elem = listing.find('a', class_='list-rst__rst-name-target')
-                if not name_elem:
-                    continue
-                
-                name = name_elem.text.strip()
-                
-                # Extract area
-                area_elem = listing.find('div', class_='list-rst__area')
-                area = area_elem.text.strip() if area_elem else 'Unknown'
-                
-                # Extract cuisine
-                cuisine_elem = listing.find('div', class_='list-rst__genre')
-                cuisine = cuisine_elem.text.strip() if cuisine_elem else 'Japanese'
-                
-                restaurants.append({
-                    'name': name,
-                    'tabelog_rating': rating,
-                    'area': area,
-                    'cuisine': cuisine
-                })
-                
-                print(f"  Found: {name} ({rating})")
-                
-            except Exception as e:
-                print(f"  Error parsing listing: {e}")
-                continue
-        
-        return restaurants, should_continue
+        return parse_tabelog_page(response.content, min_rating)
         
     except Exception as e:
         print(f"Error fetching page {page_num}: {e}")
         return None, False
 
-def search_google_places(name, city="Kyoto"):
-    """Search Google Places API for restaurant in Kyoto"""
-    if not GOOGLE_API_KEY:
-        return None
-    
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        'query': f"{name} {city} Japan",
-        'key': GOOGLE_API_KEY
-    }
-    
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-        
-        if data['status'] == 'OK' and data['results']:
-            place = data['results'][0]
-            place_id = place.get('place_id')
-            
-            # Get place details
-            details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-            details_params = {
-                'place_id': place_id,
-                'fields': 'name,rating,user_ratings_total,formatted_address,geometry,place_id,opening_hours,price_level,photos',
-                'key': GOOGLE_API_KEY
-            }
-            
-            details_response = requests.get(details_url, params=details_params, timeout=10)
-            details_data = details_response.json()
-            
-            if details_data['status'] == 'OK':
-                result = details_data['result']
-                
-                # Get up to 5 photo URLs
-                photo_urls = []
-                if 'photos' in result:
-                    for photo in result['photos'][:5]:
-                        photo_ref = photo['photo_reference']
-                        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photo_reference={photo_ref}&key={GOOGLE_API_KEY}"
-                        photo_urls.append(photo_url)
-                
-                return {
-                    'google_name': result.get('name'),
-                    'google_rating': result.get('rating'),
-                    'google_user_ratings_total': result.get('user_ratings_total'),
-                    'google_address': result.get('formatted_address'),
-                    'google_place_id': result.get('place_id'),
-                    'lat': result['geometry']['location']['lat'],
-                    'lng': result['geometry']['location']['lng'],
-                    'price_level': result.get('price_level'),
-                    'opening_hours': result.get('opening_hours', {}).get('weekday_text', []),
-                    'open_now': result.get('opening_hours', {}).get('open_now'),
-                    'photo_urls': photo_urls
-                }
-    except Exception as e:
-        print(f"  Google Places error: {e}")
-    
-    return None
+def merge_pages(pages, max_pages=MAX_PAGES):
+    """Merge {page: (restaurants, should_continue)} in page (= rating) order,
+    stopping exactly where the sequential crawl would have stopped"""
+    all_restaurants = []
+    for page in range(1, max_pages + 1):
+        restaurants, should_continue = pages.get(page, (None, False))
+        if not restaurants:
+            break
+        all_restaurants.extend(restaurants)
+        if not should_continue:
+            break
+    return all_restaurants
 
-def main():
-    print("=== KYOTO FOOD FINDER ===")
-    print("Scraping Tabelog for Kyoto restaurants (3.5+ rating)...\n")
-    
+def crawl_tabelog_kyoto(min_rating=3.5, max_pages=MAX_PAGES, area='kyoto'):
+    """Crawl rating-sorted pages one at a time until ratings drop below min_rating"""
     all_restaurants = []
     page = 1
     
     while True:
         print(f"=== Page {page} ===")
-        restaurants, should_continue = scrape_tabelog_kyoto(page, min_rating=3.5)
+        restaurants, should_continue = scrape_tabelog_kyoto(page, min_rating=min_rating, area=area)
         
         if not restaurants:
             print("No more results or error, stopping.")
@@ -163,23 +123,97 @@ def main():
         all_restaurants.extend(restaurants)
         
         if not should_continue:
-            print(f"Reached restaurants below 3.5 rating, stopping.")
+            print(f"Reached restaurants below {min_rating} rating, stopping.")
             break
         
         page += 1
         time.sleep(2)  # Be nice to Tabelog
         
         # Safety limit
-        if page > 100:
-            print("Reached page limit (100), stopping.")
+        if page > max_pages:
+            print(f"Reached page limit ({max_pages}), stopping.")
+            break
+    
+    return all_restaurants
+
+async def crawl_tabelog_kyoto_async(min_rating=3.5, max_pages=MAX_PAGES, concurrency=4, rate=0.5, area='kyoto'):
+    """Crawl with up to `concurrency` pages in flight, throttled to `rate` pages/sec.
+
+    The first page that comes back empty or reports should_continue=False
+    becomes the cutoff: no pages past it are issued and in-flight pages
+    past it are cancelled. Output is identical to crawl_tabelog_kyoto().
+    """
+    bucket = TokenBucket(rate, capacity=concurrency)
+    pages = {}
+    in_flight = {}
+    cutoff = max_pages + 1
+    next_page = 1
+    
+    async def fetch(page):
+        await bucket.acquire_async()
+        return await asyncio.to_thread(scrape_tabelog_kyoto, page, min_rating, area)
+    
+    while True:
+        while len(in_flight) < concurrency and next_page < cutoff:
+            in_flight[asyncio.create_task(fetch(next_page))] = next_page
+            next_page += 1
+        
+        if not in_flight:
             break
+        
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            page = in_flight.pop(task)
+            restaurants, should_continue = task.result()
+            pages[page] = (restaurants, should_continue)
+            print(f"=== Page {page} done ({len(restaurants or [])} restaurants) ===")
+            if not restaurants or not should_continue:
+                cutoff = min(cutoff, page)
+        
+        # Pages beyond the cutoff can never be part of the result
+        beyond = [task for task, page in in_flight.items() if page > cutoff]
+        for task in beyond:
+            del in_flight[task]
+            task.cancel()
+        if beyond:
+            print(f"Cancelled {len(beyond)} in-flight pages past page {cutoff}")
+            await asyncio.gather(*beyond, return_exceptions=True)
+    
+    return merge_pages(pages, max_pages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--async-crawl', action='store_true',
+                        help='fetch Tabelog pages concurrently instead of one at a time')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='pages in flight in --async-crawl mode (default: 4)')
+    parser.add_argument('--rate', type=float, default=0.5,
+                        help='max Tabelog pages per second in --async-crawl mode (default: 0.5)')
+    parser.add_argument('--scrape-only', action='store_true',
+                        help='stop after writing the raw Tabelog results (enrich with enrich_google.py)')
+    add_city_argument(parser)
+    args = parser.parse_args()
+    city = get_city(args.city)
     
-    print(f"\n\nFound {len(all_restaurants)} Kyoto restaurants (Tabelog 3.5+)")
+    print(f"=== {city.name.upper()} FOOD FINDER ===")
+    print(f"Scraping Tabelog for {city.name} restaurants (3.5+ rating)...\n")
+    
+    if args.async_crawl:
+        all_restaurants = asyncio.run(crawl_tabelog_kyoto_async(
+            min_rating=3.5, concurrency=args.concurrency, rate=args.rate, area=city.tabelog_area))
+    else:
+        all_restaurants = crawl_tabelog_kyoto(min_rating=3.5, area=city.tabelog_area)
+    
+    print(f"\n\nFound {len(all_restaurants)} {city.name} restaurants (Tabelog 3.5+)")
     
     # Save raw results
-    with open('kyoto_raw.json', 'w', encoding='utf-8') as f:
+    with open(city.raw_path, 'w', encoding='utf-8') as f:
         json.dump(all_restaurants, f, ensure_ascii=False, indent=2)
     
+    if args.scrape_only:
+        print(f"\n✅ Saved {len(all_restaurants)} {city.name} restaurants to {city.raw_path}")
+        return
+    
     print("\nEnriching with Google Places data...")
     
     enriched = []
@@ -189,7 +223,7 @@ def main():
         print(f"\n[{i}/{len(all_restaurants)}] Processing: {restaurant['name']}")
         
         # Search Google Places
-        google_data = search_google_places(restaurant['name'])
+        google_data = search_google_places(restaurant['name'], city.name)
         
         if not google_data:
             print("  ❌ Not found on Google")
@@ -214,14 +248,14 @@ def main():
     print(f"Failed: {len(not_found)}")
     
     # Save enriched results
-    with open('kyoto_final.json', 'w', encoding='utf-8') as f:
+    with open(city.final_path, 'w', encoding='utf-8') as f:
         json.dump(enriched, f, ensure_ascii=False, indent=2)
     
     # Save not found
-    with open('kyoto_notfound.json', 'w', encoding='utf-8') as f:
+    with open(city.notfound_path, 'w', encoding='utf-8') as f:
         json.dump(not_found, f, ensure_ascii=False, indent=2)
     
-    print(f"\n✅ Saved {len(enriched)} Kyoto restaurants to kyoto_final.json")
+    print(f"\n✅ Saved {len(enriched)} {city.name} restaurants to {city.final_path}")
 
 if __name__ == '__main__':
     main()
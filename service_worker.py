@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Generate sw.js with a content-hash manifest of the app's assets.
+
+build_map.py calls write_service_worker() after writing index.html. The
+worker's precache is named after a hash of every local asset it lists, so
+any change to the HTML, icons, manifest or data file ships a new sw.js and
+the browser installs it on the next visit; nothing has to be bumped by hand.
+
+Caching strategy in the generated worker:
+  * index.html and the data file: stale-while-revalidate, so the page opens
+    instantly from cache and the next visit sees the refreshed data; a
+    multi-city build's shards, and a compact build's photos file, are only
+    cached once fetched
+  * Leaflet from the CDN: cache-first (the URLs are versioned)
+  * photos and map tiles: cache-first in runtime caches bounded to a fixed
+    number of entries, evicting the least recently used. Only CORS or
+    same-origin responses go there: browsers count every opaque (no-cors)
+    entry as several MB of quota, so those get their own much smaller cache
+  * tiles listed in tiles.json (build_map.py --precache-tiles): downloaded
+    in the background on request from the page, kept in their own cache
+  * anything else goes to the network and is not stored
+
+Run directly to regenerate sw.js for an existing index.html.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from tile_precache import MANIFEST_NAME as TILE_MANIFEST_NAME, PRECACHE_TILES_JS, TILE_URL
+
+APP_ID = 'kyoto-food-finder'
+SW_NAME = 'sw.js'
+
+# Local files precached next to the HTML when they exist
+SHELL_ASSETS = ['manifest.json', 'icon-192.png', 'icon-512.png']
+CDN_ASSETS = [
+    'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css',
+    'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js',
+    'https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon.png',
+    'https://unpkg.com/leaflet@1.9.4/dist/images/marker-shadow.png',
+]
+
+# Runtime cache bounds; a popup shows up to 10 photos, a phone screen ~20 tiles
+PHOTO_CACHE_ENTRIES = 300
+TILE_CACHE_ENTRIES = 800
+# Chrome pads each opaque response to ~7 MB of quota; 20 is already ~140 MB
+OPAQUE_CACHE_ENTRIES = 20
+
+DATA_URL_PATTERN = re.compile(r"""['"](data/[\w-]+\.[0-9a-f]{12}\.json)['"]""")
+# build_map.py --split-data --compact: the photos file fetched after the markers
+PHOTOS_DATA_PREFIX = 'data/photos.'
+
+
+def content_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def asset_manifest(root, urls):
+    """{url: content hash} for the URLs (relative to `root`) that exist on disk"""
+    assets = {}
+    for url in urls:
+        path = os.path.join(root or '.', *url.split('/'))
+        if os.path.isfile(path):
+            assets[url] = content_hash(path)
+    return assets
+
+
+def render_service_worker(assets, shell='index.html', data_urls=(), app_id=APP_ID,
+                          photo_entries=PHOTO_CACHE_ENTRIES, tile_entries=TILE_CACHE_ENTRIES,
+                          opaque_entries=OPAQUE_CACHE_ENTRIES, tile_url=TILE_URL, tile_manifest=None, lazy_data_urls=()):
+    """Source of sw.js precaching `assets` ({url: hash}, relative to the worker)
+
+    `lazy_data_urls` are data files kept across updates but not precached.
+    """
+    version = hashlib.sha256(json.dumps([assets, CDN_ASSETS], sort_keys=True).encode()).hexdigest()[:12]
+    return f'''// Generated by service_worker.py (build_map.py); edits are overwritten on the next build
+const VERSION = '{version}';
+const PRECACHE = '{app_id}-shell-' + VERSION;
+const DATA_CACHE = '{app_id}-data';
+const TILE_CACHE = '{app_id}-offline-tiles';
+const OPAQUE_CACHE = '{app_id}-opaque';
+const RUNTIME_LIMITS = {{
+    '{app_id}-photos': {photo_entries},
+    '{app_id}-tiles': {tile_entries},
+    [OPAQUE_CACHE]: {opaque_entries}
+}};
+
+// url -> content hash; VERSION changes whenever any of these do
+const ASSETS = {json.dumps(assets, indent=4, sort_keys=True)};
+const CDN_ASSETS = {json.dumps(CDN_ASSETS, indent=4)};
+const DATA_URLS = {json.dumps(sorted(data_urls))};
+const LAZY_DATA_URLS = {json.dumps(sorted(lazy_data_urls))};
+const TILE_MANIFEST = {json.dumps(tile_manifest)};
+
+const SHELL_URL = new URL('{shell}', self.location).href;
+const DATA_HREFS = new Set(DATA_URLS.concat(LAZY_DATA_URLS).map(url => new URL(url, self.location).href));
+const DATA_PREFIX = new URL('data/', self.location).href;
+const PHOTO_PREFIX = new URL('photos/', self.location).href;
+const PHOTO_API = 'https://maps.googleapis.com/maps/api/place/photo';
+const TILE_HOSTS = /(^|\\.)tile\\.openstreetmap\\.org$|^cartodb-basemaps-[a-z]\\.global\\.ssl\\.fastly\\.net$/;
+const TILE_PREFIX = {json.dumps(tile_url.split('{z}')[0])};
+
+self.addEventListener('install', event => {{
+    const local = Object.keys(ASSETS).filter(url => !DATA_URLS.includes(url) && !LAZY_DATA_URLS.includes(url));
+    event.waitUntil(Promise.all([
+        // cache: 'reload' so the precache never copies a stale HTTP-cache entry
+        caches.open(PRECACHE).then(cache => cache.addAll(
+            local.map(url => new Request(url, {{ cache: 'reload' }})).concat(CDN_ASSETS))),
+        caches.open(DATA_CACHE).then(cache => cache.addAll(
+            DATA_URLS.map(url => new Request(url, {{ cache: 'reload' }}))))
+    ]));
+    self.skipWaiting();
+}});
+
+self.addEventListener('activate', event => {{
+    const keep = new Set([PRECACHE, DATA_CACHE, TILE_CACHE, ...Object.keys(RUNTIME_LIMITS)]);
+    event.waitUntil((async () => {{
+        for (const name of await caches.keys()) {{
+            if (!keep.has(name)) await caches.delete(name);
+        }}
+        // Data files are content-hashed: superseded ones are never requested again
+        const data = await caches.open(DATA_CACHE);
+        for (const request of await data.keys()) {{
+            if (!DATA_HREFS.has(request.url)) await data.delete(request);
+        }}
+    }})());
+    self.clients.claim();
+}});
+
+self.addEventListener('fetch', event => {{
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (request.mode === 'navigate' || url.href === SHELL_URL) {{
+        event.respondWith(staleWhileRevalidate(event, PRECACHE, SHELL_URL));
+    }} else if (DATA_HREFS.has(url.href) || url.href.startsWith(DATA_PREFIX)) {{
+        event.respondWith(staleWhileRevalidate(event, DATA_CACHE, request));
+    }} else if (url.href.startsWith(PHOTO_PREFIX) || url.href.startsWith(PHOTO_API)) {{
+        event.respondWith(lruCacheFirst(event, '{app_id}-photos'));
+    }} else if (TILE_HOSTS.test(url.hostname) || url.href.startsWith(TILE_PREFIX)) {{
+        event.respondWith(caches.open(TILE_CACHE)
+            .then(cache => cache.match(request))
+            .then(cached => cached || lruCacheFirst(event, '{app_id}-tiles')));
+    }} else {{
+        event.respondWith(caches.match(request).then(cached => cached || fetch(request)));
+    }}
+}});
+
+// The page asks for the offline tiles once it has loaded
+let tilePrecache = null;
+
+self.addEventListener('message', event => {{
+    if (!TILE_MANIFEST || !event.data || event.data.type !== 'precache-tiles') return;
+    if (!tilePrecache) {{
+        tilePrecache = precacheTiles(TILE_MANIFEST, TILE_CACHE)
+            .catch(error => console.log('Tile precache failed:', error))
+            .finally(() => {{ tilePrecache = null; }});
+    }}
+    event.waitUntil(tilePrecache);
+}});
+
+{PRECACHE_TILES_JS}
+
+// Answer from cache when possible and refresh the entry in the background
+async function staleWhileRevalidate(event, cacheName, key) {{
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(key, {{ ignoreSearch: true }});
+    const refresh = fetch(event.request).then(async response => {{
+        if (response.ok) await cache.put(key, response.clone());
+        return response;
+    }});
+    if (!cached) return refresh;
+    event.waitUntil(refresh.catch(() => {{}}));
+    return cached;
+}}
+
+// Cache API keys() lists entries in insertion order, so re-inserting on
+// every hit keeps the least recently used entries at the front
+async function lruCacheFirst(event, cacheName) {{
+    const request = event.request;
+    for (const name of [cacheName, OPAQUE_CACHE]) {{
+        const cache = await caches.open(name);
+        const cached = await cache.match(request);
+        if (cached) {{
+            const copy = cached.clone();
+            event.waitUntil(cache.delete(request).then(() => cache.put(request, copy)));
+            return cached;
+        }}
+    }}
+    const response = await fetch(request);
+    // Tiles are CORS requests (crossOrigin in the page). No-cors images, such
+    // as Photo API redirects, are opaque: no status to check and padded in
+    // quota accounting, so only a few are kept, apart from everything else
+    const target = response.ok ? cacheName : response.type === 'opaque' ? OPAQUE_CACHE : null;
+    if (target) {{
+        event.waitUntil(caches.open(target)
+            .then(cache => cache.put(request, response.clone()))
+            .then(() => trimCache(target)));
+    }}
+    return response;
+}}
+
+const trimming = {{}};
+
+function trimCache(cacheName) {{
+    // One trim at a time per cache, or concurrent ones evict twice
+    trimming[cacheName] = (trimming[cacheName] || Promise.resolve()).then(async () => {{
+        const cache = await caches.open(cacheName);
+        const keys = await cache.keys();
+        const excess = keys.length - RUNTIME_LIMITS[cacheName];
+        for (let i = 0; i < excess; i++) await cache.delete(keys[i]);
+    }}).catch(() => {{}});
+    return trimming[cacheName];
+}}
+'''
+
+
+def write_service_worker(html_path, data_url=None, app_id=APP_ID, tile_url=TILE_URL, tile_manifest=None,
+                         lazy_data_urls=()):
+    """Write sw.js next to `html_path`; returns (path, number of precached local assets)"""
+    root = os.path.dirname(html_path)
+    shell = os.path.basename(html_path)
+    data_urls = [data_url] if data_url else []
+    tile_urls = [tile_manifest] if tile_manifest else []
+    assets = asset_manifest(root, [shell] + SHELL_ASSETS + tile_urls + data_urls)
+    precached = len(assets)
+    # Shard names already carry their content hash
+    assets.update((url, url.rsplit('.', 2)[-2]) for url in lazy_data_urls)
+    path = os.path.join(root, SW_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_service_worker(assets, shell, data_urls, app_id, tile_url=tile_url,
+                                      tile_manifest=tile_manifest, lazy_data_urls=lazy_data_urls))
+    return path, precached
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--html', default='index.html')
+    parser.add_argument('--app-id', default=APP_ID, help='prefix of the cache names')
+    args = parser.parse_args()
+
+    # A --split-data build names its data file in the page
+    with open(args.html, 'r', encoding='utf-8') as f:
+        html = f.read()
+    data_urls = DATA_URL_PATTERN.findall(html)
+    # A multi-city shell (multi_city.py) lists every shard but loads them lazily,
+    # and a --split-data --compact page fetches its photos file after the markers
+    lazy = 'loadCity(' in html
+    photo_urls = sorted({url for url in data_urls if url.startswith(PHOTOS_DATA_PREFIX)})
+    data_urls = [url for url in data_urls if url not in photo_urls]
+
+    # ...and a --precache-tiles one asks the worker for the tiles
+    tile_url, tile_manifest = TILE_URL, None
+    tiles_path = os.path.join(os.path.dirname(args.html), TILE_MANIFEST_NAME)
+    if "'precache-tiles'" in html and os.path.exists(tiles_path):
+        with open(tiles_path, 'r', encoding='utf-8') as f:
+            tile_url, tile_manifest = json.load(f)['template'], TILE_MANIFEST_NAME
+
+    path, count = write_service_worker(args.html, None if lazy or not data_urls else data_urls[0], args.app_id,
+                                       tile_url, tile_manifest,
+                                       lazy_data_urls=(data_urls if lazy else []) + photo_urls)
+    print(f"🧰 Wrote {path} precaching {count} local assets")
+
+
+if __name__ == '__main__':
+    main()
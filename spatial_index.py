@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Static grid index for "nearest restaurants" queries.
+
+build_map.py buckets every restaurant into fixed-size cells (about 500 m
+square) and ships the occupied cells with the data. The page then answers
+"nearest 20 within a 15-minute walk" from the handful of cells around the
+user instead of computing the distance to every feature on each GPS
+update. GridIndex.nearest() is the reference implementation of the page's
+nearbyRestaurants(), and GridIndex.within() of restaurantsInBounds(), which
+--clusters pages use to keep markers only for the visible area.
+tests/test_spatial_index.py checks both against a brute-force scan.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371
+METERS_PER_DEGREE = 111195  # of latitude, on the haversine sphere
+
+CELL_METERS = 500
+
+# Same assumptions as getWalkingTime() in the page
+WALKING_SPEED_KMH = 5
+NEARBY_LIMIT = 20
+NEARBY_MINUTES = 15
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance; the same formula as getDistance() in the page"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+    a = (math.sin(d_lat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lng / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def walking_km(minutes):
+    return WALKING_SPEED_KMH * minutes / 60
+
+
+class GridIndex:
+    """Uniform lat/lng grid; cells maps row * cols + col -> point indices"""
+
+    def __init__(self, origin, lat_step, lng_step, cols, cells, points):
+        self.origin = origin
+        self.lat_step = lat_step
+        self.lng_step = lng_step
+        self.cols = cols
+        self.cells = cells
+        self.points = points  # [(lat, lng)], in feature order
+
+    @classmethod
+    def build(cls, points, cell_meters=CELL_METERS):
+        """Index [(lat, lng)] points; cells are square at the points' mean latitude"""
+        if not points:
+            return cls([0, 0], 1, 1, 1, {}, [])
+        mean_lat = sum(lat for lat, _ in points) / len(points)
+        lat_step = cell_meters / METERS_PER_DEGREE
+        lng_step = cell_meters / (METERS_PER_DEGREE * math.cos(math.radians(mean_lat)))
+        origin = [min(lat for lat, _ in points), min(lng for _, lng in points)]
+        cols = int((max(lng for _, lng in points) - origin[1]) / lng_step) + 1
+
+        index = cls(origin, lat_step, lng_step, cols, {}, list(points))
+        for i, (lat, lng) in enumerate(points):
+            row, col = index.cell_of(lat, lng)
+            index.cells.setdefault(row * cols + col, []).append(i)
+        return index
+
+    @classmethod
+    def from_dict(cls, data, points):
+        cells = {int(cell): members for cell, members in data['cells'].items()}
+        return cls(data['origin'], data['lat_step'], data['lng_step'], data['cols'], cells, points)
+
+    def to_dict(self):
+        """JSON-ready form shipped to the page (cell ids become object keys)"""
+        return {
+            'origin': self.origin,
+            'lat_step': self.lat_step,
+            'lng_step': self.lng_step,
+            'cols': self.cols,
+            'cells': {str(cell): members for cell, members in sorted(self.cells.items())},
+        }
+
+    def cell_of(self, lat, lng):
+        return (math.floor((lat - self.origin[0]) / self.lat_step),
+                math.floor((lng - self.origin[1]) / self.lng_step))
+
+    def nearest(self, lat, lng, limit=NEARBY_LIMIT, max_km=walking_km(NEARBY_MINUTES)):
+        """[(distance_km, point index)] of the closest points within max_km, nearest first"""
+        row, col = self.cell_of(lat, lng)
+        # Cells to search each way; the extra cell absorbs the curvature error of
+        # measuring longitude distance at the query's latitude
+        row_reach = math.ceil(max_km * 1000 / METERS_PER_DEGREE / self.lat_step) + 1
+        lng_km_per_degree = METERS_PER_DEGREE / 1000 * max(math.cos(math.radians(lat)), 1e-6)
+        col_reach = math.ceil(max_km / lng_km_per_degree / self.lng_step) + 1
+
+        found = []
+        for r in range(row - row_reach, row + row_reach + 1):
+            for c in range(max(col - col_reach, 0), min(col + col_reach, self.cols - 1) + 1):
+                for i in self.cells.get(r * self.cols + c, ()):
+                    distance = haversine_km(lat, lng, *self.points[i])
+                    if distance <= max_km:
+                        found.append((distance, i))
+        found.sort()
+        return found[:limit]
+
+    def within(self, south, west, north, east):
+        """Point indices inside the lat/lng box, in index order"""
+        first_row, first_col = self.cell_of(south, west)
+        last_row, last_col = self.cell_of(north, east)
+        # Clamped to the occupied rows, so a zoomed-out box is as cheap as the data
+        rows = max(self.cells, default=-1) // self.cols + 1
+        found = []
+        for r in range(max(first_row, 0), min(last_row, rows - 1) + 1):
+            for c in range(max(first_col, 0), min(last_col, self.cols - 1) + 1):
+                for i in self.cells.get(r * self.cols + c, ()):
+                    lat, lng = self.points[i]
+                    if south <= lat <= north and west <= lng <= east:
+                        found.append(i)
+        return sorted(found)
+
+
+# Browser counterpart of GridIndex.nearest(); expects getDistance() in scope
+NEARBY_JS = '''// Closest features within maxKm of [lat, lng], nearest first, via the grid index
+        function nearbyRestaurants(lat, lng, limit, maxKm, accept) {
+            const index = restaurants.spatial_index;
+            if (!index) return [];
+            const row = Math.floor((lat - index.origin[0]) / index.lat_step);
+            const col = Math.floor((lng - index.origin[1]) / index.lng_step);
+            const rowReach = Math.ceil(maxKm * 1000 / 111195 / index.lat_step) + 1;
+            const lngKmPerDegree = 111.195 * Math.max(Math.cos(lat * Math.PI / 180), 1e-6);
+            const colReach = Math.ceil(maxKm / lngKmPerDegree / index.lng_step) + 1;
+            const found = [];
+            for (let r = row - rowReach; r <= row + rowReach; r++) {
+                const firstCol = Math.max(col - colReach, 0);
+                const lastCol = Math.min(col + colReach, index.cols - 1);
+                for (let c = firstCol; c <= lastCol; c++) {
+                    const members = index.cells[r * index.cols + c];
+                    if (!members) continue;
+                    for (const i of members) {
+                        if (accept && !accept(i)) continue;
+                        const coords = restaurants.features[i].geometry.coordinates;
+                        const distance = getDistance(lat, lng, coords[1], coords[0]);
+                        if (distance <= maxKm) found.push([distance, i]);
+                    }
+                }
+            }
+            found.sort((a, b) => a[0] - b[0] || a[1] - b[1]);
+            return found.slice(0, limit);
+        }'''
+
+# Browser counterpart of GridIndex.within(); `bounds` is a Leaflet LatLngBounds
+VIEWPORT_JS = '''// Indices of the features inside `bounds`, from the grid cells it overlaps
+        function restaurantsInBounds(bounds) {
+            const index = restaurants.spatial_index;
+            const south = bounds.getSouth(), west = bounds.getWest();
+            const north = bounds.getNorth(), east = bounds.getEast();
+            if (index.rows === undefined) {
+                index.rows = Object.keys(index.cells).reduce((rows, cell) => Math.max(rows, Math.floor(cell / index.cols) + 1), 0);
+            }
+            // Clamped to the occupied rows, so a zoomed-out view is as cheap as the data
+            const firstRow = Math.max(Math.floor((south - index.origin[0]) / index.lat_step), 0);
+            const lastRow = Math.min(Math.floor((north - index.origin[0]) / index.lat_step), index.rows - 1);
+            const firstCol = Math.max(Math.floor((west - index.origin[1]) / index.lng_step), 0);
+            const lastCol = Math.min(Math.floor((east - index.origin[1]) / index.lng_step), index.cols - 1);
+            const found = [];
+            for (let r = firstRow; r <= lastRow; r++) {
+                for (let c = firstCol; c <= lastCol; c++) {
+                    const members = index.cells[r * index.cols + c];
+                    if (!members) continue;
+                    for (const i of members) {
+                        const [lng, lat] = restaurants.features[i].geometry.coordinates;
+                        if (lat >= south && lat <= north && lng >= west && lng <= east) found.push(i);
+                    }
+                }
+            }
+            return found;
+        }'''
+
@@ -1,71 +1,209 @@
-const CACHE_NAME = 'kyoto-food-finder-v1';
-const urlsToCache = [
-  '/kyoto-food-finder/',
-  '/kyoto-food-finder/index.html',
-  '/kyoto-food-finder/manifest.json',
-  'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css',
-  'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js',
-  'https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon.png',
-  'https://unpkg.com/leaflet@1.9.4/dist/images/marker-shadow.png'
+// Generated by service_worker.py (build_map.py); edits are overwritten on the next build
+const VERSION = 'c28642495b13';
+const PRECACHE = 'kyoto-food-finder-shell-' + VERSION;
+const DATA_CACHE = 'kyoto-food-finder-data';
+const TILE_CACHE = 'kyoto-food-finder-offline-tiles';
+const OPAQUE_CACHE = 'kyoto-food-finder-opaque';
+const RUNTIME_LIMITS = {
+    'kyoto-food-finder-photos': 300,
+    'kyoto-food-finder-tiles': 800,
+    [OPAQUE_CACHE]: 20
+};
+
+// url -> content hash; VERSION changes whenever any of these do
+const ASSETS = {
+    "icon-192.png": "3e516c3bb893",
+    "icon-512.png": "9887c815bbab",
+    "index.html": "839635b23c7f",
+    "manifest.json": "d568932daf1a"
+};
+const CDN_ASSETS = [
+    "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css",
+    "https://unpkg.com/leaflet@1.9.4/dist/leaflet.js",
+    "https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon.png",
+    "https://unpkg.com/leaflet@1.9.4/dist/images/marker-shadow.png"
 ];
+const DATA_URLS = [];
+const LAZY_DATA_URLS = [];
+const TILE_MANIFEST = null;
+
+const SHELL_URL = new URL('index.html', self.location).href;
+const DATA_HREFS = new Set(DATA_URLS.concat(LAZY_DATA_URLS).map(url => new URL(url, self.location).href));
+const DATA_PREFIX = new URL('data/', self.location).href;
+const PHOTO_PREFIX = new URL('photos/', self.location).href;
+const PHOTO_API = 'https://maps.googleapis.com/maps/api/place/photo';
+const TILE_HOSTS = /(^|\.)tile\.openstreetmap\.org$|^cartodb-basemaps-[a-z]\.global\.ssl\.fastly\.net$/;
+const TILE_PREFIX = "https://tile.openstreetmap.org/";
 
-// Install event - cache assets
 self.addEventListener('install', event => {
-  event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then(cache => {
-        console.log('Opened cache');
-        return cache.addAll(urlsToCache);
-      })
-  );
-  self.skipWaiting();
+    const local = Object.keys(ASSETS).filter(url => !DATA_URLS.includes(url) && !LAZY_DATA_URLS.includes(url));
+    event.waitUntil(Promise.all([
+        // cache: 'reload' so the precache never copies a stale HTTP-cache entry
+        caches.open(PRECACHE).then(cache => cache.addAll(
+            local.map(url => new Request(url, { cache: 'reload' })).concat(CDN_ASSETS))),
+        caches.open(DATA_CACHE).then(cache => cache.addAll(
+            DATA_URLS.map(url => new Request(url, { cache: 'reload' }))))
+    ]));
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+    const keep = new Set([PRECACHE, DATA_CACHE, TILE_CACHE, ...Object.keys(RUNTIME_LIMITS)]);
+    event.waitUntil((async () => {
+        for (const name of await caches.keys()) {
+            if (!keep.has(name)) await caches.delete(name);
+        }
+        // Data files are content-hashed: superseded ones are never requested again
+        const data = await caches.open(DATA_CACHE);
+        for (const request of await data.keys()) {
+            if (!DATA_HREFS.has(request.url)) await data.delete(request);
+        }
+    })());
+    self.clients.claim();
 });
 
-// Fetch event - serve from cache, fallback to network
 self.addEventListener('fetch', event => {
-  event.respondWith(
-    caches.match(event.request)
-      .then(response => {
-        // Cache hit - return response
-        if (response) {
-          return response;
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (request.mode === 'navigate' || url.href === SHELL_URL) {
+        event.respondWith(staleWhileRevalidate(event, PRECACHE, SHELL_URL));
+    } else if (DATA_HREFS.has(url.href) || url.href.startsWith(DATA_PREFIX)) {
+        event.respondWith(staleWhileRevalidate(event, DATA_CACHE, request));
+    } else if (url.href.startsWith(PHOTO_PREFIX) || url.href.startsWith(PHOTO_API)) {
+        event.respondWith(lruCacheFirst(event, 'kyoto-food-finder-photos'));
+    } else if (TILE_HOSTS.test(url.hostname) || url.href.startsWith(TILE_PREFIX)) {
+        event.respondWith(caches.open(TILE_CACHE)
+            .then(cache => cache.match(request))
+            .then(cached => cached || lruCacheFirst(event, 'kyoto-food-finder-tiles')));
+    } else {
+        event.respondWith(caches.match(request).then(cached => cached || fetch(request)));
+    }
+});
+
+// The page asks for the offline tiles once it has loaded
+let tilePrecache = null;
+
+self.addEventListener('message', event => {
+    if (!TILE_MANIFEST || !event.data || event.data.type !== 'precache-tiles') return;
+    if (!tilePrecache) {
+        tilePrecache = precacheTiles(TILE_MANIFEST, TILE_CACHE)
+            .catch(error => console.log('Tile precache failed:', error))
+            .finally(() => { tilePrecache = null; });
+    }
+    event.waitUntil(tilePrecache);
+});
+
+async function precacheTiles(manifestUrl, tileCache) {
+    const response = await fetch(manifestUrl, { cache: 'no-cache' });
+    if (!response.ok) return;
+    const manifest = await response.json();
+    const cache = await caches.open(tileCache);
+    const have = new Set((await cache.keys()).map(request => request.url));
+
+    const listed = [];
+    for (const [zoom, runs] of Object.entries(manifest.zooms)) {
+        for (const [x, y0, y1] of runs) {
+            for (let y = y0; y <= y1; y++) {
+                listed.push(manifest.template.replace('{z}', zoom).replace('{x}', x).replace('{y}', y));
+            }
         }
+    }
+    // Drop tiles an earlier manifest listed but this one doesn't
+    const keep = new Set(listed);
+    for (const url of have) {
+        if (!keep.has(url)) await cache.delete(url);
+    }
+    const urls = listed.filter(url => !have.has(url));
+    if (!urls.length) return;
+
+    // Leave room for everything else on the origin
+    async function hasRoom(remaining) {
+        if (!self.navigator.storage || !self.navigator.storage.estimate) return true;
+        const { usage, quota } = await self.navigator.storage.estimate();
+        return usage + Math.min(remaining, 50) * manifest.average_bytes < quota * manifest.quota_share;
+    }
+    if (!await hasRoom(urls.length)) {
+        console.log('Tile precache skipped: not enough storage quota');
+        return;
+    }
 
-        return fetch(event.request).then(
-          response => {
-            // Check if valid response
-            if (!response || response.status !== 200 || response.type !== 'basic') {
-              return response;
+    let next = 0, fetched = 0, stopped = false;
+    async function worker() {
+        while (!stopped && next < urls.length) {
+            const url = urls[next++];
+            // Every 50 tiles, make sure the quota still has room
+            if (next % 50 === 0 && !await hasRoom(urls.length - next)) {
+                stopped = true;
+                console.log('Tile precache stopped: storage quota reached');
+                break;
+            }
+            try {
+                // CORS, so the cached response isn't an opaque one padded against the quota
+                const tile = await fetch(url, { mode: 'cors' });
+                if (tile.ok) {
+                    await cache.put(url, tile);
+                    fetched++;
+                }
+            } catch (error) {
+                // Offline or the tile server is refusing: try again on the next visit
+                stopped = true;
             }
+        }
+    }
+    await Promise.all(Array.from({ length: manifest.concurrency }, worker));
+    console.log(`Tile precache: ${fetched} new tiles, ${listed.length - urls.length} already cached`);
+}
 
-            // Clone the response
-            const responseToCache = response.clone();
+// Answer from cache when possible and refresh the entry in the background
+async function staleWhileRevalidate(event, cacheName, key) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(key, { ignoreSearch: true });
+    const refresh = fetch(event.request).then(async response => {
+        if (response.ok) await cache.put(key, response.clone());
+        return response;
+    });
+    if (!cached) return refresh;
+    event.waitUntil(refresh.catch(() => {}));
+    return cached;
+}
 
-            caches.open(CACHE_NAME)
-              .then(cache => {
-                cache.put(event.request, responseToCache);
-              });
+// Cache API keys() lists entries in insertion order, so re-inserting on
+// every hit keeps the least recently used entries at the front
+async function lruCacheFirst(event, cacheName) {
+    const request = event.request;
+    for (const name of [cacheName, OPAQUE_CACHE]) {
+        const cache = await caches.open(name);
+        const cached = await cache.match(request);
+        if (cached) {
+            const copy = cached.clone();
+            event.waitUntil(cache.delete(request).then(() => cache.put(request, copy)));
+            return cached;
+        }
+    }
+    const response = await fetch(request);
+    // Tiles are CORS requests (crossOrigin in the page). No-cors images, such
+    // as Photo API redirects, are opaque: no status to check and padded in
+    // quota accounting, so only a few are kept, apart from everything else
+    const target = response.ok ? cacheName : response.type === 'opaque' ? OPAQUE_CACHE : null;
+    if (target) {
+        event.waitUntil(caches.open(target)
+            .then(cache => cache.put(request, response.clone()))
+            .then(() => trimCache(target)));
+    }
+    return response;
+}
 
-            return response;
-          }
-        );
-      })
-  );
-});
+const trimming = {};
 
-// Activate event - clean up old caches
-self.addEventListener('activate', event => {
-  const cacheWhitelist = [CACHE_NAME];
-  event.waitUntil(
-    caches.keys().then(cacheNames => {
-      return Promise.all(
-        cacheNames.map(cacheName => {
-          if (cacheWhitelist.indexOf(cacheName) === -1) {
-            return caches.delete(cacheName);
-          }
-        })
-      );
-    })
-  );
-  self.clients.claim();
-});
+function trimCache(cacheName) {
+    // One trim at a time per cache, or concurrent ones evict twice
+    trimming[cacheName] = (trimming[cacheName] || Promise.resolve()).then(async () => {
+        const cache = await caches.open(cacheName);
+        const keys = await cache.keys();
+        const excess = keys.length - RUNTIME_LIMITS[cacheName];
+        for (let i = 0; i < excess; i++) await cache.delete(keys[i]);
+    }).catch(() => {});
+    return trimming[cacheName];
+}
@@ -0,0 +1,84 @@
+// Runs the inline script of a built page against a stubbed DOM and Leaflet.
+// Usage: node run_page.js index.html  -> prints a JSON summary, exits 1 on an error
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const htmlPath = process.argv[2];
+const root = path.dirname(htmlPath);
+const html = fs.readFileSync(htmlPath, 'utf8');
+const scripts = [...html.matchAll(/<script>([\s\S]*?)<\/script>/g)].map(m => m[1]);
+
+// Any property of a stub is another stub, and calling one returns a stub
+function stub(values = {}) {
+    const target = function () {};
+    return new Proxy(target, {
+        get(t, key) {
+            if (key in values) return values[key];
+            if (key === Symbol.toPrimitive) return () => '';
+            if (key === 'then') return undefined;
+            if (!(key in t)) t[key] = stub();
+            return t[key];
+        },
+        set(t, key, value) { values[key] = value; return true; },
+        apply: () => stub(),
+        construct: () => stub(),
+    });
+}
+
+const elements = {};
+const element = () => stub({
+    value: '', checked: false, textContent: '', innerHTML: '', style: {}, dataset: {},
+    classList: stub({ contains: () => false }),
+    querySelectorAll: () => [],
+});
+const map = stub({ getZoom: () => 13, getBounds: () => stub({ pad: () => stub() }) });
+const summary = { registered: [], fetched: [], features: null, errors: [] };
+const listeners = [];
+const listen = (type, handler) => listeners.push([type, handler]);
+const fire = type => listeners.filter(([t]) => t === type).forEach(([, handler]) => handler(stub()));
+
+const context = {
+    console: { log: () => {}, warn: () => {}, error: (...args) => summary.errors.push(args.join(' ')) },
+    Math, Date, JSON, Object, Array, Set, Map, Promise, Uint32Array, Uint8Array, Intl,
+    setTimeout, clearTimeout, setInterval: () => 0, clearInterval: () => {},
+    L: stub({ map: () => map }),
+    localStorage: { getItem: () => null, setItem: () => {} },
+    navigator: {
+        serviceWorker: { register: url => { summary.registered.push(url); return Promise.resolve(stub()); } },
+        geolocation: stub(),
+    },
+    document: stub({
+        getElementById: id => elements[id] || (elements[id] = element()),
+        querySelector: () => element(),
+        querySelectorAll: () => [],
+        createElement: () => element(),
+        body: element(),
+        addEventListener: listen,
+    }),
+    fetch: async url => {
+        summary.fetched.push(url);
+        const text = fs.readFileSync(path.join(root, url), 'utf8');
+        return { ok: true, json: async () => JSON.parse(text), text: async () => text };
+    },
+};
+context.window = stub({
+    matchMedia: () => stub({ matches: false }), innerWidth: 1200,
+    navigator: context.navigator, addEventListener: listen,
+});
+vm.createContext(context);
+
+(async () => {
+    try {
+        for (const script of scripts) vm.runInContext(script, context);
+        fire('DOMContentLoaded');
+        fire('load');
+        await new Promise(resolve => setTimeout(resolve, 50));
+        summary.features = vm.runInContext('restaurants.features.length', context);
+    } catch (e) {
+        console.error(e.stack);
+        process.exit(1);
+    }
+    console.log(JSON.stringify(summary));
+    process.exit(summary.errors.length ? 1 : 0);
+})();
@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RUN_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_page.js')
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the page')
+
+
+def restaurants(count=6):
+    return [{
+        'name': f'Restaurant {i}',
+        'tabelog_rating': 3.6,
+        'google_rating': round(4.2 + i * 0.1, 1),
+        'google_reviews': 10 * i,
+        'cuisine': 'Japanese',
+        'categories': [['Sushi'], ['Ramen'], ['Cafe']][i % 3],
+        'address': f'{i} Test Street, Kyoto',
+        'place_id': f'place-{i}',
+        'lat': 35.0 + i * 0.003,
+        'lng': 135.76 + i * 0.002,
+        'price_level': 2,
+        'opening_hours': ['Monday: 11:00 AM – 10:00 PM'],
+        'open_now': True,
+        'photo_urls': [],
+    } for i in range(count)]
+
+
+def run_page(html_path):
+    """Summary from tests/run_page.js; fails the test on any script error"""
+    result = subprocess.run(['node', RUN_PAGE, str(html_path)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return json.loads(result.stdout)
+
+
+@pytest.fixture
+def site(tmp_path):
+    with open(tmp_path / 'kyoto_final.json', 'w', encoding='utf-8') as f:
+        json.dump(restaurants(), f)
+    return tmp_path
+
+
+def build(site, script, *args):
+    subprocess.run([sys.executable, os.path.join(ROOT, script)] + list(args),
+                   cwd=site, check=True, capture_output=True)
+
+
+@pytest.mark.parametrize('options', [[], ['--split-data'], ['--split-data', '--compact']])
+def test_page_runs(site, options):
+    build(site, 'build_map.py', *options)
+    summary = run_page(site / 'index.html')
+    assert summary['features'] == 6
+    assert summary['registered'] == ['sw.js']
+    assert bool(summary['fetched']) == ('--split-data' in options)
+    if options == ['--split-data', '--compact']:
+        # The photos follow the restaurant data in their own file
+        assert [url.split('.')[0] for url in summary['fetched']] == ['data/restaurants', 'data/photos']
+
+
+def test_multi_city_shell_runs(site):
+    build(site, 'multi_city.py', '--cities', 'kyoto')
+    summary = run_page(site / 'index.html')
+    assert summary['features'] == 6
+    assert summary['registered'] == ['sw.js']
+    assert summary['fetched'][0].startswith('data/kyoto.')
@@ -0,0 +1,88 @@
+import json
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from clustering import (MAX_ZOOM, MIN_ZOOM, RADIUS_PX, TILE_SIZE, build_clusters, mercator_lat, mercator_lng,
+                        mercator_x, mercator_y)
+
+
+def make_points(count=400, seed=11):
+    rng = random.Random(seed)
+    points = [(35.0 + rng.gauss(0, 0.01), 135.76 + rng.gauss(0, 0.01)) for _ in range(count // 2)]
+    points += [(rng.uniform(34.8, 35.2), rng.uniform(135.5, 136.0)) for _ in range(count - len(points))]
+    return points
+
+
+@pytest.fixture(scope='module')
+def points():
+    return make_points()
+
+
+@pytest.fixture(scope='module')
+def clusters(points):
+    # The shipped (JSON round-tripped) form
+    return json.loads(json.dumps(build_clusters(points)))
+
+
+@pytest.mark.parametrize('lat, lng', [(35.0116, 135.7681), (-33.86, 151.21), (0, 0), (60.17, -24.94)])
+def test_mercator_round_trip(lat, lng):
+    assert mercator_lat(mercator_y(lat)) == pytest.approx(lat, abs=1e-9)
+    assert mercator_lng(mercator_x(lng)) == pytest.approx(lng, abs=1e-9)
+
+
+def test_every_zoom_is_shipped(clusters):
+    assert (clusters['min_zoom'], clusters['max_zoom']) == (MIN_ZOOM, MAX_ZOOM)
+    assert sorted(map(int, clusters['levels'])) == list(range(MIN_ZOOM, MAX_ZOOM + 1))
+
+
+def test_assignments_match_cluster_sizes(points, clusters):
+    for zoom, level in clusters['levels'].items():
+        centers, assign = level['centers'], level['assign']
+        assert len(assign) == len(points)
+        counts = [0] * len(centers)
+        for cluster in assign:
+            counts[cluster] += 1
+        assert counts == [count for _, _, count in centers], f'zoom {zoom}'
+
+
+def test_zooming_out_never_splits_clusters(clusters):
+    for zoom in range(MAX_ZOOM, MIN_ZOOM, -1):
+        finer = clusters['levels'][str(zoom)]['assign']
+        coarser = clusters['levels'][str(zoom - 1)]['assign']
+        parent = {}
+        for child, cluster in zip(finer, coarser):
+            assert parent.setdefault(child, cluster) == cluster, f'zoom {zoom}'
+
+
+def test_centers_are_weighted_centroids(points, clusters):
+    for zoom, level in clusters['levels'].items():
+        members = {}
+        for i, cluster in enumerate(level['assign']):
+            members.setdefault(cluster, []).append(points[i])
+        for cluster, (lng, lat, count) in enumerate(level['centers']):
+            x = sum(mercator_x(p_lng) for _, p_lng in members[cluster]) / count
+            y = sum(mercator_y(p_lat) for p_lat, _ in members[cluster]) / count
+            assert lng == pytest.approx(mercator_lng(x), abs=1e-5), f'zoom {zoom}'
+            assert lat == pytest.approx(mercator_lat(y), abs=1e-5), f'zoom {zoom}'
+
+
+def test_max_zoom_merges_only_nearby_points(points, clusters):
+    radius = RADIUS_PX / (TILE_SIZE * 2 ** MAX_ZOOM)
+    level = clusters['levels'][str(MAX_ZOOM)]
+    for i, cluster in enumerate(level['assign']):
+        lng, lat, _ = level['centers'][cluster]
+        x, y = mercator_x(points[i][1]), mercator_y(points[i][0])
+        # A member is within the merge radius of the seed, so within twice it of the centroid
+        assert math.hypot(x - mercator_x(lng), y - mercator_y(lat)) <= 2 * radius + 1e-9
+
+
+def test_distant_points_stay_apart():
+    clusters = build_clusters([(35.0, 135.0), (35.0, 136.0)], min_zoom=MIN_ZOOM)
+    for level in clusters['levels'].values():
+        assert [count for _, _, count in level['centers']] == [1, 1]
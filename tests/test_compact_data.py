@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from compact_data import COORD_SCALE, DECODER_JS, decode, dumps, encode, size_report
+from opening_hours import weekly_table
+
+PHOTO_URL = ('https://maps.googleapis.com/maps/api/place/photo?maxwidth=400'
+             '&photo_reference={ref}&key=test-key')
+
+# Properties the page reads; encode() drops the rest
+PAGE_PROPERTIES = ['name', 'tabelog_rating', 'google_rating', 'google_reviews', 'cuisine', 'area',
+                   'categories', 'place_id', 'price_level', 'hours', 'photo_urls']
+
+HOURS = [
+    ['Monday: 11:00 AM – 10:00 PM', 'Tuesday: Closed', 'Wednesday: 6:00 PM – 2:00 AM'],
+    ['Saturday: 12:00 – 2:00 PM, 5:00 – 9:00 PM'],
+    [f'{day}: Open 24 hours' for day in ('Monday', 'Tuesday', 'Wednesday', 'Thursday',
+                                         'Friday', 'Saturday', 'Sunday')],
+    None,
+]
+
+
+def feature(i):
+    lines = HOURS[i % len(HOURS)]
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [135.76 + i * 0.0012345, 35.0 + i * 0.0009871]},
+        'properties': {
+            'name': f'Restaurant {i}',
+            'tabelog_rating': 3.5 if i % 2 else None,
+            'google_rating': round(4.0 + i % 10 / 10, 1),
+            'google_reviews': 7 * i,
+            'cuisine': ['Japanese', 'Italian'][i % 2],
+            'area': ['Gion', 'Kyoto Station', None][i % 3],
+            'address': f'{i} Test Street, Kyoto',
+            'categories': [['Sushi', 'Izakaya'], ['Izakaya', 'Sushi'], []][i % 3],
+            'place_id': f'place-{i}' if i % 4 else None,
+            'price_level': i % 5 or None,
+            'opening_hours': lines,
+            'open_now': [True, False, None][i % 3],
+            'hours': weekly_table(lines),
+            # Places photo URLs plus the local thumbnails photo_pipeline.py publishes
+            'photo_urls': ([PHOTO_URL.format(ref=f'ref{i}-{n}') for n in range(i % 3)]
+                           + [f'photos/thumb/{i}.webp'] * (i % 2)),
+        },
+    }
+
+
+@pytest.fixture
+def geojson():
+    return {'type': 'FeatureCollection', 'features': [feature(i) for i in range(40)],
+            'spatial_index': {'cells': {}}, 'filter_index': {'size': 40}}
+
+
+def shipped(payload):
+    """The payload as the page receives it"""
+    return json.loads(dumps(payload))
+
+
+def assert_page_properties_match(original, restored):
+    assert len(original['features']) == len(restored['features'])
+    for before, after in zip(original['features'], restored['features']):
+        assert all(abs(a - b) <= 1 / COORD_SCALE for a, b in
+                   zip(before['geometry']['coordinates'], after['geometry']['coordinates']))
+        assert after['properties'] == {key: before['properties'][key] for key in PAGE_PROPERTIES}
+
+
+def test_round_trip_keeps_what_the_page_reads(geojson):
+    decoded = decode(shipped(encode(geojson)))
+    assert_page_properties_match(geojson, decoded)
+    assert decoded['spatial_index'] == geojson['spatial_index']
+    assert decoded['filter_index'] == geojson['filter_index']
+
+
+def test_photos_can_ship_separately(geojson):
+    payload = shipped(encode(geojson))
+    photos = payload.pop('photos')
+    decoded = decode(payload)
+    assert all(f['properties']['photo_urls'] == [] for f in decoded['features'])
+    assert 'test-key' not in dumps(payload)
+    # The key is stored once, in the URL template
+    assert dumps(photos).count('test-key') == 1
+
+
+def test_smaller_than_geojson(geojson):
+    payload = encode(geojson)
+    payload.pop('photos')
+    (_, before, before_gz), (_, after, after_gz) = size_report(geojson, payload)
+    assert after * 3 < before
+    assert after_gz < before_gz
+
+
+def test_empty_collection():
+    decoded = decode(shipped(encode({'type': 'FeatureCollection', 'features': []})))
+    assert decoded['features'] == []
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the page decoder')
+@pytest.mark.parametrize('split_photos', [False, True])
+def test_page_decoder_matches_python(geojson, split_photos):
+    payload = shipped(encode(geojson))
+    photos = payload.pop('photos') if split_photos else None
+    script = DECODER_JS + f'''
+        const restaurants = decodeRestaurants({dumps(payload)});
+        const photos = {json.dumps(photos)};
+        if (photos) decodePhotos(restaurants.features, photos);
+        console.log(JSON.stringify(restaurants));'''
+    result = subprocess.run(['node'], input=script, capture_output=True, text=True, check=True)
+    expected = decode(shipped(encode(geojson)))
+    assert json.loads(result.stdout) == expected
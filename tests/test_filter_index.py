@@ -0,0 +1,67 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from filter_index import (bitset, bitset_members, build_filter_index, build_filter_index_rows, feature_rating,
+                          select)
+
+CATEGORIES = ['Sushi', 'Ramen', 'Cafe', 'Kaiseki', 'Yakitori']
+
+
+def make_features(count=150, seed=3):
+    rng = random.Random(seed)
+    features = []
+    for _ in range(count):
+        rating = rng.choice([None, 4.0, 4.2, 4.5, 4.5, 4.7, 4.9, 5.0])
+        categories = rng.sample(CATEGORIES, rng.choice([0, 1, 1, 2]))
+        features.append({'properties': {'google_rating': rating, 'categories': categories}})
+    return features
+
+
+@pytest.fixture(scope='module')
+def features():
+    return make_features()
+
+
+@pytest.fixture(scope='module')
+def index(features):
+    # The shipped (JSON round-tripped) form
+    return json.loads(json.dumps(build_filter_index(features)))
+
+
+@pytest.mark.parametrize('indices', [[], [0], [31, 32], [5, 63, 64, 149]])
+def test_bitset_round_trip(indices):
+    assert bitset_members(bitset(indices, 150)) == indices
+
+
+def test_rows_build_matches_features_build(features, index):
+    rows = [(f['properties']['categories'], feature_rating(f)) for f in features]
+    assert json.loads(json.dumps(build_filter_index_rows(rows))) == index
+
+
+@pytest.mark.parametrize('min_rating', [0, 4.2, 4.5, 4.7, 4.9, 5.0, 5.1])
+def test_select_matches_plain_filter(features, index, min_rating):
+    rng = random.Random(min_rating)
+    for _ in range(30):
+        chosen = rng.sample(CATEGORIES + ['Not A Category'], rng.choice([0, 0, 1, 2, 3]))
+        allowed_set = set(rng.sample(range(len(features)), len(features) // 2))
+        for allowed in (None, allowed_set):
+            expected = [
+                i for i, f in enumerate(features)
+                if feature_rating(f) >= min_rating
+                and (not chosen or any(c in f['properties']['categories'] for c in chosen))
+                and (allowed is None or i in allowed)
+            ]
+            mask = None if allowed is None else bitset(allowed, len(features))
+            assert select(index, min_rating, chosen, mask) == expected
+
+
+def test_empty_index():
+    index = build_filter_index([])
+    assert index == {'size': 0, 'categories': {}, 'rating_order': [], 'ratings': []}
+    assert select(index, 0, ['Sushi']) == []
@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from opening_hours import DAY_MINUTES, IS_OPEN_JS, is_open, parse_day, parse_weekday_text, weekly_table
+
+# Real weekday_text lines from Places, with its thin (U+2009) and narrow
+# no-break (U+202F) spaces; the ranges are minutes past midnight
+CORPUS = [
+    ('Wednesday: Closed', 2, []),
+    ('Friday: 6:00 – 7:30 PM', 4, [(1080, 1170)]),
+    ('Saturday: 12:00 – 5:00 PM', 5, [(720, 1020)]),
+    ('Monday: 10:00 AM – 5:00 PM', 0, [(600, 1020)]),
+    # Overnight: the end is past midnight
+    ('Wednesday: 6:00 PM – 5:00 AM', 2, [(1080, 1740)]),
+    ('Sunday: 5:30 PM – 12:30 AM', 6, [(1050, 1470)]),
+    ('Monday: 11:30 AM – 12:00 AM', 0, [(690, 1440)]),
+    ('Friday: 12:00 PM – 2:00 AM', 4, [(720, 1560)]),
+    # Several ranges a day
+    ('Saturday: 12:00 – 12:30 PM, 5:00 – 7:30 PM', 5, [(720, 750), (1020, 1170)]),
+    ('Tuesday: 7:30 – 9:30 AM, 5:30 – 9:00 PM', 1, [(450, 570), (1050, 1260)]),
+    ('Sunday: 9:00 AM – 12:00 PM, 1:30 – 5:00 PM', 6, [(540, 720), (810, 1020)]),
+    ('Saturday: 10:00 AM – 5:00 PM, 6:00 PM – 2:00 AM', 5,
+     [(600, 1020), (1080, 1560)]),
+    ('Sunday: 7:00 – 10:30 AM, 12:00 – 2:30 PM, 3:00 – 5:30 PM, '
+     '6:00 – 9:30 PM', 6, [(420, 630), (720, 870), (900, 1050), (1080, 1290)]),
+    # Other spellings
+    ('Wednesday: Open 24 hours', 2, [(0, DAY_MINUTES)]),
+    ('Thursday: 24 hours', 3, [(0, DAY_MINUTES)]),
+    ('Thursday: 17:00-23:00', 3, [(1020, 1380)]),
+]
+
+
+@pytest.mark.parametrize('line, weekday, ranges', CORPUS)
+def test_parse_day(line, weekday, ranges):
+    assert parse_day(line) == (weekday, ranges)
+
+
+@pytest.mark.parametrize('lines, weekday, minute, expected', [
+    (["Monday: 6:00 – 10:00 PM"], 0, 18 * 60, True),
+    (["Monday: 6:00 – 10:00 PM"], 0, 22 * 60, False),
+    (["Monday: 6:00 – 10:00 PM"], 0, 6 * 60, False),
+    (["Monday: 12:00 – 2:00 PM"], 0, 12 * 60 + 30, True),
+    (["Monday: 12:00 – 2:00 PM"], 0, 30, False),
+    # Several ranges a day
+    (["Tuesday: 11:30 AM – 2:00 PM, 5:30 – 10:00 PM"], 1, 15 * 60, False),
+    (["Tuesday: 11:30 AM – 2:00 PM, 5:30 – 10:00 PM"], 1, 17 * 60 + 30, True),
+    # Overnight, including Sunday night into Monday
+    (["Friday: 6:00 PM – 2:00 AM"], 5, 60, True),
+    (["Friday: 6:00 PM – 2:00 AM"], 5, 120, False),
+    (["Sunday: 8:00 PM – 1:00 AM"], 0, 30, True),
+    (["Saturday: 5:00 – 12:00 AM"], 5, 23 * 60 + 59, True),
+    (["Saturday: 5:00 – 12:00 AM"], 6, 0, False),
+    # 24 hours and closed
+    (["Wednesday: Open 24 hours"], 2, 3 * 60, True),
+    (["Wednesday: Open 24 hours"], 3, 3 * 60, False),
+    (["Wednesday: Closed"], 2, 12 * 60, False),
+    (["Thursday: 17:00-23:00"], 3, 22 * 60, True),
+    # Unknown hours
+    ([], 0, 0, None),
+    (["Someday: 9:00 AM – 5:00 PM"], 0, 600, None),
+])
+def test_is_open(lines, weekday, minute, expected):
+    assert is_open(weekly_table(lines), weekday, minute) is expected
+
+
+def test_overnight_ranges_split_at_midnight():
+    table = parse_weekday_text(['Sunday: 8:00 PM – 1:00 AM', 'Monday: 6:00 PM – 2:00 AM',
+                                'Tuesday: 1:00 – 3:00 AM'])
+    assert table[0] == [0, 60, 1080, 1440]
+    # Monday's overnight tail merges with Tuesday's own early range
+    assert table[1] == [0, 180]
+    assert table[6] == [1200, 1440]
+
+
+def test_every_day_open_24_hours():
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    assert parse_weekday_text([f'{day}: Open 24 hours' for day in days]) == [[0, DAY_MINUTES]] * 7
+
+
+@pytest.mark.parametrize('lines', [
+    None,
+    [],
+    ['Someday: 9:00 AM – 5:00 PM'],
+    ['Monday: 9:00 XM – 5:00 PM'],
+    ['Monday: 9:00 AM to 5:00 PM'],
+    ['Monday: 9:75 AM – 5:00 PM'],
+])
+def test_unparseable_hours_are_unknown(lines):
+    assert weekly_table(lines) is None
+
+
+def test_corpus_tables_are_sorted_and_within_the_day():
+    table = parse_weekday_text([line for line, _, _ in CORPUS])
+    for intervals in table:
+        assert all(a < b for a, b in zip(intervals, intervals[1:]))
+        assert all(0 <= minute <= DAY_MINUTES for minute in intervals)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the page code')
+def test_page_is_open_matches_python():
+    tables = [weekly_table([line]) for line, _, _ in CORPUS] + [None]
+    probes = [(table, weekday, minute) for table in tables
+              for weekday in range(7) for minute in range(0, DAY_MINUTES, 15)]
+    script = IS_OPEN_JS + f'''
+        const probes = {json.dumps(probes)};
+        console.log(JSON.stringify(probes.map(([hours, weekday, minute]) => isOpenAt(hours, [weekday, minute]))));'''
+    result = subprocess.run(['node'], input=script, capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [is_open(*probe) for probe in probes]
@@ -0,0 +1,106 @@
+import glob
+import os
+import shutil
+import sys
+from functools import partial
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pipeline
+from cities import get_city
+from pipeline import Stage, city_stages, load_state, run
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def make_stages(city='kyoto'):
+    return [
+        Stage('copy', 'copy_stage.py', ['in.txt', f'{city}.txt'],
+              inputs=['in.txt'], outputs=[f'{city}.txt'], city=city),
+    ]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write('helper.py', 'def upper(text):\n    return text.upper()\n')
+    write('copy_stage.py', 'import sys\nfrom helper import upper\n'
+                           'open(sys.argv[2], "w").write(upper(open(sys.argv[1]).read()))\n')
+    write('in.txt', 'hello')
+    return tmp_path
+
+
+def test_second_run_reads_no_file_contents(workdir, monkeypatch):
+    assert run(make_stages(), load_state()) == set()
+    assert open('kyoto.txt').read() == 'HELLO'
+
+    opened = []
+    real_open = open
+
+    def tracking_open(path, mode='r', *args, **kwargs):
+        if not str(path).startswith(pipeline.STATE_PATH):
+            opened.append(path)
+        return real_open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline, 'open', tracking_open, raising=False)
+    state = load_state()
+    assert run(make_stages(), state) == set()
+    assert opened == []
+    assert set(state['files']) >= {'in.txt', 'kyoto.txt', 'copy_stage.py', 'helper.py'}
+
+
+def test_changed_import_reruns_stage(workdir):
+    run(make_stages(), load_state())
+    write('helper.py', 'def upper(text):\n    return text.upper() + "!"\n')
+    run(make_stages(), load_state())
+    assert open('kyoto.txt').read() == 'HELLO!'
+
+
+def test_state_is_kept_per_city(workdir):
+    run(make_stages('kyoto'), load_state())
+    run(make_stages('osaka'), load_state())
+    assert set(load_state()['stages']) == {'kyoto/copy', 'osaka/copy'}
+
+    os.remove('osaka.txt')
+    run(make_stages('kyoto'), load_state())
+    assert not os.path.exists('osaka.txt')
+
+
+def test_function_level_imports_are_not_code_inputs():
+    root = os.path.join(os.path.dirname(__file__), '..')
+    # multi_city.py only imports the scraper and enricher inside the functions that run them
+    inputs = pipeline.code_inputs('multi_city.py', partial(pipeline.local_imports, root=root))
+    assert 'build_map.py' in inputs
+    assert 'scrape_kyoto.py' not in inputs
+    assert 'enrich_google.py' not in inputs
+
+
+def test_keyword_table_edit_only_reruns_categorize_and_build(tmp_path, monkeypatch):
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    for path in glob.glob(os.path.join(root, '*.py')):
+        shutil.copy(path, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    stages = city_stages(get_city('kyoto'))
+    for stage in stages:
+        for path in stage.inputs + stage.outputs:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            write(path, path)
+
+    # Record every stage as just run, the way run() does
+    fingerprint = pipeline.Fingerprints()
+    records = {stage.name: {
+        'command': stage.command[1:],
+        'inputs': {path: fingerprint(path) for path in stage.inputs + pipeline.code_inputs(stage.script)},
+        'outputs': {path: fingerprint(path) for path in stage.produced()},
+    } for stage in stages}
+
+    with open('cuisine_classifier.py', 'a', encoding='utf-8') as f:
+        f.write('\n# keyword table edit\n')
+    stale = {stage.name for stage in stages
+             if pipeline.stale_reason(stage, records[stage.name], pipeline.Fingerprints())}
+    assert stale == {'categorize', 'build'}
@@ -0,0 +1,59 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from record_stream import iter_json_array, iter_records
+
+RECORDS = [
+    {'name': 'Restaurant 0', 'lat': 35.0, 'lng': 135.76, 'photo_urls': []},
+    {'name': 'Café "Ñ" [1]', 'lat': 35.01, 'lng': 135.77, 'photo_urls': ['https://example.com/a,b']},
+    {'name': 'Restaurant 2', 'lat': None, 'lng': None, 'tags': [1, 2.5, True, None, {'nested': '}'}]},
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 97, 64 * 1024])
+def test_matches_json_load_across_chunk_boundaries(chunk_size):
+    text = json.dumps(RECORDS, ensure_ascii=False, indent=1)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == RECORDS
+
+
+@pytest.mark.parametrize('text', ['[]', '  [ ]  ', '[\n]'])
+def test_empty_array(text):
+    assert list(iter_json_array(io.StringIO(text), chunk_size=2)) == []
+
+
+@pytest.mark.parametrize('text', [
+    '[{"name": "cut off',
+    '[{"name": "Restaurant 0"}, {"name": ',
+    '[{"name": "Restaurant 0"}, {"name": "Restaurant 1"',
+])
+def test_truncated_record_raises_decode_error(text):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.StringIO(text), chunk_size=5))
+
+
+@pytest.mark.parametrize('text', ['', '[', '[{"name": "Restaurant 0"},'])
+def test_unterminated_array_raises(text):
+    with pytest.raises(ValueError, match='unexpected end'):
+        list(iter_json_array(io.StringIO(text)))
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError, match='expected a JSON array'):
+        list(iter_json_array(io.StringIO('{"name": "Restaurant 0"}')))
+
+
+@pytest.mark.parametrize('name', ['records.json', 'records.jsonl'])
+def test_iter_records(tmp_path, name):
+    path = tmp_path / name
+    with open(path, 'w', encoding='utf-8') as f:
+        if name.endswith('.jsonl'):
+            f.write(''.join(json.dumps(record) + '\n\n' for record in RECORDS))
+        else:
+            json.dump(RECORDS, f)
+    assert list(iter_records(str(path))) == RECORDS
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from geojson_patches import PatchLog, read_patches
+from places_client import LookupFailed, PlacesClient
+from refresh_places import REFRESHED_KEY, refresh
+
+RESULT = {'rating': 4.4, 'user_ratings_total': 120,
+          'opening_hours': {'weekday_text': ['Monday: 11:00 AM – 9:00 PM'], 'open_now': True}}
+
+
+def places():
+    return [{'name': f'Restaurant {i}', 'google_place_id': f'place-{i}', 'google_rating': 4.4,
+             'google_user_ratings_total': 100, 'opening_hours': ['Monday: 11:00 AM – 9:00 PM'],
+             'open_now': True} for i in range(3)]
+
+
+def client_answering(statuses, offline=False):
+    """PlacesClient whose details calls answer place-<i> with statuses[i]"""
+    client = PlacesClient(api_key='test-key', offline=offline)
+
+    def details(place_id, **kwargs):
+        status = statuses[int(place_id.split('-')[1])]
+        return {'status': status, 'result': RESULT} if status == 'OK' else {'status': status}
+
+    client.details = details
+    return client
+
+
+@pytest.mark.parametrize('status', ['INVALID_REQUEST', 'UNKNOWN_ERROR'])
+def test_refresh_place_raises_for_unexpected_status(status):
+    with pytest.raises(LookupFailed):
+        client_answering([status]).refresh_place('place-0')
+
+
+def test_refresh_place_not_found_is_none():
+    assert client_answering(['NOT_FOUND']).refresh_place('place-0') is None
+
+
+def test_only_not_found_is_gone(tmp_path):
+    log_path = str(tmp_path / 'refresh.jsonl')
+    with PatchLog(log_path) as log:
+        changed, unchanged, gone, failed = refresh(
+            places(), client_answering(['OK', 'NOT_FOUND', 'UNKNOWN_ERROR']), log, photos=False)
+    assert (changed, unchanged) == (1, 0)
+    assert [r['google_place_id'] for r in gone] == ['place-1']
+    assert [r['google_place_id'] for r in failed] == ['place-2']
+    assert set(read_patches(log_path)) == {'place-0'}
+
+
+def test_offline_answers_are_not_stamped(tmp_path):
+    log_path = str(tmp_path / 'refresh.jsonl')
+    with PatchLog(log_path) as log:
+        refresh(places(), client_answering(['OK', 'OK', 'OK'], offline=True), log, photos=False)
+    patches = read_patches(log_path)
+    assert set(patches) == {'place-0', 'place-1', 'place-2'}
+    assert all(REFRESHED_KEY not in changes for changes in patches.values())
+    assert patches['place-0'] == {'google_user_ratings_total': 120}
+
+
+def test_live_answers_are_stamped_even_when_unchanged(tmp_path):
+    log_path = str(tmp_path / 'refresh.jsonl')
+    unchanged = [{**r, 'google_user_ratings_total': 120} for r in places()]
+    with PatchLog(log_path) as log:
+        refresh(unchanged, client_answering(['OK', 'OK', 'OK']), log, now=0, photos=False)
+    assert all(changes == {REFRESHED_KEY: '1970-01-01T00:00:00Z'}
+               for changes in read_patches(log_path).values())
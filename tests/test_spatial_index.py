@@ -0,0 +1,77 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from spatial_index import NEARBY_MINUTES, GridIndex, haversine_km, walking_km
+
+
+def make_points(count=300, seed=42):
+    """A dense downtown plus a sparse spread, like a city's restaurants"""
+    rng = random.Random(seed)
+    points = [(35.0 + rng.gauss(0, 0.01), 135.76 + rng.gauss(0, 0.01)) for _ in range(count * 2 // 3)]
+    points += [(rng.uniform(34.9, 35.1), rng.uniform(135.6, 135.9)) for _ in range(count - len(points))]
+    return points
+
+
+def brute_force_nearest(points, lat, lng, limit, max_km):
+    found = sorted((haversine_km(lat, lng, p_lat, p_lng), i) for i, (p_lat, p_lng) in enumerate(points))
+    return [(distance, i) for distance, i in found if distance <= max_km][:limit]
+
+
+def queries(points, seed=7):
+    """Points near restaurants plus points anywhere around (and outside) the grid"""
+    rng = random.Random(seed)
+    near = [(lat + rng.uniform(-0.005, 0.005), lng + rng.uniform(-0.005, 0.005))
+            for lat, lng in rng.sample(points, 40)]
+    anywhere = [(rng.uniform(34.8, 35.2), rng.uniform(135.5, 136.0)) for _ in range(40)]
+    return near + anywhere
+
+
+@pytest.fixture(scope='module')
+def points():
+    return make_points()
+
+
+@pytest.fixture(scope='module')
+def index(points):
+    # The shipped (JSON round-tripped) form, not just the in-memory one
+    built = GridIndex.build(points)
+    return GridIndex.from_dict(json.loads(json.dumps(built.to_dict())), points)
+
+
+@pytest.mark.parametrize('max_km', [0.5, walking_km(NEARBY_MINUTES), 5.0])
+@pytest.mark.parametrize('limit', [1, 20])
+def test_nearest_matches_brute_force(points, index, max_km, limit):
+    for lat, lng in queries(points):
+        assert index.nearest(lat, lng, limit, max_km) == brute_force_nearest(points, lat, lng, limit, max_km)
+
+
+@pytest.mark.parametrize('half', [0.002, 0.02, 0.2, 2.0])
+def test_within_matches_brute_force(points, index, half):
+    for lat, lng in queries(points):
+        box = (lat - half, lng - half * 1.5, lat + half, lng + half * 1.5)
+        expected = [i for i, (p_lat, p_lng) in enumerate(points)
+                    if box[0] <= p_lat <= box[2] and box[1] <= p_lng <= box[3]]
+        assert index.within(*box) == expected
+
+
+def test_every_point_is_in_its_cell(points, index):
+    members = {}
+    for cell, indices in index.cells.items():
+        for i in indices:
+            members[i] = cell
+    assert sorted(members) == list(range(len(points)))
+    for i, (lat, lng) in enumerate(points):
+        row, col = index.cell_of(lat, lng)
+        assert members[i] == row * index.cols + col
+
+
+def test_empty_index():
+    index = GridIndex.build([])
+    assert index.nearest(35.0, 135.76) == []
+    assert index.within(34.0, 135.0, 36.0, 136.0) == []
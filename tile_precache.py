@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Map tiles around every restaurant, for offline use on the street.
+
+`build_map.py --precache-tiles` computes the tiles covering each restaurant
+(plus a short walk around it) at a range of zooms and writes them to
+tiles.json next to the page. The service worker downloads that set in the
+background when the page asks it to, a few tiles at a time and only while
+the origin's storage quota has room, so panning near restaurants needs no
+network afterwards.
+
+The manifest stores, per zoom, runs of consecutive y for each column:
+    {"template": ".../{z}/{x}/{y}.png", "zooms": {"16": [[x, y_first, y_last], ...]}}
+
+Testing without hitting the OSM tile servers (which forbid bulk downloads
+from their public endpoints in any case):
+    python tile_precache.py --serve-stub 8767 &
+    python build_map.py --precache-tiles --tile-url 'http://127.0.0.1:8767/{z}/{x}/{y}.png'
+"""
+import argparse
+import json
+import math
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from photo_pipeline import stub_image
+from spatial_index import METERS_PER_DEGREE
+
+TILE_URL = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+MANIFEST_NAME = 'tiles.json'
+
+MIN_ZOOM = 13
+MAX_ZOOM = 16
+PADDING_METERS = 300  # a few minutes' walk around each restaurant
+AVERAGE_TILE_BYTES = 20 * 1024  # OSM raster tiles in a dense city, for the size estimate
+
+# Service worker side: parallel downloads, and the share of the quota the
+# tiles may push total usage to
+FETCH_CONCURRENCY = 4
+QUOTA_SHARE = 0.5
+
+TILE_PATH = re.compile(r'^/(\d+)/(\d+)/(\d+)\.png$')
+
+
+def parse_zooms(text):
+    """'13-16' or '15' -> (min_zoom, max_zoom)"""
+    first, _, last = text.partition('-')
+    zooms = (int(first), int(last or first))
+    if not 0 <= zooms[0] <= zooms[1] <= 19:
+        raise ValueError(f"bad zoom range {text!r}")
+    return zooms
+
+
+def tile_xy(lat, lng, zoom):
+    """Slippy-map tile containing (lat, lng)"""
+    n = 2 ** zoom
+    x = int((lng + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def covering_tiles(points, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, padding_meters=PADDING_METERS):
+    """{zoom: set of (x, y)} covering a padded box around every (lat, lng)"""
+    tiles = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        found = tiles[zoom] = set()
+        for lat, lng in points:
+            d_lat = padding_meters / METERS_PER_DEGREE
+            d_lng = d_lat / max(math.cos(math.radians(lat)), 1e-6)
+            # y grows southwards
+            x0, y0 = tile_xy(lat + d_lat, lng - d_lng, zoom)
+            x1, y1 = tile_xy(lat - d_lat, lng + d_lng, zoom)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    found.add((x, y))
+    return tiles
+
+
+def encode_runs(tiles):
+    """{zoom: set of (x, y)} -> {"zoom": [[x, y_first, y_last], ...]}"""
+    zooms = {}
+    for zoom, found in sorted(tiles.items()):
+        runs = []
+        for x, y in sorted(found):
+            if runs and runs[-1][0] == x and runs[-1][2] == y - 1:
+                runs[-1][2] = y
+            else:
+                runs.append([x, y, y])
+        zooms[str(zoom)] = runs
+    return zooms
+
+
+def build_manifest(points, template=TILE_URL, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM,
+                   padding_meters=PADDING_METERS):
+    tiles = covering_tiles(points, min_zoom, max_zoom, padding_meters)
+    return {
+        'template': template,
+        'count': sum(len(found) for found in tiles.values()),
+        'concurrency': FETCH_CONCURRENCY,
+        'quota_share': QUOTA_SHARE,
+        'average_bytes': AVERAGE_TILE_BYTES,
+        'zooms': encode_runs(tiles),
+    }
+
+
+def write_manifest(manifest, html_path):
+    """Write tiles.json next to `html_path`; returns its URL relative to the page"""
+    path = os.path.join(os.path.dirname(html_path), MANIFEST_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    per_zoom = ', '.join(f"z{zoom} {sum(y1 - y0 + 1 for _, y0, y1 in runs)}"
+                         for zoom, runs in manifest['zooms'].items())
+    print(f"🗺️  Wrote {path}: {manifest['count']} tiles ({per_zoom}), "
+          f"~{manifest['count'] * AVERAGE_TILE_BYTES / 1024 / 1024:.0f} MB to precache")
+    return MANIFEST_NAME
+
+
+# Service worker side of the manifest; `tileCache` is the name of the cache
+# the tiles are stored in
+PRECACHE_TILES_JS = '''async function precacheTiles(manifestUrl, tileCache) {
+    const response = await fetch(manifestUrl, { cache: 'no-cache' });
+    if (!response.ok) return;
+    const manifest = await response.json();
+    const cache = await caches.open(tileCache);
+    const have = new Set((await cache.keys()).map(request => request.url));
+
+    const listed = [];
+    for (const [zoom, runs] of Object.entries(manifest.zooms)) {
+        for (const [x, y0, y1] of runs) {
+            for (let y = y0; y <= y1; y++) {
+                listed.push(manifest.template.replace('{z}', zoom).replace('{x}', x).replace('{y}', y));
+            }
+        }
+    }
+    // Drop tiles an earlier manifest listed but this one doesn't
+    const keep = new Set(listed);
+    for (const url of have) {
+        if (!keep.has(url)) await cache.delete(url);
+    }
+    const urls = listed.filter(url => !have.has(url));
+    if (!urls.length) return;
+
+    // Leave room for everything else on the origin
+    async function hasRoom(remaining) {
+        if (!self.navigator.storage || !self.navigator.storage.estimate) return true;
+        const { usage, quota } = await self.navigator.storage.estimate();
+        return usage + Math.min(remaining, 50) * manifest.average_bytes < quota * manifest.quota_share;
+    }
+    if (!await hasRoom(urls.length)) {
+        console.log('Tile precache skipped: not enough storage quota');
+        return;
+    }
+
+    let next = 0, fetched = 0, stopped = false;
+    async function worker() {
+        while (!stopped && next < urls.length) {
+            const url = urls[next++];
+            // Every 50 tiles, make sure the quota still has room
+            if (next % 50 === 0 && !await hasRoom(urls.length - next)) {
+                stopped = true;
+                console.log('Tile precache stopped: storage quota reached');
+                break;
+            }
+            try {
+                // CORS, so the cached response isn't an opaque one padded against the quota
+                const tile = await fetch(url, { mode: 'cors' });
+                if (tile.ok) {
+                    await cache.put(url, tile);
+                    fetched++;
+                }
+            } catch (error) {
+                // Offline or the tile server is refusing: try again on the next visit
+                stopped = true;
+            }
+        }
+    }
+    await Promise.all(Array.from({ length: manifest.concurrency }, worker));
+    console.log(`Tile precache: ${fetched} new tiles, ${listed.length - urls.length} already cached`);
+}'''
+
+
+class StubTileHandler(BaseHTTPRequestHandler):
+    """Answers /{z}/{x}/{y}.png with a placeholder image, like a tile server"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        match = TILE_PATH.match(self.path.split('?')[0])
+        if not match:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body, content_type = stub_image('/'.join(match.groups()))
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        # The service worker downloads tiles in CORS mode
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default='kyoto_final.json')
+    parser.add_argument('--zooms', default=f'{MIN_ZOOM}-{MAX_ZOOM}')
+    parser.add_argument('--padding', type=int, default=PADDING_METERS, help='meters around each restaurant')
+    parser.add_argument('--serve-stub', type=int, metavar='PORT',
+                        help='serve placeholder tiles on 127.0.0.1:PORT instead of counting tiles')
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        print(f"🗺️  Stub tile server on http://127.0.0.1:{args.serve_stub}/{{z}}/{{x}}/{{y}}.png")
+        ThreadingHTTPServer(('127.0.0.1', args.serve_stub), StubTileHandler).serve_forever()
+        return
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        points = [(r['lat'], r['lng']) for r in json.load(f) if 'lat' in r and 'lng' in r]
+    min_zoom, max_zoom = parse_zooms(args.zooms)
+    tiles = covering_tiles(points, min_zoom, max_zoom, args.padding)
+    total = 0
+    for zoom, found in sorted(tiles.items()):
+        total += len(found)
+        print(f"  z{zoom}: {len(found)} tiles")
+    print(f"{total} tiles for {len(points)} restaurants, ~{total * AVERAGE_TILE_BYTES / 1024 / 1024:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()